@@ -1,43 +1,295 @@
-from flask import Flask, render_template, request, url_for
-from search import search_query
-from evaluation import run_evaluation
-import time
-
-app = Flask(__name__)
-
-
-@app.url_defaults
-def add_cache_buster(endpoint, values):
-    if 'filename' in values and endpoint == 'static':
-        values['c'] = int(time.time())
-
-
-@app.route('/')
-def index():
-    return render_template('index.html')
-
-
-@app.route('/search')
-def search():
-    query = request.args.get('q', '')
-    if not query:
-        return render_template('results.html', query=query, results=[], error="Please enter a query.")
-
-    results, error = search_query(query)
-    return render_template('results.html', query=query, results=results, error=error)
-
-
-@app.route('/evaluate')
-def evaluate():
-    try:
-        metrics_df, map_score, plot_path = run_evaluation()
-        metrics_table = metrics_df.to_html(classes='table table-striped', float_format='{:.4f}'.format)
-        return render_template('evaluation.html', map_score=map_score, metrics_table=metrics_table, plot_path=plot_path)
-    except FileNotFoundError:
-        return "Evaluation data not found. Please create `queries.txt` and `qrels.txt` in the `eval_data` directory, and run the indexer."
-    except Exception as e:
-        return f"An error occurred during evaluation: {e}"
-
-
-if __name__ == '__main__':
+from flask import Flask, render_template, request, url_for, jsonify, g
+from search import (search_query, search_page, result_etag, prepare_queries, cache_stats, warm_up, readiness,
+                    reload_index, index_status, start_index_watcher, suggest_terms, FUZZY_DEFAULT,
+                    SEARCH_MODES)
+from suggest import SUGGEST_LIMIT
+from doc_store import DocumentStore, doc_filename, doc_id_from_filename
+import os
+import threading
+import time
+import metrics
+
+app = Flask(__name__)
+
+API_PAGE_SIZE = 10
+API_MAX_PAGE_SIZE = 100
+API_MAX_BATCH_QUERIES = 100
+# Если задан, /admin/reload требует заголовок X-Admin-Token с этим значением; иначе доступен только с localhost
+ADMIN_TOKEN = os.environ.get('SEARCH_ADMIN_TOKEN')
+
+HTTP_SECONDS = metrics.Histogram('http_request_seconds', "Flask request handling time, including template rendering.",
+                                 ['route', 'method', 'status'])
+
+# pandas и matplotlib нужны только для /evaluate, поэтому evaluation импортируется при первом обращении
+evaluation_module = None
+evaluation_job = None
+evaluation_lock = threading.Lock()
+# Хранилище документов открывается при первом запросе документа; записи, добавленные обходчиком позже,
+# подхватываются при чтении. Доступ под блокировкой: чтение может дочитывать файл смещений
+document_store = None
+document_store_lock = threading.Lock()
+background_tasks_started = False
+background_tasks_lock = threading.Lock()
+
+
+def load_evaluation():
+    global evaluation_module, evaluation_job
+    with evaluation_lock:
+        if evaluation_module is None:
+            import evaluation
+            evaluation_job = evaluation.EvaluationJob()
+            evaluation_module = evaluation
+    return evaluation_module
+
+
+def background_warm_up():
+    warm_up()
+    load_evaluation()
+
+
+def start_background_tasks():
+    """
+    Фоновые задачи процесса, который обслуживает запросы. Запускаются не при импорте: перезагрузчик werkzeug
+    (debug=True, flask run --reload) импортирует приложение и в родительском процессе, который только
+    следит за изменениями файлов, и модели в нем загружались бы зря.
+    """
+    global background_tasks_started
+    with background_tasks_lock:
+        if background_tasks_started:
+            return
+        background_tasks_started = True
+    # Модель spaCy, индекс и модули оценки загружаются в фоне, не задерживая запуск приложения
+    if os.environ.get('SEARCH_WARM_UP', '1') != '0':
+        threading.Thread(target=background_warm_up, daemon=True).start()
+    # Новые поколения индекса, записанные indexer.py, подхватываются без перезапуска
+    if os.environ.get('SEARCH_WATCH_INDEX', '1') != '0':
+        start_index_watcher()
+
+
+@app.url_defaults
+def add_cache_buster(endpoint, values):
+    if 'filename' in values and endpoint == 'static':
+        values['c'] = int(time.time())
+
+
+@app.before_request
+def start_request_timer():
+    g.started_at = time.perf_counter()
+    # Под WSGI-сервером и flask run задачи запускает первый запрос (например, проверка готовности)
+    if not background_tasks_started:
+        start_background_tasks()
+
+
+@app.after_request
+def observe_request(response):
+    started_at = g.get('started_at')
+    if started_at is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_SECONDS.observe(time.perf_counter() - started_at, route, request.method, str(response.status_code))
+    return response
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/')
+def index():
+    return render_template('index.html')
+
+
+@app.route('/search')
+def search():
+    query = request.args.get('q', '')
+    if not query:
+        return render_template('results.html', query=query, results=[], error="Please enter a query.")
+
+    mode = request.args.get('mode', 'and')
+    top_k = request.args.get('top_k', type=int)
+    # type=int превращает нечисловой top_k в None, поэтому отличаем его от отсутствующего параметра
+    if mode not in SEARCH_MODES or ('top_k' in request.args and (top_k is None or top_k < 1)):
+        return render_template('results.html', query=query, results=[],
+                               error=f"Invalid parameters: mode must be one of {SEARCH_MODES}, "
+                                     f"top_k must be a positive integer."), 400
+    fuzzy = request.args.get('fuzzy', '1' if FUZZY_DEFAULT else '0') == '1'
+    results, error = search_query(query, top_k=top_k, mode=mode, fuzzy=fuzzy)
+    return render_template('results.html', query=query, results=results, error=error)
+
+
+def api_page(query, offset, limit, mode, fuzzy):
+    page = search_page(query, offset, limit, mode, fuzzy=fuzzy)
+    return {
+        'query': query,
+        'offset': offset,
+        'limit': limit,
+        'has_more': page['has_more'],
+        'error': page['error'],
+        'terms': page['terms'],
+        'corrections': page['corrections'],
+        'results': [{'url': res['url'], 'filename': res['filename'], 'doc_id': doc_id_from_filename(res['filename']),
+                     'score': float(res['score']), 'snippet': res['snippet']} for res in page['results']],
+    }
+
+
+def page_args(source):
+    """offset, limit и mode из параметров запроса или тела JSON; None вместо mode — недопустимое значение."""
+    try:
+        offset = max(int(source.get('offset', 0)), 0)
+        limit = min(max(int(source.get('limit', API_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return None, None, None
+    mode = source.get('mode', 'and')
+    return offset, limit, mode if mode in SEARCH_MODES else None
+
+
+@app.route('/api/search')
+def api_search():
+    """
+    Страница выдачи в JSON (fuzzy=1 — исправлять опечатки). Ответ помечается ETag, зависящим от поколения индекса и параметров,
+    поэтому повторный запрос с If-None-Match получает 304 без поиска.
+    """
+    query = request.args.get('q', '')
+    offset, limit, mode = page_args(request.args)
+    if not query.strip():
+        return jsonify({'error': "Please enter a query."}), 400
+    if mode is None:
+        return jsonify({'error': f"Invalid parameters: mode must be one of {SEARCH_MODES}, "
+                                 f"offset and limit must be integers."}), 400
+
+    fuzzy = request.args.get('fuzzy', '1' if FUZZY_DEFAULT else '0') == '1'
+    etag = result_etag(query, offset, limit, mode, fuzzy)
+    if etag is not None and etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    response = jsonify(api_page(query, offset, limit, mode, fuzzy))
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
+
+@app.route('/api/search/batch', methods=['POST'])
+def api_search_batch():
+    """
+    Несколько запросов за один вызов: {"queries": [...], "offset", "limit", "mode", "fuzzy"}.
+    Все запросы токенизируются вместе одним проходом nlp.pipe.
+    """
+    body = request.get_json(silent=True) or {}
+    queries = body.get('queries')
+    offset, limit, mode = page_args(body)
+    if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+        return jsonify({'error': "Expected a JSON body with a list of query strings in 'queries'."}), 400
+    if len(queries) > API_MAX_BATCH_QUERIES:
+        return jsonify({'error': f"Too many queries: at most {API_MAX_BATCH_QUERIES} per request."}), 400
+    if mode is None:
+        return jsonify({'error': f"Invalid parameters: mode must be one of {SEARCH_MODES}, "
+                                 f"offset and limit must be integers."}), 400
+
+    fuzzy = body.get('fuzzy', FUZZY_DEFAULT)
+    # Только JSON true/false: bool("false") — True, и опечатки исправлялись бы вопреки запросу
+    if not isinstance(fuzzy, bool):
+        return jsonify({'error': "Invalid parameters: fuzzy must be a JSON boolean."}), 400
+    prepare_queries([query for query in queries if query.strip()])
+    return jsonify({'responses': [api_page(query, offset, limit, mode, fuzzy) if query.strip()
+                                  else {'query': query, 'error': "Please enter a query.", 'results': []}
+                                  for query in queries]})
+
+
+def is_admin_request():
+    if ADMIN_TOKEN:
+        return request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+
+@app.route('/admin/reload', methods=['GET', 'POST'])
+def admin_reload():
+    """POST перезагружает индекс (force=1 — даже если поколение не изменилось), GET показывает состояние."""
+    if not is_admin_request():
+        return jsonify({'error': "Forbidden."}), 403
+    if request.method == 'POST':
+        try:
+            reloaded = reload_index(force=request.args.get('force') == '1')
+        except FileNotFoundError:
+            return jsonify({'error': "Index not found. Please run indexer.py."}), 404
+        return jsonify(dict(index_status(), reloaded=reloaded))
+    return jsonify(index_status())
+
+
+@app.route('/api/suggest')
+def api_suggest():
+    """Подсказки по началу слова: леммы словаря индекса, упорядоченные по числу документов."""
+    prefix = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', SUGGEST_LIMIT, type=int), 1), SUGGEST_LIMIT)
+    suggestions, error = suggest_terms(prefix, limit)
+    if error:
+        return jsonify({'prefix': prefix, 'suggestions': [], 'error': error}), 503
+    return jsonify({'prefix': prefix, 'suggestions': [{'term': term, 'df': df} for term, df in suggestions]})
+
+
+@app.route('/api/documents/<int:doc_id>')
+def api_document(doc_id):
+    """Полный текст документа по номеру (doc_id из результатов /api/search), читается из хранилища через mmap."""
+    global document_store
+    with document_store_lock:
+        if document_store is None:
+            document_store = DocumentStore()
+        document = document_store.get(doc_id)
+    if document is None:
+        return jsonify({'error': f"Document {doc_id} not found."}), 404
+    url, text = document
+    return jsonify({'doc_id': doc_id, 'filename': doc_filename(doc_id), 'url': url, 'text': text})
+
+
+@app.route('/ready')
+def ready():
+    components = readiness()
+    components['evaluation'] = evaluation_module is not None
+    status = 200 if components['spacy_model'] and components['index'] else 503
+    return jsonify(components), status
+
+
+@app.route('/cache-stats')
+def search_cache_stats():
+    return jsonify(cache_stats())
+
+
+@app.route('/evaluate')
+def evaluate():
+    """
+    Если прогон для текущего индекса и queries.txt уже сохранен, метрики считаются сразу по файлу прогона.
+    Иначе запросы выполняются в фоне, а страница показывает прогресс и обновляется сама.
+    """
+    evaluation = load_evaluation()
+    try:
+        _, cached = evaluation.cached_run_file()
+        if not cached:
+            status = evaluation_job.status()
+            if status['error'] and not status['running']:
+                # Ошибка показывается один раз, следующее обращение запускает прогон заново
+                evaluation_job.error = None
+                return f"An error occurred during evaluation: {status['error']}"
+            evaluation_job.start()
+            status = evaluation_job.status()
+            return (f"<meta http-equiv=\"refresh\" content=\"2\">"
+                    f"<p>Evaluation is running: {status['done']} of {status['total'] or '?'} queries done.</p>")
+        metrics_df, map_score, plot_path = evaluation.run_evaluation()
+        metrics_table = metrics_df.to_html(classes='table table-striped', float_format='{:.4f}'.format)
+        return render_template('evaluation.html', map_score=map_score, metrics_table=metrics_table, plot_path=plot_path)
+    except FileNotFoundError:
+        return "Evaluation data not found. Please create `queries.txt` and `qrels.txt` in the `eval_data` directory, and run the indexer."
+    except Exception as e:
+        return f"An error occurred during evaluation: {e}"
+
+
+@app.route('/evaluate/status')
+def evaluate_status():
+    return jsonify(evaluation_job.status() if evaluation_job is not None else {'running': False})
+
+
+if __name__ == '__main__':
+    # С debug=True werkzeug перезапускает этот файл в дочернем процессе с WERKZEUG_RUN_MAIN=true,
+    # и запросы обслуживает он: прогрев начинается сразу при его запуске, не дожидаясь первого запроса
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_tasks()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,111 @@
+import os
+import sqlite3
+
+DATA_DIR = 'data'
+CHECKPOINT_FILE = os.path.join(DATA_DIR, 'crawl_checkpoint.db')
+
+
+class CrawlCheckpoint:
+    """
+    Состояние обхода в SQLite: фронтир, посещенные URL, хэши контента и счетчик документов.
+    Изменения копятся в памяти и при save() дописываются одной транзакцией,
+    поэтому стоимость контрольной точки зависит только от числа изменений, а не от размера обхода.
+    """
+
+    def __init__(self, db_file=CHECKPOINT_FILE):
+        os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_file)
+        self.cursor = self.conn.cursor()
+        self.create_tables()
+        self._clear_pending()
+
+    def create_tables(self):
+        self.cursor.executescript("""
+        CREATE TABLE IF NOT EXISTS frontier (
+            id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS visited (
+            url TEXT PRIMARY KEY
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS content_hashes (
+            hash TEXT PRIMARY KEY
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS fingerprints (
+            doc_id INTEGER PRIMARY KEY,
+            fingerprint INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        """)
+        self.conn.commit()
+
+    def _clear_pending(self):
+        self.new_urls = []
+        self.done_urls = []
+        self.new_hashes = []
+        self.new_fingerprints = []
+
+    def reset(self, start_urls):
+        """Начинает новый обход, стирая предыдущую контрольную точку."""
+        self.cursor.executescript("""
+        DELETE FROM frontier;
+        DELETE FROM visited;
+        DELETE FROM content_hashes;
+        DELETE FROM fingerprints;
+        DELETE FROM meta;
+        """)
+        self.cursor.execute("INSERT INTO meta (key, value) VALUES ('start_urls', ?)", ('\n'.join(start_urls),))
+        self.conn.commit()
+        self._clear_pending()
+
+    def enqueued(self, url):
+        self.new_urls.append(url)
+
+    def completed(self, url):
+        self.done_urls.append(url)
+
+    def hash_added(self, content_hash):
+        self.new_hashes.append(content_hash)
+
+    def fingerprint_added(self, doc_id, fingerprint):
+        # SQLite хранит знаковые 64-битные целые
+        if fingerprint >= 1 << 63:
+            fingerprint -= 1 << 64
+        self.new_fingerprints.append((doc_id, fingerprint))
+
+    def save(self, crawled_count):
+        with self.conn:
+            self.cursor.executemany("INSERT OR IGNORE INTO visited (url) VALUES (?)",
+                                    ((url,) for url in self.new_urls))
+            self.cursor.executemany("INSERT OR IGNORE INTO frontier (url) VALUES (?)",
+                                    ((url,) for url in self.new_urls))
+            self.cursor.executemany("DELETE FROM frontier WHERE url=?", ((url,) for url in self.done_urls))
+            self.cursor.executemany("INSERT OR IGNORE INTO content_hashes (hash) VALUES (?)",
+                                    ((h,) for h in self.new_hashes))
+            self.cursor.executemany("INSERT OR REPLACE INTO fingerprints (doc_id, fingerprint) VALUES (?, ?)",
+                                    self.new_fingerprints)
+            self.cursor.execute("""
+            INSERT INTO meta (key, value) VALUES ('crawled_count', ?)
+            ON CONFLICT(key) DO UPDATE SET value=excluded.value
+            """, (str(crawled_count),))
+        self._clear_pending()
+
+    def load(self):
+        """
+        Возвращает (start_urls, фронтир в порядке обхода, visited, хэши,
+        отпечатки [(doc_id, simhash)], счетчик документов).
+        """
+        meta = dict(self.cursor.execute("SELECT key, value FROM meta"))
+        start_urls = meta.get('start_urls', '').split('\n') if meta.get('start_urls') else []
+        frontier = [row[0] for row in self.cursor.execute("SELECT url FROM frontier ORDER BY id")]
+        visited = {row[0] for row in self.cursor.execute("SELECT url FROM visited")}
+        hashes = {row[0] for row in self.cursor.execute("SELECT hash FROM content_hashes")}
+        fingerprints = [(doc_id, fingerprint % (1 << 64)) for doc_id, fingerprint in
+                        self.cursor.execute("SELECT doc_id, fingerprint FROM fingerprints")]
+        return start_urls, frontier, visited, hashes, fingerprints, int(meta.get('crawled_count', 0))
+
+    def close(self):
+        self.conn.close()
\ No newline at end of file
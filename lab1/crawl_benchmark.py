@@ -0,0 +1,122 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import crawler
+from doc_store import DocumentStore
+
+PAGES = 60
+LINKS_PER_PAGE = 3
+# Каждая N-я страница повторяет текст первой: обходчик должен отбросить ее как дубликат
+DUPLICATE_EVERY = 10
+TICK_SECONDS = 0.005
+
+
+def page_html(number):
+    """Страница в разметке Википедии: несколько тысяч символов текста и ссылки на следующие страницы."""
+    source = 0 if number and number % DUPLICATE_EVERY == 0 else number
+    words = ' '.join(f"term{source}x{i} retrieval index" for i in range(300))
+    links = ''.join(f'<a href="/wiki/Page_{number * LINKS_PER_PAGE + k}">link</a> '
+                    for k in range(1, LINKS_PER_PAGE + 1))
+    return (f'<html><body><div id="mw-content-text"><table class="infobox"><tr><td>box</td></tr></table>'
+            f'<p>{words}</p><p>{links}</p></div></body></html>')
+
+
+class WikiHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        name = self.path.rsplit('/', 1)[-1]
+        if not name.startswith('Page_') or not name[len('Page_'):].isdigit():
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = page_html(int(name[len('Page_'):])).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    """Локальный сервер в фоновом потоке; возвращает (сервер, адрес первой страницы)."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), WikiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/wiki/Page_0"
+
+
+async def measure_loop_lag(stop, lags):
+    """Насколько позже срока просыпается корутина: столько цикл событий был занят чужой работой."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK_SECONDS
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append((loop.time() - expected) * 1000)
+
+
+async def crawl_with_lag(start_url, max_pages, concurrency):
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(measure_loop_lag(stop, lags))
+    try:
+        pages_per_sec = await crawler.async_crawl([start_url], max_pages=max_pages, concurrency=concurrency,
+                                                  per_host_concurrency=concurrency, per_host_delay=0)
+    finally:
+        stop.set()
+        await ticker
+    return pages_per_sec, np.array(lags)
+
+
+def check_store(max_pages):
+    """Проверяет сохраненное: нужное число документов, без повторов URL и текста. Возвращает число ошибок."""
+    store = DocumentStore()
+    documents = [(url, text) for _, url, text in store.iter_documents()]
+    store.close()
+    errors = 0
+    if len(documents) != max_pages:
+        print(f"Сохранено {len(documents)} документов вместо {max_pages}")
+        errors += 1
+    if len({url for url, _ in documents}) != len(documents):
+        print("Одна и та же страница сохранена несколько раз")
+        errors += 1
+    if len({text for _, text in documents}) != len(documents):
+        print("Сохранены дубликаты")
+        errors += 1
+    return errors
+
+
+def run_benchmark(max_pages=PAGES, concurrency=crawler.DEFAULT_CONCURRENCY, extractor='bs4'):
+    server, start_url = start_server()
+    crawler.set_extractor(extractor)
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Обходчик пишет хранилище, контрольную точку и кэш ответов в data/ текущего каталога
+        os.chdir(work_dir)
+        try:
+            started_at = time.perf_counter()
+            pages_per_sec, lags = asyncio.run(crawl_with_lag(start_url, max_pages, concurrency))
+            elapsed = time.perf_counter() - started_at
+            errors = check_store(max_pages)
+        finally:
+            os.chdir(previous_dir)
+            server.shutdown()
+    print(f"\nОбход локального сервера ({extractor}, параллельно {concurrency}): {max_pages} страниц "
+          f"за {elapsed:.2f} с ({pages_per_sec:.1f} стр/с)")
+    print(f"Задержка цикла событий: p50 {np.percentile(lags, 50):.1f} мс, p99 {np.percentile(lags, 99):.1f} мс, "
+          f"макс. {lags.max():.1f} мс; ошибок: {errors}")
+    return errors
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Асинхронный обход локального тестового сервера")
+    parser.add_argument('--max-pages', type=int, default=PAGES)
+    parser.add_argument('--concurrency', type=int, default=crawler.DEFAULT_CONCURRENCY)
+    parser.add_argument('--extractor', choices=sorted(crawler.EXTRACTORS), default='bs4')
+    args = parser.parse_args()
+    sys.exit(1 if run_benchmark(args.max_pages, args.concurrency, args.extractor) else 0)
\ No newline at end of file
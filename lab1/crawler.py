@@ -1,112 +1,667 @@
-import requests
-from bs4 import BeautifulSoup
-import os
-from urllib.parse import urljoin, urlparse
-import time
-import hashlib
-
-DATA_DIR = 'data'
-CRAWLED_FILES_DIR = os.path.join(DATA_DIR, 'crawled')
-
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-}
-
-content_hashes = set()
-
-
-def extract_meaningful_content_and_links(soup):
-    main_content = soup.find(id='mw-content-text')
-    links = []
-    text = ""
-
-    if main_content:
-        for tag in main_content.find_all(['table', 'div'],
-                                         class_=['infobox', 'toc', 'thumb', 'gallery', 'reflist', 'navbox']):
-            tag.decompose()
-        for tag in main_content.find_all('span', class_='mw-editsection'):
-            tag.decompose()
-
-        text = main_content.get_text(separator=' ', strip=True)
-
-        for link in main_content.find_all('a', href=True):
-            href = link['href']
-            if href.startswith('/wiki/') and ':' not in href:
-                links.append(href)
-
-        return text, links
-
-    body = soup.body
-    if body:
-        text = body.get_text(separator=' ', strip=True)
-        links = [link['href'] for link in body.find_all('a', href=True)]
-
-    return text, links
-
-
-def crawl(start_urls, max_pages=20):
-    os.makedirs(CRAWLED_FILES_DIR, exist_ok=True)
-
-    queue = list(start_urls)
-    visited = set(start_urls)
-    crawled_count = 0
-
-    print(f"Начинаем тематический обход. Максимум страниц: {max_pages}")
-
-    while queue and crawled_count < max_pages:
-        url = queue.pop(0)
-
-        parsed_url = urlparse(url)
-        path_segments = parsed_url.path.split('/')
-        if (any(':' in segment for segment in
-                path_segments) and not url in start_urls) or 'action=' in parsed_url.query:
-            print(f"\nПропускаем служебный URL: {url}")
-            continue
-
-        print(f"\n[{crawled_count + 1}/{max_pages}] Попытка скачивания: {url}")
-
-        try:
-            response = requests.get(url, headers=HEADERS, timeout=10)
-
-            if response.status_code != 200 or 'text/html' not in response.headers.get('Content-Type', ''):
-                continue
-
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            text, internal_links = extract_meaningful_content_and_links(soup)
-
-            if len(text) < 1000:
-                print(f"-> Пропускаем URL: слишком мало полезного текста ({len(text)} символов).")
-                continue
-
-            content_hash = hashlib.md5(text.encode('utf-8')).hexdigest()
-            if content_hash in content_hashes:
-                print("-> Пропускаем URL: контент является дубликатом.")
-                continue
-            content_hashes.add(content_hash)
-
-            filename = f"doc_{crawled_count}.txt"
-            filepath = os.path.join(CRAWLED_FILES_DIR, filename)
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(url + '\n')
-                f.write(text)
-
-            print(f"-> УСПЕХ! Страница сохранена в {filepath}")
-            crawled_count += 1
-
-            for link_path in internal_links:
-                abs_link = urljoin(url, link_path)
-                if abs_link not in visited:
-                    visited.add(abs_link)
-                    queue.append(abs_link)
-
-            time.sleep(1)
-
-        except requests.RequestException as e:
-            print(f"-> ОШИБКА! Не удалось скачать {url}: {e}")
-
-
-if __name__ == '__main__':
-    initial_urls = ['https://en.wikipedia.org/wiki/Information_retrieval']
-    crawl(initial_urls, max_pages=20)
+import requests
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin, urlparse
+import time
+import hashlib
+import re
+import argparse
+import asyncio
+import heapq
+from collections import deque
+import aiohttp
+import lxml.html
+from checkpoint import CrawlCheckpoint
+from near_duplicates import SimHashIndex, simhash, DEFAULT_MAX_DISTANCE
+from response_cache import ResponseCache
+from doc_store import DocumentStore, doc_filename, DOC_STORE_DIR
+import metrics
+
+DATA_DIR = 'data'
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+REQUEST_TIMEOUT = 10
+MIN_TEXT_LENGTH = 1000
+
+# Блоки, которые не относятся к основному тексту статьи
+NOISE_CLASSES = ['infobox', 'toc', 'thumb', 'gallery', 'reflist', 'navbox']
+# Содержимое этих тегов BeautifulSoup не включает в get_text()
+NON_TEXT_TAGS = {'script', 'style', 'template'}
+
+# Параметры асинхронного режима
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PER_HOST_CONCURRENCY = 2
+DEFAULT_PER_HOST_DELAY = 1.0
+
+# Контрольная точка сохраняется после каждых N сохраненных страниц
+CHECKPOINT_EVERY = 10
+
+content_hashes = set()
+near_duplicates = SimHashIndex()
+document_store = None
+
+FETCH_SECONDS = metrics.Histogram('crawler_fetch_seconds', "Time to download a page.")
+FETCHES = metrics.Counter('crawler_fetches_total', "Page downloads by HTTP status.", ['status'])
+FETCH_ERRORS = metrics.Counter('crawler_fetch_errors_total', "Downloads that failed with a network error or timeout.")
+PAGES = metrics.Counter('crawler_pages_total', "Processed pages by outcome.", ['outcome'])
+
+
+def extract_meaningful_content_and_links(soup):
+    main_content = soup.find(id='mw-content-text')
+    links = []
+    text = ""
+
+    if main_content:
+        for tag in main_content.find_all(['table', 'div'], class_=NOISE_CLASSES):
+            tag.decompose()
+        for tag in main_content.find_all('span', class_='mw-editsection'):
+            tag.decompose()
+
+        text = main_content.get_text(separator=' ', strip=True)
+
+        for link in main_content.find_all('a', href=True):
+            href = link['href']
+            if href.startswith('/wiki/') and ':' not in href:
+                links.append(href)
+
+        return text, links
+
+    body = soup.body
+    if body:
+        text = body.get_text(separator=' ', strip=True)
+        links = [link['href'] for link in body.find_all('a', href=True)]
+
+    return text, links
+
+
+def _class_test(class_names):
+    return ' or '.join(f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')" for name in class_names)
+
+
+NOISE_XPATH = f".//table[{_class_test(NOISE_CLASSES)}] | .//div[{_class_test(NOISE_CLASSES)}]"
+EDITSECTION_XPATH = f".//span[{_class_test(['mw-editsection'])}]"
+BODY_TAG_RE = re.compile(r'<body[\s>/]', re.IGNORECASE)
+
+
+def _lxml_walk(element, skipped, strings, anchors, with_text=True):
+    # Удаленные блоки не вырезаются из дерева, а пропускаются: drop_tree() склеил бы соседние
+    # текстовые узлы, и результат разошелся бы с get_text(separator=' ') из BeautifulSoup
+    if element.tag == 'a' and 'href' in element.attrib:
+        anchors.append(element.get('href'))
+    if with_text and element.text:
+        strings.append(element.text)
+    for child in element:
+        # У комментариев и инструкций обработки tag не строка: их текст пропускаем, хвост — нет
+        if isinstance(child.tag, str) and child not in skipped:
+            _lxml_walk(child, skipped, strings, anchors, with_text and child.tag not in NON_TEXT_TAGS)
+        if with_text and child.tail:
+            strings.append(child.tail)
+
+
+def _lxml_text_and_links(element, skipped=frozenset()):
+    strings, anchors = [], []
+    _lxml_walk(element, skipped, strings, anchors)
+    return ' '.join(text for text in (s.strip() for s in strings) if text), anchors
+
+
+def extract_with_lxml(html):
+    """То же, что extract_meaningful_content_and_links, но на дереве lxml без BeautifulSoup."""
+    try:
+        root = lxml.html.document_fromstring(html)
+    except lxml.etree.ParserError:
+        return "", []
+
+    main_content = root.xpath('//*[@id="mw-content-text"]')
+    if main_content:
+        main_content = main_content[0]
+        skipped = set(main_content.xpath(NOISE_XPATH)) | set(main_content.xpath(EDITSECTION_XPATH))
+        text, anchors = _lxml_text_and_links(main_content, skipped)
+        return text, [href for href in anchors if href.startswith('/wiki/') and ':' not in href]
+
+    # html.parser не достраивает <body>, а lxml добавляет его всегда
+    body = root.find('body')
+    if body is None or not BODY_TAG_RE.search(html):
+        return "", []
+    return _lxml_text_and_links(body)
+
+
+def extract_with_bs4(html):
+    return extract_meaningful_content_and_links(BeautifulSoup(html, 'html.parser'))
+
+
+EXTRACTORS = {
+    'bs4': extract_with_bs4,
+    'lxml': extract_with_lxml,
+}
+extract_page = extract_with_bs4
+
+
+def set_extractor(name):
+    global extract_page
+    extract_page = EXTRACTORS[name]
+
+
+def is_service_url(url, start_urls):
+    parsed_url = urlparse(url)
+    path_segments = parsed_url.path.split('/')
+    return (any(':' in segment for segment in path_segments) and url not in start_urls) \
+        or 'action=' in parsed_url.query
+
+
+def analyze_page(html):
+    """
+    Разбор страницы без обращения к общему состоянию обходчика, поэтому его можно выполнять в другом потоке.
+    Возвращает (текст, ссылки, MD5 текста, SimHash); у слишком коротких страниц хэш и отпечаток — None.
+    """
+    text, internal_links = extract_page(html)
+    if len(text) < MIN_TEXT_LENGTH:
+        return text, internal_links, None, None
+    return text, internal_links, hashlib.md5(text.encode('utf-8')).hexdigest(), simhash(text)
+
+
+def accept_page(url, page, doc_id, checkpoint=None):
+    """
+    Отбрасывает короткие страницы и дубликаты и сохраняет документ в хранилище под номером doc_id.
+    page — результат analyze_page. Возвращает (имя документа doc_<doc_id>.txt или None,
+    список абсолютных ссылок, хэш текста).
+    """
+    text, internal_links, content_hash, fingerprint = page
+
+    if content_hash is None:
+        print(f"-> Пропускаем URL: слишком мало полезного текста ({len(text)} символов).")
+        PAGES.inc('short')
+        return None, [], None
+
+    if content_hash in content_hashes:
+        print("-> Пропускаем URL: контент является дубликатом.")
+        PAGES.inc('duplicate')
+        return None, [], None
+
+    near_duplicate = near_duplicates.find(fingerprint)
+    if near_duplicate:
+        print(f"-> Пропускаем URL: почти-дубликат doc_{near_duplicate[0]} (расстояние {near_duplicate[1]}).")
+        PAGES.inc('near_duplicate')
+        return None, [], None
+
+    content_hashes.add(content_hash)
+    near_duplicates.add(doc_id, fingerprint)
+    if checkpoint:
+        checkpoint.hash_added(content_hash)
+        checkpoint.fingerprint_added(doc_id, fingerprint)
+
+    filename = save_document(doc_id, url, text, content_hash)
+    PAGES.inc('saved')
+    return filename, [urljoin(url, link_path) for link_path in internal_links], content_hash
+
+
+def process_page(url, html, doc_id, checkpoint=None):
+    """Разбор и сохранение страницы в одном потоке (синхронный обход); см. analyze_page и accept_page."""
+    return accept_page(url, analyze_page(html), doc_id, checkpoint)
+
+
+def save_document(doc_id, url, text, content_hash=None):
+    document_store.append(doc_id, url, text, content_hash)
+    return doc_filename(doc_id)
+
+
+def report_speed(crawled_count, started_at):
+    elapsed = time.perf_counter() - started_at
+    pages_per_sec = crawled_count / elapsed if elapsed > 0 else 0.0
+    print(f"\nСохранено страниц: {crawled_count} за {elapsed:.1f} с ({pages_per_sec:.2f} стр/с).")
+    near_duplicates.report()
+    return pages_per_sec
+
+
+def recover_saved_documents(crawled_count, checkpoint, response_cache):
+    """
+    Учитывает документы, сохраненные после последней контрольной точки:
+    они уже в хранилище, поэтому повторно не скачиваются.
+    """
+    recovered = set()
+    while crawled_count in document_store:
+        url, text = document_store.get(crawled_count)
+        content_hash = hashlib.md5(text.encode('utf-8')).hexdigest()
+        fingerprint = simhash(text)
+        content_hashes.add(content_hash)
+        near_duplicates.add(crawled_count, fingerprint)
+        checkpoint.hash_added(content_hash)
+        checkpoint.fingerprint_added(crawled_count, fingerprint)
+        checkpoint.completed(url)
+        response_cache.store(url, crawled_count, None, None, content_hash)
+        recovered.add(url)
+        crawled_count += 1
+    return crawled_count, recovered
+
+
+def open_checkpoint(start_urls, resume, response_cache, near_dup_distance=DEFAULT_MAX_DISTANCE):
+    """Возвращает (checkpoint, start_urls, фронтир, visited, счетчик документов)."""
+    global near_duplicates
+    near_duplicates = SimHashIndex(near_dup_distance)
+    content_hashes.clear()
+    checkpoint = CrawlCheckpoint()
+
+    if not resume:
+        checkpoint.reset(start_urls)
+        response_cache.reset()
+        # Документы прошлого обхода тоже сбрасываются: иначе при продолжении этого обхода
+        # recover_saved_documents приняла бы их за сохраненные после контрольной точки,
+        # а индексатор проиндексировал бы устаревшие страницы
+        document_store.clear()
+        for url in start_urls:
+            checkpoint.enqueued(url)
+        checkpoint.save(0)
+        return checkpoint, list(start_urls), list(start_urls), set(start_urls), 0
+
+    saved_start_urls, frontier, visited, hashes, fingerprints, crawled_count = checkpoint.load()
+    content_hashes.update(hashes)
+    for doc_id, fingerprint in fingerprints:
+        near_duplicates.add(doc_id, fingerprint)
+    crawled_count, recovered = recover_saved_documents(crawled_count, checkpoint, response_cache)
+    frontier = [url for url in frontier if url not in recovered]
+    checkpoint.save(crawled_count)
+    response_cache.commit()
+
+    print(f"Продолжаем обход с контрольной точки: сохранено {crawled_count} страниц, "
+          f"в очереди {len(frontier)}, посещено {len(visited)}.")
+    return checkpoint, saved_start_urls or list(start_urls), frontier, visited, crawled_count
+
+
+def crawl(start_urls, max_pages=20, resume=False, checkpoint_every=CHECKPOINT_EVERY,
+          near_dup_distance=DEFAULT_MAX_DISTANCE):
+    global document_store
+    document_store = DocumentStore()
+    response_cache = ResponseCache()
+    checkpoint, start_urls, frontier, visited, crawled_count = open_checkpoint(start_urls, resume, response_cache,
+                                                                               near_dup_distance)
+    queue = deque(frontier)
+    started_count = crawled_count
+    next_checkpoint = crawled_count + checkpoint_every
+    started_at = time.perf_counter()
+
+    print(f"Начинаем тематический обход. Максимум страниц: {max_pages}")
+
+    try:
+        while queue and crawled_count < max_pages:
+            url = queue.popleft()
+
+            if is_service_url(url, start_urls):
+                print(f"\nПропускаем служебный URL: {url}")
+                PAGES.inc('service_url')
+                checkpoint.completed(url)
+                continue
+
+            print(f"\n[{crawled_count + 1}/{max_pages}] Попытка скачивания: {url}")
+
+            try:
+                fetch_started_at = time.perf_counter()
+                response = requests.get(url, headers=HEADERS, timeout=REQUEST_TIMEOUT)
+                FETCH_SECONDS.observe(time.perf_counter() - fetch_started_at)
+                FETCHES.inc(str(response.status_code))
+
+                if response.status_code != 200 or 'text/html' not in response.headers.get('Content-Type', ''):
+                    continue
+
+                filename, links, content_hash = process_page(url, response.text, crawled_count, checkpoint)
+                if filename is None:
+                    continue
+
+                print(f"-> УСПЕХ! Страница сохранена как {filename} в {DOC_STORE_DIR}")
+                response_cache.store(url, crawled_count, response.headers.get('ETag'),
+                                     response.headers.get('Last-Modified'), content_hash)
+                crawled_count += 1
+
+                for abs_link in links:
+                    if abs_link not in visited:
+                        visited.add(abs_link)
+                        queue.append(abs_link)
+                        checkpoint.enqueued(abs_link)
+
+                time.sleep(1)
+
+            except requests.RequestException as e:
+                print(f"-> ОШИБКА! Не удалось скачать {url}: {e}")
+                FETCH_ERRORS.inc()
+            finally:
+                checkpoint.completed(url)
+                if crawled_count >= next_checkpoint:
+                    checkpoint.save(crawled_count)
+                    response_cache.commit()
+                    next_checkpoint = crawled_count + checkpoint_every
+    finally:
+        checkpoint.save(crawled_count)
+        checkpoint.close()
+        response_cache.close()
+        document_store.close()
+
+    return report_speed(crawled_count - started_count, started_at)
+
+
+class HostFrontier:
+    """
+    Фронтир, разбитый на очереди по хостам. Выдает URL только того хоста,
+    у которого есть свободный слот и истекла пауза после предыдущего запроса.
+    """
+
+    def __init__(self, per_host_concurrency, per_host_delay):
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_delay = per_host_delay
+        self.queues = {}
+        self.active = {}
+        self.next_time = {}
+        self.ready = []  # куча (время готовности, хост)
+        self.scheduled = set()
+        self.size = 0
+
+    def _schedule(self, host):
+        if host in self.scheduled or not self.queues.get(host):
+            return
+        if self.active.get(host, 0) >= self.per_host_concurrency:
+            return
+        heapq.heappush(self.ready, (self.next_time.get(host, 0.0), host))
+        self.scheduled.add(host)
+
+    def push(self, url):
+        host = urlparse(url).netloc
+        self.queues.setdefault(host, deque()).append(url)
+        self.size += 1
+        self._schedule(host)
+
+    def pop(self, now):
+        """Возвращает (url, None) или (None, сколько секунд ждать до готовности хоста)."""
+        if not self.ready:
+            return None, None
+        ready_at, host = self.ready[0]
+        if ready_at > now:
+            return None, ready_at - now
+        heapq.heappop(self.ready)
+        self.scheduled.discard(host)
+
+        url = self.queues[host].popleft()
+        self.size -= 1
+        self.active[host] = self.active.get(host, 0) + 1
+        self.next_time[host] = now + self.per_host_delay
+        self._schedule(host)
+        return url, None
+
+    def release(self, url):
+        host = urlparse(url).netloc
+        self.active[host] -= 1
+        self._schedule(host)
+
+    def __len__(self):
+        return self.size
+
+
+async def run_frontier(frontier, handle_url, concurrency, per_host_concurrency,
+                       should_stop=lambda: False, on_done=None):
+    """
+    Раздает URL из фронтира пулу из concurrency воркеров с общим пулом соединений.
+    handle_url(session, url) может добавлять новые URL во фронтир;
+    on_done(url) вызывается после обработки каждого URL.
+    """
+    changed = asyncio.Condition()
+    loop = asyncio.get_running_loop()
+    in_flight = 0
+
+    async def worker(session):
+        nonlocal in_flight
+        while True:
+            async with changed:
+                while True:
+                    if should_stop():
+                        return
+                    url, wait = frontier.pop(loop.time())
+                    if url is not None:
+                        break
+                    if not len(frontier) and not in_flight:
+                        changed.notify_all()
+                        return
+                    try:
+                        await asyncio.wait_for(changed.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+                in_flight += 1
+
+            try:
+                await handle_url(session, url)
+            finally:
+                async with changed:
+                    in_flight -= 1
+                    frontier.release(url)
+                    if on_done:
+                        on_done(url)
+                    changed.notify_all()
+
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host_concurrency)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=HEADERS) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+
+
+async def async_crawl(start_urls, max_pages=20, concurrency=DEFAULT_CONCURRENCY,
+                      per_host_concurrency=DEFAULT_PER_HOST_CONCURRENCY,
+                      per_host_delay=DEFAULT_PER_HOST_DELAY, resume=False, checkpoint_every=CHECKPOINT_EVERY,
+                      near_dup_distance=DEFAULT_MAX_DISTANCE):
+    global document_store
+    document_store = DocumentStore()
+    response_cache = ResponseCache()
+    checkpoint, start_urls, pending, visited, crawled_count = open_checkpoint(start_urls, resume, response_cache,
+                                                                              near_dup_distance)
+    frontier = HostFrontier(per_host_concurrency, per_host_delay)
+    for url in pending:
+        frontier.push(url)
+
+    state = {'crawled_count': crawled_count, 'next_checkpoint': crawled_count + checkpoint_every}
+    loop = asyncio.get_running_loop()
+    started_at = time.perf_counter()
+
+    print(f"Начинаем асинхронный обход. Максимум страниц: {max_pages}, "
+          f"параллельно: {concurrency}, на хост: {per_host_concurrency}, пауза: {per_host_delay} с")
+
+    async def fetch_and_process(session, url):
+        if is_service_url(url, start_urls):
+            print(f"Пропускаем служебный URL: {url}")
+            PAGES.inc('service_url')
+            return
+
+        try:
+            fetch_started_at = time.perf_counter()
+            async with session.get(url) as response:
+                FETCHES.inc(str(response.status))
+                html = None
+                if response.status == 200 and 'text/html' in response.headers.get('Content-Type', ''):
+                    html = await response.text()
+            # Время учитывается для любого ответа, как в синхронном режиме, а не только для сохраняемых страниц
+            FETCH_SECONDS.observe(time.perf_counter() - fetch_started_at)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"-> ОШИБКА! Не удалось скачать {url}: {e}")
+            FETCH_ERRORS.inc()
+            return
+        if html is None:
+            return
+
+        # Разбор HTML занимает процессор, поэтому идет в пуле потоков, чтобы не останавливать цикл событий
+        # с другими загрузками. Проверка дубликатов, сохранение и контрольная точка остаются в потоке цикла:
+        # между ними нет await, и номер документа не может достаться двум страницам
+        page = await loop.run_in_executor(None, analyze_page, html)
+        if state['crawled_count'] >= max_pages:
+            return
+        filename, links, content_hash = accept_page(url, page, state['crawled_count'], checkpoint)
+        if filename is None:
+            return
+
+        response_cache.store(url, state['crawled_count'], response.headers.get('ETag'),
+                             response.headers.get('Last-Modified'), content_hash)
+        state['crawled_count'] += 1
+        print(f"[{state['crawled_count']}/{max_pages}] УСПЕХ! {url} -> {filename}")
+
+        for abs_link in links:
+            if abs_link not in visited:
+                visited.add(abs_link)
+                frontier.push(abs_link)
+                checkpoint.enqueued(abs_link)
+
+    def on_done(url):
+        checkpoint.completed(url)
+        if state['crawled_count'] >= state['next_checkpoint']:
+            checkpoint.save(state['crawled_count'])
+            response_cache.commit()
+            state['next_checkpoint'] = state['crawled_count'] + checkpoint_every
+
+    try:
+        await run_frontier(frontier, fetch_and_process, concurrency, per_host_concurrency,
+                           should_stop=lambda: state['crawled_count'] >= max_pages, on_done=on_done)
+    finally:
+        checkpoint.save(state['crawled_count'])
+        checkpoint.close()
+        response_cache.close()
+        document_store.close()
+
+    return report_speed(state['crawled_count'] - crawled_count, started_at)
+
+
+async def recrawl(concurrency=DEFAULT_CONCURRENCY, per_host_concurrency=DEFAULT_PER_HOST_CONCURRENCY,
+                  per_host_delay=DEFAULT_PER_HOST_DELAY):
+    """
+    Повторный обход уже сохраненных страниц с условными запросами (If-None-Match / If-Modified-Since).
+    Неизменившиеся документы не извлекаются и не перезаписываются. Отдельный список изменений не нужен:
+    indexer.py --update сравнивает хэши, записанные в хранилище, и перечитывает только изменившиеся документы.
+    Возвращает сводку: измененные и удаленные документы и счетчики ответов.
+    """
+    global document_store
+    response_cache = ResponseCache()
+    pages = response_cache.get_all()
+    if not pages:
+        print("Кэш ответов пуст. Сначала выполните обычный обход.")
+        response_cache.close()
+        return None
+
+    document_store = DocumentStore()
+    frontier = HostFrontier(per_host_concurrency, per_host_delay)
+    for url in pages:
+        frontier.push(url)
+
+    manifest = {'changed': [], 'deleted': [], 'unchanged': 0, 'not_modified': 0, 'errors': 0}
+    loop = asyncio.get_running_loop()
+    started_at = time.perf_counter()
+
+    print(f"Повторный обход {len(pages)} страниц.")
+
+    async def revalidate(session, url):
+        doc_id, etag, last_modified, old_hash = pages[url]
+        conditional_headers = {}
+        if etag:
+            conditional_headers['If-None-Match'] = etag
+        if last_modified:
+            conditional_headers['If-Modified-Since'] = last_modified
+
+        try:
+            fetch_started_at = time.perf_counter()
+            async with session.get(url, headers=conditional_headers) as response:
+                FETCHES.inc(str(response.status))
+                html = None
+                if response.status == 200 and 'text/html' in response.headers.get('Content-Type', ''):
+                    html = await response.text()
+            # 304 и удаленные страницы — большая часть ответов повторного обхода, их время тоже учитывается
+            FETCH_SECONDS.observe(time.perf_counter() - fetch_started_at)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"-> ОШИБКА! Не удалось скачать {url}: {e}")
+            manifest['errors'] += 1
+            FETCH_ERRORS.inc()
+            return
+
+        if response.status == 304:
+            manifest['not_modified'] += 1
+            PAGES.inc('not_modified')
+            return
+        if response.status in (404, 410):
+            print(f"-> Страница удалена: {url}")
+            PAGES.inc('deleted')
+            manifest['deleted'].append({'doc_id': doc_id, 'filename': doc_filename(doc_id), 'url': url})
+            response_cache.remove(url)
+            document_store.delete(doc_id)
+            return
+        if html is None:
+            manifest['errors'] += 1
+            return
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+
+        text, _ = await loop.run_in_executor(None, extract_page, html)
+        content_hash = hashlib.md5(text.encode('utf-8')).hexdigest()
+        if len(text) < MIN_TEXT_LENGTH:
+            # В хранилище остается прежняя версия, значит и в кэше ответов остается ее хэш: иначе кэш описывал бы
+            # несохраненный текст, а возвращение прежнего текста попало бы в список изменений и в переиндексацию
+            print(f"-> Страница стала слишком короткой ({len(text)} символов), оставляем прежнюю версию: {url}")
+            manifest['unchanged'] += 1
+            PAGES.inc('short')
+            content_hash = old_hash
+        elif content_hash == old_hash:
+            manifest['unchanged'] += 1
+            PAGES.inc('unchanged')
+        else:
+            filename = save_document(doc_id, url, text, content_hash)
+            print(f"-> Документ обновлен: {filename}")
+            PAGES.inc('changed')
+            manifest['changed'].append({'doc_id': doc_id, 'filename': filename, 'url': url})
+        response_cache.store(url, doc_id, etag, last_modified, content_hash)
+
+    try:
+        await run_frontier(frontier, revalidate, concurrency, per_host_concurrency)
+    finally:
+        response_cache.close()
+        document_store.close()
+
+    elapsed = time.perf_counter() - started_at
+    print(f"\nПовторный обход завершен за {elapsed:.1f} с: изменено {len(manifest['changed'])}, "
+          f"удалено {len(manifest['deleted'])}, не изменилось {manifest['unchanged']}, "
+          f"304 Not Modified {manifest['not_modified']}, ошибок {manifest['errors']}.")
+    return manifest
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Тематический обходчик Википедии")
+    parser.add_argument('urls', nargs='*', default=['https://en.wikipedia.org/wiki/Information_retrieval'])
+    parser.add_argument('--max-pages', type=int, default=20)
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="асинхронный режим с пулом соединений")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help="общее число одновременных запросов")
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST_CONCURRENCY,
+                        help="число одновременных запросов к одному хосту")
+    parser.add_argument('--delay', type=float, default=DEFAULT_PER_HOST_DELAY,
+                        help="минимальная пауза между запросами к одному хосту, с")
+    parser.add_argument('--extractor', choices=sorted(EXTRACTORS), default='bs4',
+                        help="способ извлечения текста и ссылок из HTML")
+    parser.add_argument('--recrawl', action='store_true',
+                        help="повторно проверить сохраненные страницы условными запросами")
+    parser.add_argument('--resume', action='store_true',
+                        help="продолжить обход с последней контрольной точки")
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_EVERY,
+                        help="сохранять контрольную точку после каждых N страниц")
+    parser.add_argument('--near-dup-distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                        help="максимальное расстояние Хэмминга между SimHash-отпечатками почти-дубликатов")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    set_extractor(args.extractor)
+    try:
+        if args.recrawl:
+            asyncio.run(recrawl(concurrency=args.concurrency, per_host_concurrency=args.per_host,
+                                per_host_delay=args.delay))
+        elif args.use_async:
+            asyncio.run(async_crawl(args.urls, max_pages=args.max_pages, concurrency=args.concurrency,
+                                    per_host_concurrency=args.per_host, per_host_delay=args.delay,
+                                    resume=args.resume, checkpoint_every=args.checkpoint_every,
+                                    near_dup_distance=args.near_dup_distance))
+        else:
+            crawl(args.urls, max_pages=args.max_pages, resume=args.resume, checkpoint_every=args.checkpoint_every,
+                  near_dup_distance=args.near_dup_distance)
+    finally:
+        # Метрики прерванного обхода тоже сохраняются: по ним видно, сколько успели скачать и сколько было ошибок
+        metrics.write_textfile('crawler')
     print("\nОбход завершен.")
\ No newline at end of file
@@ -0,0 +1,325 @@
+import argparse
+import hashlib
+import mmap
+import os
+import re
+import time
+import zlib
+import numpy as np
+
+DATA_DIR = 'data'
+DOC_STORE_DIR = os.path.join(DATA_DIR, 'docstore')
+# Каталог, куда прежние версии обходчика сохраняли каждую страницу отдельным файлом doc_N.txt
+LEGACY_CRAWLED_DIR = os.path.join(DATA_DIR, 'crawled')
+OFFSETS_FILE = 'offsets.bin'
+# Новый файл данных начинается, когда текущий вырос больше этого размера
+SEGMENT_SIZE = 64 * 1024 * 1024
+COMPRESSION_LEVEL = 6
+# Запись файла смещений: номер документа, файл данных, длина сжатой записи (-1 — документ удален),
+# смещение в файле данных и MD5 текста, по которому indexer.py --update находит изменения без распаковки
+ENTRY_DTYPE = np.dtype([('doc_id', '<i8'), ('segment', '<i4'), ('length', '<i4'), ('offset', '<i8'),
+                        ('hash', 'u1', 16)])
+DOC_FILENAME_RE = re.compile(r'^doc_(\d+)\.txt$')
+
+
+def doc_filename(doc_id):
+    """Имя документа в индексе и в qrels.txt — то же, что у файлов прежнего формата."""
+    return f"doc_{doc_id}.txt"
+
+
+def doc_id_from_filename(filename):
+    match = DOC_FILENAME_RE.match(filename)
+    return int(match.group(1)) if match else None
+
+
+def text_hash(text):
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+
+def segment_path(directory, segment):
+    return os.path.join(directory, f"segment_{segment:06d}.dat")
+
+
+class DocumentStore:
+    """
+    Документы обхода в нескольких больших файлах данных вместо файла на страницу. Записи (URL и текст,
+    сжатые zlib) только дописываются в конец; OFFSETS_FILE хранит, где лежит каждая версия документа,
+    действует последняя. Файлы данных читаются через mmap: документ по номеру — срез и распаковка,
+    без open/read. Писать в хранилище одновременно может только один процесс.
+    """
+
+    def __init__(self, directory=DOC_STORE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.offsets_path = os.path.join(directory, OFFSETS_FILE)
+        self.maps = {}
+        self.data_file = None
+        self.offsets_file = None
+        # Свои записи дочитываются из файла смещений при следующем чтении, а не после каждой записи
+        self.stale = False
+        self.reset()
+        self.refresh()
+
+    def reset(self):
+        self.entries = np.zeros(0, dtype=ENTRY_DTYPE)
+        # Номер документа -> строка его последней версии в entries, -1 — документа нет
+        self.latest = np.full(0, -1, dtype=np.int64)
+        self.loaded = (None, 0)
+
+    def refresh(self):
+        """Дочитывает записи, добавленные другим процессом; после сжатия хранилища перечитывает все."""
+        self.stale = False
+        try:
+            stat = os.stat(self.offsets_path)
+        except FileNotFoundError:
+            return
+        # Недописанная при сбое запись в конце файла не учитывается
+        size = stat.st_size - stat.st_size % ENTRY_DTYPE.itemsize
+        inode, loaded_size = self.loaded
+        if inode != stat.st_ino or size < loaded_size:
+            self.close_maps()
+            self.reset()
+            loaded_size = 0
+        if size == loaded_size:
+            return
+        new = np.fromfile(self.offsets_path, dtype=ENTRY_DTYPE, count=(size - loaded_size) // ENTRY_DTYPE.itemsize,
+                          offset=loaded_size)
+        rows = np.arange(len(self.entries), len(self.entries) + len(new))
+        self.entries = np.concatenate([self.entries, new])
+        if len(new):
+            max_doc_id = int(new['doc_id'].max())
+            if max_doc_id >= len(self.latest):
+                self.latest = np.concatenate([self.latest, np.full(max_doc_id + 1 - len(self.latest), -1,
+                                                                   dtype=np.int64)])
+            # Если документ встречается в новых записях несколько раз, действует последняя из них
+            doc_ids, last = np.unique(new['doc_id'][::-1], return_index=True)
+            self.latest[doc_ids] = rows[::-1][last]
+        self.loaded = (stat.st_ino, size)
+
+    def entry(self, doc_id):
+        """Запись последней версии документа или None, если документа нет или он удален."""
+        if self.stale or not 0 <= doc_id < len(self.latest) or self.latest[doc_id] < 0:
+            self.refresh()
+        if not 0 <= doc_id < len(self.latest) or self.latest[doc_id] < 0:
+            return None
+        entry = self.entries[self.latest[doc_id]]
+        return entry if entry['length'] >= 0 else None
+
+    def __contains__(self, doc_id):
+        return self.entry(doc_id) is not None
+
+    def __len__(self):
+        return len(self.live_rows())
+
+    def live_rows(self):
+        """Строки entries с последними версиями неудаленных документов, в порядке записи на диск."""
+        if self.stale:
+            self.refresh()
+        rows = np.sort(self.latest[self.latest >= 0])
+        return rows[self.entries['length'][rows] >= 0]
+
+    def doc_ids(self):
+        return self.entries['doc_id'][self.live_rows()].tolist()
+
+    def content_hash(self, doc_id):
+        entry = self.entry(doc_id)
+        return entry['hash'].tobytes().hex() if entry is not None else None
+
+    def segment_map(self, segment, end):
+        """mmap файла данных; если файл дописан после отображения, отображается заново."""
+        data = self.maps.get(segment)
+        if data is None or len(data) < end:
+            if data is not None:
+                data.close()
+            with open(segment_path(self.directory, segment), 'rb') as f:
+                data = self.maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return data
+
+    def read_entry(self, entry):
+        offset, length = int(entry['offset']), int(entry['length'])
+        record = zlib.decompress(self.segment_map(int(entry['segment']), offset + length)[offset:offset + length])
+        url, _, text = record.decode('utf-8').partition('\n')
+        return url, text
+
+    def get(self, doc_id):
+        """
+        (url, текст) документа или None. Если файла данных уже нет — другой процесс сжал хранилище
+        после того, как смещения были прочитаны, — смещения перечитываются и чтение повторяется.
+        """
+        entry = self.entry(doc_id)
+        if entry is None:
+            return None
+        try:
+            return self.read_entry(entry)
+        except FileNotFoundError:
+            self.refresh()
+            entry = self.entry(doc_id)
+            return self.read_entry(entry) if entry is not None else None
+
+    def iter_documents(self):
+        """(номер, url, текст) всех документов в порядке записи на диск, то есть последовательным чтением."""
+        self.refresh()
+        for row in self.live_rows().tolist():
+            entry = self.entries[row]
+            url, text = self.read_entry(entry)
+            yield int(entry['doc_id']), url, text
+
+    def open_for_append(self):
+        if self.data_file is not None:
+            return
+        self.refresh()
+        # Обрезаем недописанную при сбое запись смещений, иначе следующие записи съедут
+        with open(self.offsets_path, 'ab') as f:
+            f.truncate(self.loaded[1])
+        self.segment = max(int(self.entries['segment'].max()), 0) if len(self.entries) else 0
+        self.data_file = open(segment_path(self.directory, self.segment), 'ab')
+        self.offsets_file = open(self.offsets_path, 'ab')
+
+    def write_entry(self, entry):
+        self.offsets_file.write(entry.tobytes())
+        self.offsets_file.flush()
+        self.stale = True
+
+    def append(self, doc_id, url, text, content_hash=None):
+        """Дописывает новую версию документа; прежняя остается в файле данных до сжатия хранилища."""
+        self.open_for_append()
+        if self.data_file.tell() >= SEGMENT_SIZE:
+            self.data_file.close()
+            self.segment += 1
+            self.data_file = open(segment_path(self.directory, self.segment), 'ab')
+        record = zlib.compress(f"{url}\n{text}".encode('utf-8'), COMPRESSION_LEVEL)
+        offset = self.data_file.tell()
+        self.data_file.write(record)
+        # Смещение записывается только после данных: при сбое между ними запись просто не будет видна
+        self.data_file.flush()
+        entry = np.zeros(1, dtype=ENTRY_DTYPE)
+        entry[0] = (doc_id, self.segment, len(record), offset, list(bytes.fromhex(content_hash or text_hash(text))))
+        self.write_entry(entry)
+
+    def delete(self, doc_id):
+        if doc_id not in self:
+            return
+        self.open_for_append()
+        entry = np.zeros(1, dtype=ENTRY_DTYPE)
+        entry[0] = (doc_id, -1, -1, 0, [0] * 16)
+        self.write_entry(entry)
+
+    def clear(self):
+        """Помечает удаленными все документы одной записью в файл смещений (новый обход нумерует страницы с нуля)."""
+        doc_ids = self.doc_ids()
+        if not doc_ids:
+            return
+        self.open_for_append()
+        entries = np.zeros(len(doc_ids), dtype=ENTRY_DTYPE)
+        entries['doc_id'] = doc_ids
+        entries['segment'] = -1
+        entries['length'] = -1
+        self.write_entry(entries)
+
+    def compact(self):
+        """
+        Переписывает только последние версии документов в новые файлы данных и атомарно подменяет файл
+        смещений; старые файлы данных удаляются. Читатели дочитывают уже отображенные файлы через свой mmap,
+        а наткнувшись на удаленный файл, перечитывают смещения (см. get).
+        """
+        self.close_files()
+        self.refresh()
+        old_segments = sorted(set(self.entries['segment'][self.entries['segment'] >= 0].tolist()))
+        segment = old_segments[-1] + 1 if old_segments else 0
+        entries = np.zeros(len(self.live_rows()), dtype=ENTRY_DTYPE)
+        data_file = open(segment_path(self.directory, segment), 'wb')
+        try:
+            for i, row in enumerate(self.live_rows().tolist()):
+                entry = self.entries[row]
+                offset, length = int(entry['offset']), int(entry['length'])
+                if data_file.tell() >= SEGMENT_SIZE:
+                    data_file.close()
+                    segment += 1
+                    data_file = open(segment_path(self.directory, segment), 'wb')
+                entries[i] = entry
+                entries['segment'][i] = segment
+                entries['offset'][i] = data_file.tell()
+                data_file.write(self.segment_map(int(entry['segment']), offset + length)[offset:offset + length])
+        finally:
+            data_file.close()
+        entries.tofile(self.offsets_path + '.tmp')
+        os.replace(self.offsets_path + '.tmp', self.offsets_path)
+        self.close_maps()
+        for old_segment in old_segments:
+            os.remove(segment_path(self.directory, old_segment))
+        self.reset()
+        self.refresh()
+
+    def stats(self):
+        self.refresh()
+        live = self.live_rows()
+        data_size = sum(os.path.getsize(segment_path(self.directory, segment))
+                        for segment in set(self.entries['segment'][self.entries['segment'] >= 0].tolist()))
+        return {'documents': len(live), 'records': len(self.entries),
+                'live_bytes': int(self.entries['length'][live].sum()), 'data_bytes': data_size}
+
+    def close_maps(self):
+        for data in self.maps.values():
+            data.close()
+        self.maps = {}
+
+    def close_files(self):
+        for f in (self.data_file, self.offsets_file):
+            if f is not None:
+                f.close()
+        self.data_file = self.offsets_file = None
+
+    def close(self):
+        self.close_files()
+        self.close_maps()
+
+
+def read_legacy_document(filepath):
+    with open(filepath, 'r', encoding='utf-8') as f:
+        url = f.readline().strip()
+        text = f.read()
+    return url, text
+
+
+def has_legacy_documents(directory=LEGACY_CRAWLED_DIR):
+    return os.path.isdir(directory) and any(DOC_FILENAME_RE.match(name) for name in os.listdir(directory))
+
+
+def import_directory(store, directory=LEGACY_CRAWLED_DIR):
+    """
+    Переносит файлы doc_N.txt в хранилище под теми же номерами. Документы, которые уже есть в хранилище
+    с тем же текстом, пропускаются, поэтому импорт можно повторять. Возвращает число перенесенных файлов.
+    """
+    filenames = sorted((name for name in os.listdir(directory) if DOC_FILENAME_RE.match(name)),
+                       key=doc_id_from_filename)
+    stored = {doc_id: store.content_hash(doc_id) for doc_id in map(doc_id_from_filename, filenames)}
+    imported = 0
+    for filename in filenames:
+        doc_id = doc_id_from_filename(filename)
+        url, text = read_legacy_document(os.path.join(directory, filename))
+        new_hash = text_hash(text)
+        if stored[doc_id] != new_hash:
+            store.append(doc_id, url, text, new_hash)
+            imported += 1
+    return imported
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Хранилище документов обхода")
+    parser.add_argument('--import', dest='import_dir', nargs='?', const=LEGACY_CRAWLED_DIR, default=None,
+                        help="перенести файлы doc_N.txt из каталога (по умолчанию data/crawled)")
+    parser.add_argument('--compact', action='store_true', help="удалить из файлов данных старые версии документов")
+    args = parser.parse_args()
+
+    store = DocumentStore()
+    if args.import_dir:
+        started_at = time.perf_counter()
+        imported = import_directory(store, args.import_dir)
+        print(f"Перенесено документов: {imported} за {time.perf_counter() - started_at:.1f} с. "
+              f"Каталог {args.import_dir} больше не используется и может быть удален.")
+    if args.compact:
+        store.compact()
+    stats = store.stats()
+    print(f"Документов: {stats['documents']}, записей: {stats['records']}, "
+          f"данных: {stats['data_bytes'] / 1024 / 1024:.1f} МБ (актуальных {stats['live_bytes'] / 1024 / 1024:.1f} МБ)")
+    store.close()
\ No newline at end of file
@@ -1,200 +1,294 @@
-import os
-import numpy as np
-import pandas as pd
-import matplotlib
-
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from search import search_query
-from indexer import DOC_MAP_FILE
-import joblib
-
-EVAL_DATA_DIR = 'eval_data'
-QUERIES_FILE = os.path.join(EVAL_DATA_DIR, 'queries.txt')
-QRELS_FILE = os.path.join(EVAL_DATA_DIR, 'qrels.txt')
-PLOT_FILE = os.path.join('static', 'images', 'evaluation_plot.png')
-
-
-def load_qrels():
-    qrels = {}
-    with open(QRELS_FILE, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-
-            try:
-                parts = line.split()
-                if len(parts) == 4:
-                    qid, _, doc_name, rel = parts
-                    if qid not in qrels:
-                        qrels[qid] = {}
-                    qrels[qid][doc_name] = int(rel)
-                else:
-                    print(f"Предупреждение: неверный формат строки в qrels.txt: '{line}'")
-            except ValueError:
-                print(f"Предупреждение: не удалось разобрать строку в qrels.txt: '{line}'")
-                continue
-
-    return qrels
-
-
-def load_queries():
-    queries = {}
-    with open(QUERIES_FILE, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-
-            parts = line.split(':', 1)
-            if len(parts) == 2:
-                qid, query_text = parts
-                queries[qid] = query_text.strip()
-            else:
-                print(f"Предупреждение: неверный формат строки в queries.txt: '{line}'")
-    return queries
-
-
-def calculate_metrics(retrieved_filenames, relevant_docs, total_docs_in_collection):
-    retrieved_docs = retrieved_filenames
-    retrieved_relevant_docs = [doc for doc in retrieved_docs if doc in relevant_docs]
-
-    a = len(retrieved_relevant_docs)
-    b = len(retrieved_docs) - a
-    c = len(relevant_docs) - a
-
-    total_non_relevant = total_docs_in_collection - len(relevant_docs)
-    d = total_non_relevant - b
-
-    precision = a / (a + b) if (a + b) > 0 else 0
-    recall = a / (a + c) if (a + c) > 0 else 0
-    f_measure = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-
-    p_at_5 = len([doc for doc in retrieved_docs[:5] if doc in relevant_docs]) / 5
-    p_at_10 = len([doc for doc in retrieved_docs[:10] if doc in relevant_docs]) / 10
-
-    R = len(relevant_docs)
-    r_precision = len([doc for doc in retrieved_docs[:R] if doc in relevant_docs]) / R if R > 0 else 0
-
-    avg_prec = 0
-    relevant_count = 0
-    for i, doc in enumerate(retrieved_docs):
-        if doc in relevant_docs:
-            relevant_count += 1
-            avg_prec += relevant_count / (i + 1)
-    avg_prec = avg_prec / R if R > 0 else 0
-
-    denominator = a + b + c + d
-    accuracy = (a + d) / denominator if denominator > 0 else 0
-    error = (b + c) / denominator if denominator > 0 else 0
-
-    return {
-        'precision': precision, 'recall': recall, 'f_measure': f_measure,
-        'p_at_5': p_at_5, 'p_at_10': p_at_10,
-        'r_precision': r_precision, 'avg_precision': avg_prec,
-        'accuracy': accuracy, 'error': error
-    }
-
-
-def calculate_pr_curve(retrieved_filenames, relevant_docs):
-    retrieved_docs = retrieved_filenames
-    pr_points = []
-    relevant_found = 0
-    total_relevant = len(relevant_docs)
-    if total_relevant == 0:
-        return [(0, 1.0)]
-    for i, doc in enumerate(retrieved_docs):
-        if doc in relevant_docs:
-            relevant_found += 1
-            precision = relevant_found / (i + 1)
-            recall = relevant_found / total_relevant
-            pr_points.append((recall, precision))
-    return pr_points
-
-
-def interpolate_pr_curve(pr_points):
-    recall_levels = np.linspace(0, 1, 11)
-    interpolated_precision = []
-    for r_level in recall_levels:
-        max_p = 0
-        for r, p in pr_points:
-            if r >= r_level:
-                if p > max_p:
-                    max_p = p
-        interpolated_precision.append(max_p)
-    return recall_levels, interpolated_precision
-
-
-def run_evaluation():
-    queries = load_queries()
-    qrels = load_qrels()
-
-    try:
-        doc_map = joblib.load(DOC_MAP_FILE)
-        url_to_filename_map = {v['url']: v['filename'] for v in doc_map.values()}
-        total_docs_count = len(doc_map)
-    except FileNotFoundError:
-        print("Ошибка: doc_map.pkl не найден. Запустите indexer.py.")
-        return pd.DataFrame(), 0.0, None
-
-    all_metrics = []
-    all_interpolated_precisions = []
-
-    for qid, query in queries.items():
-        results, _ = search_query(query)
-
-        result_filenames = [url_to_filename_map.get(res['url']) for res in results if
-                            url_to_filename_map.get(res['url'])]
-
-        relevant_docs = {doc for doc, rel in qrels.get(qid, {}).items() if rel > 0}
-
-        if not relevant_docs:
-            continue
-
-        metrics = calculate_metrics(result_filenames, relevant_docs, total_docs_count)
-        metrics['query_id'] = qid
-        all_metrics.append(metrics)
-
-        pr_points = calculate_pr_curve(result_filenames, relevant_docs)
-        _, interpolated_p = interpolate_pr_curve(pr_points)
-        all_interpolated_precisions.append(interpolated_p)
-
-    if not all_metrics:
-        return pd.DataFrame(), 0.0, None
-
-    metrics_df = pd.DataFrame(all_metrics).set_index('query_id')
-
-    mean_avg_precision = metrics_df['avg_precision'].mean() if 'avg_precision' in metrics_df.columns else 0.0
-
-    if all_interpolated_precisions:
-        mean_interpolated_p = np.mean(all_interpolated_precisions, axis=0)
-        recall_levels = np.linspace(0, 1, 11)
-
-        os.makedirs(os.path.dirname(PLOT_FILE), exist_ok=True)
-
-        plt.figure(figsize=(8, 6))
-        plt.plot(recall_levels, mean_interpolated_p, marker='o', linestyle='-')
-        plt.title('11-Point Interpolated Precision-Recall Curve')
-        plt.xlabel('Recall')
-        plt.ylabel('Precision')
-        plt.grid(True)
-        plt.xlim([0, 1])
-        plt.ylim([0, 1.05])
-        plt.savefig(PLOT_FILE)
-        plt.close()
-
-    return metrics_df, mean_avg_precision, PLOT_FILE
-
-
-if __name__ == '__main__':
-    metrics_df, mean_ap, plot_path = run_evaluation()
-    if not metrics_df.empty:
-        print("--- Metrics per Query ---")
-        print(metrics_df)
-        print(f"\n--- Mean Average Precision (MAP) ---")
-        print(f"{mean_ap:.4f}")
-        if plot_path:
-            print(f"\nGraph saved to {plot_path}")
-    else:
+import argparse
+import hashlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import matplotlib
+
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from mapped_index import open_index
+
+EVAL_DATA_DIR = 'eval_data'
+QUERIES_FILE = os.path.join(EVAL_DATA_DIR, 'queries.txt')
+QRELS_FILE = os.path.join(EVAL_DATA_DIR, 'qrels.txt')
+PLOT_FILE = os.path.join('static', 'images', 'evaluation_plot.png')
+# Результаты прогона в формате TREC (qid Q0 docno rank score tag), по файлу на поколение индекса и набор запросов
+RUNS_DIR = os.path.join('data', 'runs')
+RUN_TAG = 'tfidf'
+EVAL_PROCESSES = min(4, os.cpu_count() or 1)
+QUERIES_PER_TASK = 8
+RECALL_LEVELS = np.linspace(0, 1, 11)
+
+
+def load_qrels():
+    qrels = {}
+    with open(QRELS_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            try:
+                parts = line.split()
+                if len(parts) == 4:
+                    qid, _, doc_name, rel = parts
+                    if qid not in qrels:
+                        qrels[qid] = {}
+                    qrels[qid][doc_name] = int(rel)
+                else:
+                    print(f"Предупреждение: неверный формат строки в qrels.txt: '{line}'")
+            except ValueError:
+                print(f"Предупреждение: не удалось разобрать строку в qrels.txt: '{line}'")
+                continue
+
+    return qrels
+
+
+def load_queries():
+    queries = {}
+    with open(QUERIES_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            parts = line.split(':', 1)
+            if len(parts) == 2:
+                qid, query_text = parts
+                queries[qid] = query_text.strip()
+            else:
+                print(f"Предупреждение: неверный формат строки в queries.txt: '{line}'")
+    return queries
+
+
+def compute_metrics(run, qrels, query_ids, total_docs_in_collection):
+    """
+    Метрики сразу для всех запросов: выдачи дополняются до общей длины, и каждая метрика
+    считается операцией над матрицей релевантности (запросы x позиции), без циклов по документам.
+    Возвращает (DataFrame метрик по запросам, матрица интерполированной точности в 11 точках полноты).
+    """
+    width = max([len(run.get(qid, [])) for qid in query_ids] + [1])
+    relevant = np.zeros((len(query_ids), width), dtype=bool)
+    retrieved_count = np.zeros(len(query_ids))
+    relevant_count = np.zeros(len(query_ids))
+    for row, qid in enumerate(query_ids):
+        retrieved = run.get(qid, [])
+        relevant_docs = {doc for doc, rel in qrels[qid].items() if rel > 0}
+        relevant[row, :len(retrieved)] = [doc in relevant_docs for doc in retrieved]
+        retrieved_count[row] = len(retrieved)
+        relevant_count[row] = len(relevant_docs)
+
+    found = np.cumsum(relevant, axis=1)
+    ranks = np.arange(1, width + 1)
+    precision_at = found / ranks
+
+    a = found[:, -1]
+    b = retrieved_count - a
+    c = relevant_count - a
+    d = total_docs_in_collection - relevant_count - b
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(a + b > 0, a / (a + b), 0)
+        recall = np.where(a + c > 0, a / (a + c), 0)
+        f_measure = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0)
+        avg_precision = np.where(relevant_count > 0, (precision_at * relevant).sum(axis=1) / relevant_count, 0)
+        r_index = np.clip(relevant_count.astype(int), 1, width) - 1
+        r_precision = np.where(relevant_count > 0, found[np.arange(len(query_ids)), r_index] / relevant_count, 0)
+        denominator = a + b + c + d
+        accuracy = np.where(denominator > 0, (a + d) / denominator, 0)
+        error = np.where(denominator > 0, (b + c) / denominator, 0)
+
+    # Интерполированная точность на уровне полноты r — максимум точности среди позиций с полнотой >= r;
+    # полнота по позициям не убывает, поэтому это суффиксный максимум от первой такой позиции
+    recall_at = found / np.maximum(relevant_count, 1)[:, None]
+    suffix_max = np.maximum.accumulate(np.where(relevant, precision_at, 0)[:, ::-1], axis=1)[:, ::-1]
+    suffix_max = np.hstack([suffix_max, np.zeros((len(query_ids), 1))])
+    interpolated = np.column_stack([
+        suffix_max[np.arange(len(query_ids)), (recall_at < level).sum(axis=1)] for level in RECALL_LEVELS
+    ])
+
+    metrics_df = pd.DataFrame({
+        'precision': precision, 'recall': recall, 'f_measure': f_measure,
+        'p_at_5': found[:, min(5, width) - 1] / 5, 'p_at_10': found[:, min(10, width) - 1] / 10,
+        'r_precision': r_precision, 'avg_precision': avg_precision,
+        'accuracy': accuracy, 'error': error,
+        'query_id': query_ids,
+    }).set_index('query_id')
+    return metrics_df, interpolated
+
+
+def run_key(generation, queries):
+    digest = hashlib.sha1(str(generation).encode('utf-8'))
+    for qid, query in queries.items():
+        digest.update(f"\0{qid}\t{query}".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def run_file(generation, queries):
+    return os.path.join(RUNS_DIR, f"run_gen{generation:06d}_{run_key(generation, queries)}.trec")
+
+
+def write_run(path, run):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for qid, ranking in run.items():
+            for rank, (filename, score) in enumerate(ranking, start=1):
+                f.write(f"{qid} Q0 {filename} {rank} {score:.10f} {RUN_TAG}\n")
+    os.replace(tmp_path, path)
+
+
+def read_run(path):
+    """Возвращает {qid: [имена файлов в порядке ранга]}."""
+    ranked = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            qid, _, filename, rank, _, _ = line.split()
+            ranked.setdefault(qid, []).append((int(rank), filename))
+    return {qid: [filename for _, filename in sorted(items)] for qid, items in ranked.items()}
+
+
+def init_search_worker():
+    """Процесс пула ищет по шардам сам: иначе каждый запустил бы свои процессы шардов, всего processes × шардов."""
+    from search import search_in_process
+    search_in_process()
+
+
+def search_batch(items):
+    """Выполняется в процессе пула: модель spaCy и индекс загружаются в нем один раз при первом вызове."""
+    from search import search_query
+    results = []
+    for qid, query in items:
+        found, _ = search_query(query)
+        results.append((qid, [(res['filename'], float(res['score'])) for res in found]))
+    return results
+
+
+def batch_search(queries, processes=EVAL_PROCESSES, progress=None):
+    """Прогоняет запросы пакетами по QUERIES_PER_TASK в пуле процессов; progress(сделано, всего)."""
+    items = list(queries.items())
+    tasks = [items[i:i + QUERIES_PER_TASK] for i in range(0, len(items), QUERIES_PER_TASK)]
+    run = {}
+    if processes <= 1:
+        for task in tasks:
+            run.update(search_batch(task))
+            if progress:
+                progress(len(run), len(items))
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=init_search_worker) as pool:
+            for future in as_completed([pool.submit(search_batch, task) for task in tasks]):
+                run.update(future.result())
+                if progress:
+                    progress(len(run), len(items))
+    # Порядок запросов как в queries.txt, независимо от порядка завершения задач
+    return {qid: run[qid] for qid, _ in items}
+
+
+def cached_run_file():
+    """Путь к файлу прогона для текущего индекса и queries.txt и признак, что он уже посчитан."""
+    path = run_file(open_index().generation, load_queries())
+    return path, os.path.exists(path)
+
+
+def run_evaluation(processes=EVAL_PROCESSES, progress=None, use_cache=True):
+    queries = load_queries()
+    qrels = load_qrels()
+
+    try:
+        index = open_index()
+        total_docs_count = len(index.doc_map)
+    except FileNotFoundError:
+        print("Ошибка: индекс не найден. Запустите indexer.py.")
+        return pd.DataFrame(), 0.0, None
+
+    path = run_file(index.generation, queries)
+    if use_cache and os.path.exists(path):
+        run = read_run(path)
+        if progress:
+            progress(len(queries), len(queries))
+    else:
+        run_with_scores = batch_search(queries, processes, progress)
+        write_run(path, run_with_scores)
+        run = {qid: [filename for filename, _ in ranking] for qid, ranking in run_with_scores.items()}
+
+    query_ids = [qid for qid in queries if any(rel > 0 for rel in qrels.get(qid, {}).values())]
+    if not query_ids:
+        return pd.DataFrame(), 0.0, None
+
+    metrics_df, interpolated = compute_metrics(run, qrels, query_ids, total_docs_count)
+
+    mean_avg_precision = metrics_df['avg_precision'].mean() if 'avg_precision' in metrics_df.columns else 0.0
+
+    mean_interpolated_p = interpolated.mean(axis=0)
+    recall_levels = RECALL_LEVELS
+
+    os.makedirs(os.path.dirname(PLOT_FILE), exist_ok=True)
+
+    plt.figure(figsize=(8, 6))
+    plt.plot(recall_levels, mean_interpolated_p, marker='o', linestyle='-')
+    plt.title('11-Point Interpolated Precision-Recall Curve')
+    plt.xlabel('Recall')
+    plt.ylabel('Precision')
+    plt.grid(True)
+    plt.xlim([0, 1])
+    plt.ylim([0, 1.05])
+    plt.savefig(PLOT_FILE)
+    plt.close()
+
+    return metrics_df, mean_avg_precision, PLOT_FILE
+
+
+class EvaluationJob:
+    """Фоновый прогон оценки с прогрессом: /evaluate не держит HTTP-запрос, пока выполняются все запросы."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.done = 0
+        self.total = 0
+        self.error = None
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, processes=EVAL_PROCESSES):
+        with self.lock:
+            if self.running():
+                return False
+            self.done, self.total, self.error = 0, 0, None
+            self.thread = threading.Thread(target=self.run, args=(processes,), daemon=True)
+            self.thread.start()
+            return True
+
+    def run(self, processes):
+        try:
+            run_evaluation(processes, progress=self.update)
+        except Exception as e:
+            self.error = str(e)
+
+    def update(self, done, total):
+        self.done, self.total = done, total
+
+    def status(self):
+        return {'running': self.running(), 'done': self.done, 'total': self.total, 'error': self.error}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Оценка качества поиска по queries.txt и qrels.txt")
+    parser.add_argument('--processes', type=int, default=EVAL_PROCESSES, help="процессов для прогона запросов")
+    parser.add_argument('--no-cache', action='store_true', help="заново выполнить запросы, не читая файл прогона")
+    args = parser.parse_args()
+
+    metrics_df, mean_ap, plot_path = run_evaluation(args.processes, use_cache=not args.no_cache)
+    if not metrics_df.empty:
+        print("--- Metrics per Query ---")
+        print(metrics_df)
+        print(f"\n--- Mean Average Precision (MAP) ---")
+        print(f"{mean_ap:.4f}")
+        if plot_path:
+            print(f"\nGraph saved to {plot_path}")
+    else:
         print("Evaluation could not be completed.")
\ No newline at end of file
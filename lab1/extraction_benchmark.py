@@ -0,0 +1,81 @@
+import argparse
+import os
+import sys
+import time
+from crawler import EXTRACTORS
+
+# Сохраненные страницы в разметке Википедии (с инфобоксами, оглавлением, сносками, навбоксами)
+# и одна страница без mw-content-text; их можно дополнить своими
+HTML_FIXTURES_DIR = 'html_fixtures'
+
+
+def load_fixtures(fixtures_dir):
+    pages = {}
+    for filename in sorted(os.listdir(fixtures_dir)):
+        if filename.endswith(('.html', '.htm')):
+            with open(os.path.join(fixtures_dir, filename), 'r', encoding='utf-8') as f:
+                pages[filename] = f.read()
+    return pages
+
+
+def check_equivalence(pages, baseline='bs4'):
+    """
+    Сравнивает текст и ссылки каждого способа извлечения с эталонным. Возвращает число расхождений;
+    страница, из которой эталон не извлек текста, тоже считается расхождением — на ней сравнивать нечего.
+    """
+    expected = {name: EXTRACTORS[baseline](html) for name, html in pages.items()}
+    mismatches = 0
+    for name, (text, _) in expected.items():
+        if not text:
+            print(f"[{baseline}] {name}: текст не извлечен")
+            mismatches += 1
+    for backend, extract in EXTRACTORS.items():
+        if backend == baseline:
+            continue
+        for name, html in pages.items():
+            text, links = extract(html)
+            expected_text, expected_links = expected[name]
+            if text != expected_text:
+                position = next((i for i, (a, b) in enumerate(zip(text, expected_text)) if a != b),
+                                min(len(text), len(expected_text)))
+                print(f"[{backend}] {name}: текст отличается с позиции {position}: "
+                      f"{text[position:position + 40]!r} != {expected_text[position:position + 40]!r}")
+                mismatches += 1
+            if links != expected_links:
+                print(f"[{backend}] {name}: ссылки отличаются ({len(links)} против {len(expected_links)})")
+                mismatches += 1
+    return mismatches
+
+
+def benchmark(pages, repeat=3):
+    results = {}
+    for backend, extract in EXTRACTORS.items():
+        best = float('inf')
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            for html in pages.values():
+                extract(html)
+            best = min(best, time.perf_counter() - started_at)
+        results[backend] = len(pages) / best if best > 0 else 0.0
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Проверка эквивалентности и скорость способов извлечения текста")
+    parser.add_argument('fixtures_dir', nargs='?', default=HTML_FIXTURES_DIR,
+                        help="каталог с сохраненными HTML-страницами")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.fixtures_dir)
+    if not pages:
+        print(f"В каталоге {args.fixtures_dir} нет HTML-файлов.")
+        sys.exit(1)
+
+    mismatches = check_equivalence(pages)
+    print(f"Страниц: {len(pages)}, расхождений с bs4: {mismatches}")
+
+    for backend, docs_per_sec in benchmark(pages, args.repeat).items():
+        print(f"{backend:<6} {docs_per_sec:10.1f} док/с")
+
+    sys.exit(1 if mismatches else 0)
\ No newline at end of file
@@ -0,0 +1,149 @@
+import itertools
+import numpy as np
+
+MAX_EDIT_DISTANCE = 2
+# Слова не длиннее этого исправляются только на расстояние 1: у коротких слов на расстоянии 2 слишком много соседей
+SHORT_WORD_LENGTH = 4
+# Как в SymSpell: удаления строятся только от начала слова, остальное проверяется точным расстоянием
+PREFIX_LENGTH = 7
+MAX_CORRECTIONS = 3
+# Версия хэшей строк удалений в заголовке индекса; 1 (True) — хэши blake2b, которые считались по одной строке
+KEY_VERSION = 2
+FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+FNV_PRIME = np.uint64(0x100000001b3)
+
+
+def code_points(texts, prefix_length=PREFIX_LENGTH):
+    """Кодовые точки первых prefix_length символов строк: матрица строки x prefix_length, дополненная нулями."""
+    if not len(texts):
+        return np.zeros((0, prefix_length), dtype=np.uint64)
+    fixed = np.array([text[:prefix_length] for text in texts], dtype=f'<U{prefix_length}')
+    return fixed.view(np.uint32).reshape(len(texts), prefix_length).astype(np.uint64)
+
+
+def hash_code_points(codes):
+    """
+    64-битные хэши строк матрицы кодовых точек: FNV-1a по символам и перемешивание splitmix64.
+    Считаются сразу для всех строк, и между процессами хэш один и тот же.
+    """
+    h = np.full(codes.shape[0], FNV_OFFSET, dtype=np.uint64)
+    for column in range(codes.shape[1]):
+        h ^= codes[:, column]
+        h *= FNV_PRIME
+    h ^= h >> np.uint64(30)
+    h *= np.uint64(0xbf58476d1ce4e5b9)
+    h ^= h >> np.uint64(27)
+    h *= np.uint64(0x94d049bb133111eb)
+    h ^= h >> np.uint64(31)
+    return h.view(np.int64)
+
+
+def delete_keys(texts):
+    """Хэши строк удалений (не длиннее PREFIX_LENGTH символов)."""
+    return hash_code_points(code_points(texts))
+
+
+def deletion_patterns(max_distance=MAX_EDIT_DISTANCE, prefix_length=PREFIX_LENGTH):
+    """
+    Для каждого способа удалить из начала слова не более max_distance позиций — номера оставшихся столбцов
+    матрицы кодовых точек, дополненные столбцом нулей (номер prefix_length). Удаление позиции за концом
+    короткого слова ничего не меняет, такие повторы убираются при построении индекса.
+    """
+    patterns = []
+    for distance in range(max_distance + 1):
+        for removed in itertools.combinations(range(prefix_length), distance):
+            patterns.append([i for i in range(prefix_length) if i not in removed] + [prefix_length] * distance)
+    return np.array(patterns, dtype=np.intp)
+
+
+def deletes(word, max_distance=MAX_EDIT_DISTANCE, prefix_length=PREFIX_LENGTH):
+    """Все строки, получаемые из начала слова удалением не более max_distance символов (включая само начало)."""
+    word = word[:prefix_length]
+    result = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        result |= frontier
+    return result
+
+
+def build_fuzzy_index(lemmas, max_distance=MAX_EDIT_DISTANCE):
+    """
+    Индекс удалений SymSpell: отсортированные хэши строк удалений и номера лемм, из которых они получаются.
+    Две строки на расстоянии редактирования d имеют общую строку удалений с не более чем d удалениями в каждой.
+    Строки удалений не перечисляются по одной: для каждого способа удаления (deletion_patterns) из матрицы
+    кодовых точек всех лемм выбираются оставшиеся столбцы и хэшируются сразу для всего словаря.
+    Хэши совпадают с delete_keys(deletes(лемма)).
+    """
+    codes = np.hstack([code_points(lemmas), np.zeros((len(lemmas), 1), dtype=np.uint64)])
+    patterns = deletion_patterns(max_distance)
+    keys = np.empty((len(lemmas), len(patterns)), dtype=np.int64)
+    for i, columns in enumerate(patterns):
+        keys[:, i] = hash_code_points(codes[:, columns])
+    keys = keys.ravel()
+    lemma_ids = np.repeat(np.arange(len(lemmas), dtype=np.int32), len(patterns))
+    order = np.lexsort((lemma_ids, keys))
+    keys, lemma_ids = keys[order], lemma_ids[order]
+    unique = np.ones(len(keys), dtype=bool)
+    unique[1:] = (keys[1:] != keys[:-1]) | (lemma_ids[1:] != lemma_ids[:-1])
+    return keys[unique], lemma_ids[unique]
+
+
+def edit_distance(a, b, max_distance):
+    """Расстояние Дамерау–Левенштейна (с перестановкой соседних символов); max_distance + 1, если больше."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    # Общие начало и конец на расстояние не влияют, а у кандидатов из индекса удалений они обычно длинные
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return max(len(a), len(b)) if max(len(a), len(b)) <= max_distance else max_distance + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+
+class FuzzyIndex:
+    """
+    Поиск лемм словаря на расстоянии редактирования 1–2 от слова. Число проверяемых строк удалений
+    зависит только от длины слова, каждая ищется бинарным поиском, поэтому размер словаря почти не влияет.
+    """
+
+    def __init__(self, keys, lemma_ids, lemmas, df):
+        self.keys = keys
+        self.lemma_ids = lemma_ids
+        self.lemmas = lemmas
+        self.df = df
+
+    def candidates(self, word, max_distance=None, limit=MAX_CORRECTIONS):
+        """[(лемма, расстояние, число документов)] по возрастанию расстояния и убыванию числа документов."""
+        if max_distance is None:
+            max_distance = 1 if len(word) <= SHORT_WORD_LENGTH else MAX_EDIT_DISTANCE
+        probe = delete_keys(list(deletes(word, max_distance)))
+        starts = np.searchsorted(self.keys, probe, side='left')
+        ends = np.searchsorted(self.keys, probe, side='right')
+        lemma_ids = np.unique(np.concatenate([self.lemma_ids[s:e] for s, e in zip(starts.tolist(), ends.tolist())]
+                                             + [np.zeros(0, dtype=np.int32)]))
+        found = []
+        for lemma_id in lemma_ids.tolist():
+            lemma = self.lemmas[lemma_id]
+            distance = edit_distance(word, lemma, max_distance)
+            if distance <= max_distance:
+                found.append((distance, -int(self.df[lemma_id]), lemma))
+        found.sort()
+        return [(lemma, distance, -neg_df) for distance, neg_df, lemma in found[:limit]]
\ No newline at end of file
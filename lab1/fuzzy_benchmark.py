@@ -0,0 +1,83 @@
+import argparse
+import time
+import numpy as np
+from fuzzy import (FuzzyIndex, build_fuzzy_index, deletes, delete_keys, edit_distance, MAX_EDIT_DISTANCE,
+                   SHORT_WORD_LENGTH)
+from suggest_benchmark import random_lemmas
+
+VOCABULARY_SIZES = [10_000, 100_000]
+LOOKUPS = 1000
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def with_typos(word, rng):
+    """Одна или две случайные правки: удаление, вставка, замена или перестановка соседних букв."""
+    for _ in range(int(rng.integers(1, MAX_EDIT_DISTANCE + 1))):
+        i = int(rng.integers(len(word)))
+        operation = int(rng.integers(4))
+        if operation == 0 and len(word) > 1:
+            word = word[:i] + word[i + 1:]
+        elif operation == 1:
+            word = word[:i] + ALPHABET[rng.integers(len(ALPHABET))] + word[i:]
+        elif operation == 2:
+            word = word[:i] + ALPHABET[rng.integers(len(ALPHABET))] + word[i + 1:]
+        elif i + 1 < len(word):
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word
+
+
+def build_one_by_one(lemmas):
+    """Индекс удалений, построенный перечислением строк удалений каждой леммы, — эталон для build_fuzzy_index."""
+    keys, lemma_ids = [], []
+    for lemma_id, lemma in enumerate(lemmas):
+        lemma_keys = delete_keys(list(deletes(lemma)))
+        keys.append(lemma_keys)
+        lemma_ids.append(np.full(len(lemma_keys), lemma_id, dtype=np.int32))
+    keys, lemma_ids = np.concatenate(keys), np.concatenate(lemma_ids)
+    order = np.lexsort((lemma_ids, keys))
+    return keys[order], lemma_ids[order]
+
+
+def brute_force(lemmas, word):
+    """Все леммы на допустимом расстоянии перебором словаря — то, что дала бы наивная проверка."""
+    max_distance = 1 if len(word) <= SHORT_WORD_LENGTH else MAX_EDIT_DISTANCE
+    return {lemma for lemma in lemmas if edit_distance(word, lemma, max_distance) <= max_distance}
+
+
+def run_benchmark(vocabulary_sizes=VOCABULARY_SIZES, n_lookups=LOOKUPS, check=20, seed=0):
+    rng = np.random.default_rng(seed)
+    for n_lemmas in vocabulary_sizes:
+        lemmas, df = random_lemmas(n_lemmas, rng)
+        started_at = time.perf_counter()
+        keys, lemma_ids = build_fuzzy_index(lemmas)
+        build_time = time.perf_counter() - started_at
+        started_at = time.perf_counter()
+        expected_keys, expected_lemma_ids = build_one_by_one(lemmas)
+        reference_time = time.perf_counter() - started_at
+        same = np.array_equal(keys, expected_keys) and np.array_equal(lemma_ids, expected_lemma_ids)
+        index = FuzzyIndex(keys, lemma_ids, lemmas, df)
+        words = [with_typos(lemmas[i], rng) for i in rng.integers(len(lemmas), size=n_lookups).tolist()]
+
+        latencies = []
+        for word in words:
+            started_at = time.perf_counter()
+            index.candidates(word)
+            latencies.append((time.perf_counter() - started_at) * 1000)
+        latencies = np.array(latencies)
+
+        scan_started_at = time.perf_counter()
+        missed = sum(bool(brute_force(lemmas, word) - {lemma for lemma, _, _ in index.candidates(word, limit=None)})
+                     for word in words[:check])
+        scan_time = (time.perf_counter() - scan_started_at) / check * 1000
+        print(f"Лемм: {n_lemmas:>9}  построение: {build_time:6.2f} с (по одной лемме {reference_time:6.2f} с, "
+              f"{'совпадает' if same else 'НЕ СОВПАДАЕТ'}), строк удалений: {len(keys):>10}  "
+              f"p50 {np.percentile(latencies, 50):.3f} мс  p99 {np.percentile(latencies, 99):.3f} мс  "
+              f"| перебор словаря: {scan_time:.1f} мс  пропущено соседей: {missed}/{check}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Время поиска ближайших лемм по индексу удалений")
+    parser.add_argument('--sizes', type=int, nargs='+', default=VOCABULARY_SIZES)
+    parser.add_argument('--lookups', type=int, default=LOOKUPS)
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.lookups)
\ No newline at end of file
@@ -1,46 +1,242 @@
-import os
-from sklearn.feature_extraction.text import TfidfVectorizer
-import joblib
-from tokenizer import spacy_tokenizer
-
-DATA_DIR = 'data'
-CRAWLED_FILES_DIR = os.path.join(DATA_DIR, 'crawled')
-INDEX_FILE = os.path.join(DATA_DIR, 'tfidf_index.pkl')
-VECTORIZER_FILE = os.path.join(DATA_DIR, 'tfidf_vectorizer.pkl')
-DOC_MAP_FILE = os.path.join(DATA_DIR, 'doc_map.pkl')
-
-
-def create_index():
-    if not os.path.exists(CRAWLED_FILES_DIR):
-        print("Crawled data not found. Please run crawler.py first.")
-        return
-
-    documents = []
-    doc_map = {}  # Maps index to filename and URL
-
-    doc_files = sorted(os.listdir(CRAWLED_FILES_DIR))
-    for i, filename in enumerate(doc_files):
-        filepath = os.path.join(CRAWLED_FILES_DIR, filename)
-        with open(filepath, 'r', encoding='utf-8') as f:
-            url = f.readline().strip()
-            content = f.read()
-            documents.append(content)
-            doc_map[i] = {'filename': filename, 'url': url}
-
-    if not documents:
-        print("No documents to index.")
-        return
-
-    vectorizer = TfidfVectorizer(tokenizer=spacy_tokenizer)
-    tfidf_matrix = vectorizer.fit_transform(documents)
-
-    joblib.dump(tfidf_matrix, INDEX_FILE)
-    joblib.dump(vectorizer, VECTORIZER_FILE)
-    joblib.dump(doc_map, DOC_MAP_FILE)
-
-    print(f"Indexing complete. Indexed {len(documents)} documents.")
-    print(f"Vocabulary size: {len(vectorizer.get_feature_names_out())}")
-
-
-if __name__ == '__main__':
-    create_index()
\ No newline at end of file
+import argparse
+import hashlib
+import time
+import metrics
+from tokenizer import tokenize_documents, tokenizer_version, BATCH_SIZE
+from token_cache import TokenCache, DEFAULT_MAX_SIZE_MB
+from segments import make_vectorizer, add_documents, delete_documents, reset_segments, live_documents, \
+    merge_segments, read_manifest
+from mapped_index import compile_index, convert_legacy_index, has_legacy_index, open_index
+from doc_store import DocumentStore, doc_filename, has_legacy_documents, import_directory, DOC_STORE_DIR, \
+    LEGACY_CRAWLED_DIR
+
+RUN_SECONDS = metrics.Histogram('indexer_run_seconds', "Indexer run time by operation.", ['operation'])
+STAGE_SECONDS = metrics.Histogram('indexer_stage_seconds', "Indexer time by stage.", ['stage'])
+DOCUMENTS = metrics.Counter('indexer_documents_total', "Documents indexed, changed or removed.", ['change'])
+LAST_RUN = metrics.Gauge('indexer_last_run_timestamp_seconds', "Unix time the last indexer run finished.",
+                         ['operation'])
+
+
+def encode_positions(tokens):
+    return [f"{token}\t{position}\t{start}\t{end}" for token, position, start, end in tokens]
+
+
+def decode_positions(lines):
+    tokens = []
+    for line in lines:
+        token, position, start, end = line.split('\t')
+        tokens.append((token, int(position), int(start), int(end)))
+    return tokens
+
+
+def tokenize_corpus(vectorizer, documents, batch_size=BATCH_SIZE, n_process=1, cache=None, positions=False):
+    """
+    Токены документов; positions=True — кортежи (lemma_POS, номер токена, начало, конец)
+    с символьными смещениями в тексте после предобработки.
+    """
+    # Та же предобработка (lowercase), что TfidfVectorizer применяет перед вызовом spacy_tokenizer
+    preprocess = vectorizer.build_preprocessor()
+    texts = [preprocess(doc) for doc in documents]
+    if cache is None:
+        return tokenize_documents(texts, batch_size=batch_size, n_process=n_process, positions=positions)
+
+    # spaCy запускается только для документов, которых еще нет в кэше; в кэше всегда лежат токены с позициями
+    keys = [cache.key(text) for text in texts]
+    cached = {key: decode_positions(lines) for key, lines in cache.get_many(keys).items()}
+    missing = [i for i, key in enumerate(keys) if key not in cached]
+    if missing:
+        fresh = tokenize_documents([texts[i] for i in missing], batch_size=batch_size, n_process=n_process,
+                                   positions=True)
+        new_items = dict(zip((keys[i] for i in missing), fresh))
+        cache.put_many((key, encode_positions(tokens)) for key, tokens in new_items.items())
+        cached.update(new_items)
+    if positions:
+        return [cached[key] for key in keys]
+    return [[token for token, _, _, _ in cached[key]] for key in keys]
+
+
+def open_document_store():
+    """Хранилище документов обхода; файлы doc_N.txt прежнего формата при первом запуске переносятся в него."""
+    store = DocumentStore()
+    if not len(store) and has_legacy_documents():
+        print(f"Importing documents from {LEGACY_CRAWLED_DIR} into {DOC_STORE_DIR}...")
+        print(f"Imported {import_directory(store)} documents.")
+    return store
+
+
+def load_documents(store=None):
+    """Тексты всех документов хранилища, прочитанные последовательно, и doc_map."""
+    store = open_document_store() if store is None else store
+    documents = []
+    doc_map = {}  # Maps index to filename and URL
+
+    for i, (doc_id, url, content) in enumerate(store.iter_documents()):
+        documents.append(content)
+        doc_map[i] = {'filename': doc_filename(doc_id), 'url': url}
+
+    return documents, doc_map
+
+
+def content_hash(content):
+    return hashlib.md5(content.encode('utf-8')).hexdigest()
+
+
+def tokenize_with_cache(documents, batch_size, n_process, use_cache, cache_size_mb):
+    cache = TokenCache(tokenizer_version(), max_size_mb=cache_size_mb) if use_cache else None
+    tokenized_documents = tokenize_corpus(make_vectorizer(), documents, batch_size=batch_size,
+                                          n_process=n_process, cache=cache, positions=True)
+    if cache:
+        cache.evict()
+        cache.report()
+        cache.close()
+    return tokenized_documents
+
+
+def report_index():
+    index = open_index()
+    print(f"Index generation {index.generation}: {len(index.doc_map)} documents, written to {index.path}.")
+    print(f"Vocabulary size: {len(index.vocabulary)}")
+    if len(index.shard_bounds) > 2:
+        print(f"Shards: {len(index.shard_bounds) - 1} (document boundaries {index.shard_bounds})")
+
+
+def convert_index(n_shards=None):
+    """Переводит существующий индекс (сегменты или прежние pickle-файлы) в отображаемый формат."""
+    if not read_manifest()['segments'] and has_legacy_index():
+        print("Converting legacy pickle index...")
+        convert_legacy_index(n_shards)
+    else:
+        compile_index(n_shards)
+    report_index()
+
+
+def create_index(batch_size=BATCH_SIZE, n_process=1, use_cache=True, cache_size_mb=DEFAULT_MAX_SIZE_MB,
+                 n_shards=None):
+    store = open_document_store()
+    if not len(store):
+        print("Crawled data not found. Please run crawler.py first.")
+        return
+
+    started_at = time.perf_counter()
+    documents, doc_map = load_documents(store)
+    store.close()
+    started_at = observe_stage('load', started_at)
+
+    if not documents:
+        print("No documents to index.")
+        return
+
+    tokenized_documents = tokenize_with_cache(documents, batch_size, n_process, use_cache, cache_size_mb)
+    started_at = observe_stage('tokenize', started_at)
+
+    docs = [{'filename': doc['filename'], 'url': doc['url'], 'content_hash': content_hash(content)}
+            for doc, content in zip(doc_map.values(), documents)]
+    reset_segments()
+    add_documents(docs, documents, tokenized_documents)
+    started_at = observe_stage('segments', started_at)
+
+    compile_index(n_shards)
+    observe_stage('compile', started_at)
+    DOCUMENTS.inc('added', amount=len(documents))
+    print(f"Indexing complete. Indexed {len(documents)} documents.")
+    report_index()
+
+
+def update_index(batch_size=BATCH_SIZE, n_process=1, use_cache=True, cache_size_mb=DEFAULT_MAX_SIZE_MB,
+                 n_shards=None):
+    """
+    Добавляет новые и измененные документы новым сегментом, старые версии и исчезнувшие из хранилища
+    документы помечает удаленными, затем сливает мелкие сегменты (в этом же процессе: indexer.py — короткоживущий
+    процесс, и фоновый поток слияния был бы прерван при его завершении).
+    Неизменившиеся документы не распаковываются: их хэш записан в хранилище.
+    """
+    store = open_document_store()
+    if not len(store):
+        print("Crawled data not found. Please run crawler.py first.")
+        return
+
+    started_at = time.perf_counter()
+    indexed = live_documents()
+    current_files = {doc_filename(doc_id): doc_id for doc_id in store.doc_ids()}
+
+    documents, docs, replaced = [], [], []
+    for filename, store_id in current_files.items():
+        new_hash = store.content_hash(store_id)
+        if filename in indexed:
+            doc_id, old_hash = indexed[filename]
+            if old_hash == new_hash:
+                continue
+            replaced.append(doc_id)
+        url, content = store.get(store_id)
+        documents.append(content)
+        docs.append({'filename': filename, 'url': url, 'content_hash': new_hash})
+    store.close()
+
+    removed = [doc_id for filename, (doc_id, _) in indexed.items() if filename not in current_files]
+    started_at = observe_stage('load', started_at)
+
+    if not documents and not removed:
+        print("Index is up to date.")
+        return
+
+    if documents:
+        tokenized_documents = tokenize_with_cache(documents, batch_size, n_process, use_cache, cache_size_mb)
+        started_at = observe_stage('tokenize', started_at)
+        add_documents(docs, documents, tokenized_documents, replaced_doc_ids=replaced)
+    if removed:
+        delete_documents(removed)
+    started_at = observe_stage('segments', started_at)
+    DOCUMENTS.inc('added', amount=len(documents) - len(replaced))
+    DOCUMENTS.inc('changed', amount=len(replaced))
+    DOCUMENTS.inc('removed', amount=len(removed))
+
+    print(f"Index updated: {len(documents) - len(replaced)} added, {len(replaced)} changed, "
+          f"{len(removed)} removed.")
+    merge_segments()
+    started_at = observe_stage('merge', started_at)
+    compile_index(n_shards)
+    observe_stage('compile', started_at)
+    report_index()
+
+
+def observe_stage(stage, started_at):
+    now = time.perf_counter()
+    STAGE_SECONDS.observe(now - started_at, stage)
+    return now
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the TF-IDF index from crawled documents")
+    parser.add_argument('--update', action='store_true',
+                        help="index only new and changed documents as a new segment")
+    parser.add_argument('--merge', action='store_true', help="merge all segments and purge deleted documents")
+    parser.add_argument('--convert', action='store_true',
+                        help="write the memory-mapped index from existing segments or legacy pickles")
+    parser.add_argument('--shards', type=int, default=None,
+                        help="number of document shards searched in parallel (default: keep the current count)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="documents per nlp.pipe batch")
+    parser.add_argument('--n-process', type=int, default=1, help="spaCy worker processes")
+    parser.add_argument('--no-cache', action='store_true', help="re-tokenize every document, ignoring the token cache")
+    parser.add_argument('--cache-size-mb', type=int, default=DEFAULT_MAX_SIZE_MB, help="token cache size limit")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    options = dict(batch_size=args.batch_size, n_process=args.n_process, use_cache=not args.no_cache,
+                   cache_size_mb=args.cache_size_mb, n_shards=args.shards)
+    operation = 'convert' if args.convert else 'merge' if args.merge else 'update' if args.update else 'create'
+    started_at = time.perf_counter()
+    if args.convert:
+        convert_index(args.shards)
+    elif args.merge:
+        merge_segments(force=True)
+        compile_index(args.shards)
+        report_index()
+    elif args.update:
+        update_index(**options)
+    else:
+        create_index(**options)
+    RUN_SECONDS.observe(time.perf_counter() - started_at, operation)
+    LAST_RUN.set(time.time(), operation)
+    metrics.write_textfile('indexer')
\ No newline at end of file
@@ -0,0 +1,304 @@
+import json
+import mmap
+import os
+import shutil
+from collections.abc import Mapping
+import numpy as np
+from scipy import sparse
+from postings import PostingsIndex
+from positional import PositionalIndex, POSITION_ARRAYS
+from suggest import Suggester, lemma_frequencies, build_suggestions
+from fuzzy import FuzzyIndex, build_fuzzy_index, KEY_VERSION
+
+DATA_DIR = 'data'
+INDEX_DIR = os.path.join(DATA_DIR, 'index')
+CURRENT_FILE = os.path.join(INDEX_DIR, 'CURRENT')
+HEADER_FILE = 'header.json'
+# Увеличивать при любом изменении состава или раскладки файлов
+FORMAT_VERSION = 1
+
+# Индекс до сегментов: три pickle-файла, которые search.py загружал целиком
+LEGACY_INDEX_FILE = os.path.join(DATA_DIR, 'tfidf_index.pkl')
+LEGACY_VECTORIZER_FILE = os.path.join(DATA_DIR, 'tfidf_vectorizer.pkl')
+LEGACY_DOC_MAP_FILE = os.path.join(DATA_DIR, 'doc_map.pkl')
+
+
+class StringTable:
+    """Строки, записанные подряд в один файл UTF-8, и массив смещений: i-я строка — blob[offsets[i]:offsets[i + 1]]."""
+
+    def __init__(self, blob_path, offsets_path):
+        self.offsets = np.load(offsets_path, mmap_mode='r')
+        with open(blob_path, 'rb') as f:
+            self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(blob_path) else b''
+
+    @staticmethod
+    def write(strings, blob_path, offsets_path):
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(s) for s in encoded])
+        with open(blob_path, 'wb') as f:
+            f.write(b''.join(encoded))
+        np.save(offsets_path, offsets)
+
+    def raw(self, i):
+        return self.blob[int(self.offsets[i]):int(self.offsets[i + 1])]
+
+    def lower_bound(self, key, lo=0, hi=None):
+        """Первая позиция, строка в которой (в байтах UTF-8) не меньше key; таблица должна быть отсортирована."""
+        hi = len(self) if hi is None else hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.raw(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.raw(i).decode('utf-8')
+
+
+class MappedVocabulary(Mapping):
+    """
+    Словарь термин -> номер столбца поверх отсортированной StringTable. Термины отсортированы
+    (как у TfidfVectorizer), поэтому поиск — бинарный по байтам UTF-8, а словарь в памяти не строится.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def __getitem__(self, term):
+        key = term.encode('utf-8')
+        lo = self.table.lower_bound(key)
+        if lo < len(self.table) and self.table.raw(lo) == key:
+            return lo
+        raise KeyError(term)
+
+    def __iter__(self):
+        return (self.table[i] for i in range(len(self.table)))
+
+    def __len__(self):
+        return len(self.table)
+
+
+class MappedDocMap(Mapping):
+    """doc_map {номер строки: {'filename', 'url'}} без загрузки всех строк в память."""
+
+    def __init__(self, filenames, urls):
+        self.filenames = filenames
+        self.urls = urls
+
+    def __getitem__(self, doc_id):
+        if not 0 <= doc_id < len(self.urls):
+            raise KeyError(doc_id)
+        return {'filename': self.filenames[doc_id], 'url': self.urls[doc_id]}
+
+    def __iter__(self):
+        return iter(range(len(self.urls)))
+
+    def __len__(self):
+        return len(self.urls)
+
+
+class MappedIndex:
+    """
+    Индекс, открытый через np.memmap: все массивы читаются из файлов по мере обращения,
+    поэтому открытие занимает миллисекунды, а несколько процессов делят страницы через кэш ОС.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, HEADER_FILE), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        if header['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format version {header['format_version']}, "
+                             f"expected {FORMAT_VERSION}. Please rebuild the index.")
+
+        def array(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+
+        self.path = path
+        self.generation = header['generation']
+        # Границы шардов: шард i — документы [shard_bounds[i], shard_bounds[i + 1])
+        self.shard_bounds = header.get('shard_bounds', [0, header['n_docs']])
+        self.matrix = sparse.csr_matrix((array('csr_data'), array('csr_indices'), array('csr_indptr')),
+                                        shape=(header['n_docs'], header['n_terms']), copy=False)
+        self.postings = PostingsIndex(array('postings_indptr'), array('postings_doc_ids'),
+                                      array('postings_weights'), header['n_docs'],
+                                      max_weights=array('max_weights'))
+        self.idf = array('idf')
+        self.vocabulary = MappedVocabulary(StringTable(os.path.join(path, 'terms.bin'),
+                                                       os.path.join(path, 'terms_offsets.npy')))
+        self.doc_map = MappedDocMap(
+            StringTable(os.path.join(path, 'filenames.bin'), os.path.join(path, 'filenames_offsets.npy')),
+            StringTable(os.path.join(path, 'urls.bin'), os.path.join(path, 'urls_offsets.npy')))
+        # Позиции токенов и тексты есть только у индексов, собранных из сегментов с позиционными данными
+        self.positions = None
+        if header.get('positions'):
+            self.positions = PositionalIndex(
+                array('token_indptr'), *(array(name) for name in POSITION_ARRAYS),
+                StringTable(os.path.join(path, 'texts.bin'), os.path.join(path, 'texts_offsets.npy')))
+        # Автодополнение есть у индексов, записанных после его появления; старые пересобираются indexer.py --convert
+        self.suggester = None
+        if header.get('suggest'):
+            self.suggester = Suggester(
+                StringTable(os.path.join(path, 'lemmas.bin'), os.path.join(path, 'lemmas_offsets.npy')),
+                array('lemma_df'),
+                StringTable(os.path.join(path, 'suggest_prefixes.bin'),
+                            os.path.join(path, 'suggest_prefixes_offsets.npy')),
+                array('suggest_top'))
+        # Индексы с хэшами удалений прежней версии работают без исправления опечаток до пересборки
+        self.fuzzy = None
+        if header.get('fuzzy') == KEY_VERSION and self.suggester is not None:
+            self.fuzzy = FuzzyIndex(array('fuzzy_keys'), array('fuzzy_lemmas'), self.suggester.lemmas,
+                                    self.suggester.df)
+
+
+def generation_path(generation, index_dir=INDEX_DIR):
+    return os.path.join(index_dir, f"gen_{generation:06d}")
+
+
+def next_generation(index_dir=INDEX_DIR):
+    """
+    Номер следующего поколения: больше всех каталогов gen_* (в том числе недописанных .tmp).
+    Каждая запись индекса получает новый номер, поэтому каталог поколения, которое уже читают,
+    никогда не перезаписывается, а наблюдатель и кэши с поколением в ключе видят смену индекса.
+    """
+    generations = [0]
+    if os.path.isdir(index_dir):
+        for name in os.listdir(index_dir):
+            number = name[len('gen_'):].split('.')[0]
+            if name.startswith('gen_') and number.isdigit():
+                generations.append(int(number))
+    return max(generations) + 1
+
+
+def shard_bounds(indptr, n_shards):
+    """Делит документы на n_shards непрерывных диапазонов с примерно равным числом ненулевых весов."""
+    n_docs = len(indptr) - 1
+    targets = indptr[-1] * np.arange(1, n_shards) / n_shards
+    inner = np.searchsorted(indptr, targets).tolist()
+    return sorted(set([0] + [min(bound, n_docs) for bound in inner] + [n_docs]))
+
+
+def write_index(tfidf_matrix, terms, idf, doc_map, positions=None, n_shards=1, index_dir=INDEX_DIR):
+    """
+    Записывает индекс в каталог нового поколения (next_generation) и переключает на него CURRENT.
+    Каталог заполняется целиком до переключения, так что читатели не видят наполовину записанный индекс.
+    positions — позиции токенов и тексты документов (segments._combine_positions) для фраз и сниппетов.
+    n_shards — на сколько диапазонов документов делить индекс при параллельном поиске;
+    IDF и словарь у шардов общие, поэтому оценки не зависят от разбиения.
+    """
+    generation = next_generation(index_dir)
+    path = generation_path(generation, index_dir)
+    tmp_path = path + '.tmp'
+    os.makedirs(tmp_path)
+
+    matrix = sparse.csr_matrix(tfidf_matrix, dtype=np.float64)
+    matrix.sort_indices()
+    postings = PostingsIndex.from_matrix(matrix)
+    arrays = {
+        'csr_data': matrix.data, 'csr_indices': matrix.indices, 'csr_indptr': matrix.indptr,
+        'postings_indptr': postings.indptr, 'postings_doc_ids': postings.doc_ids,
+        'postings_weights': postings.weights, 'max_weights': postings.max_weights,
+        'idf': np.asarray(idf, dtype=np.float64),
+    }
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(values))
+
+    if positions is not None:
+        for name in ['token_indptr'] + POSITION_ARRAYS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), positions[name])
+        StringTable.write(positions['texts'], os.path.join(tmp_path, 'texts.bin'),
+                          os.path.join(tmp_path, 'texts_offsets.npy'))
+
+    StringTable.write(terms, os.path.join(tmp_path, 'terms.bin'), os.path.join(tmp_path, 'terms_offsets.npy'))
+    lemmas, lemma_df = lemma_frequencies(terms, matrix)
+    prefixes, suggest_top = build_suggestions(lemmas, lemma_df)
+    StringTable.write(lemmas, os.path.join(tmp_path, 'lemmas.bin'), os.path.join(tmp_path, 'lemmas_offsets.npy'))
+    StringTable.write(prefixes, os.path.join(tmp_path, 'suggest_prefixes.bin'),
+                      os.path.join(tmp_path, 'suggest_prefixes_offsets.npy'))
+    np.save(os.path.join(tmp_path, 'lemma_df.npy'), lemma_df)
+    np.save(os.path.join(tmp_path, 'suggest_top.npy'), suggest_top)
+    fuzzy_keys, fuzzy_lemmas = build_fuzzy_index(lemmas)
+    np.save(os.path.join(tmp_path, 'fuzzy_keys.npy'), fuzzy_keys)
+    np.save(os.path.join(tmp_path, 'fuzzy_lemmas.npy'), fuzzy_lemmas)
+    docs = [doc_map[i] for i in range(len(doc_map))]
+    StringTable.write([doc['filename'] for doc in docs], os.path.join(tmp_path, 'filenames.bin'),
+                      os.path.join(tmp_path, 'filenames_offsets.npy'))
+    StringTable.write([doc['url'] for doc in docs], os.path.join(tmp_path, 'urls.bin'),
+                      os.path.join(tmp_path, 'urls_offsets.npy'))
+
+    header = {'format_version': FORMAT_VERSION, 'generation': generation, 'n_docs': matrix.shape[0],
+              'n_terms': matrix.shape[1], 'nnz': int(matrix.nnz),
+              'shard_bounds': shard_bounds(matrix.indptr, n_shards), 'positions': positions is not None,
+              'suggest': True, 'fuzzy': KEY_VERSION}
+    with open(os.path.join(tmp_path, HEADER_FILE), 'w', encoding='utf-8') as f:
+        json.dump(header, f)
+
+    os.replace(tmp_path, path)
+    current_file = os.path.join(index_dir, os.path.basename(CURRENT_FILE))
+    tmp_current = current_file + '.tmp'
+    with open(tmp_current, 'w', encoding='utf-8') as f:
+        f.write(os.path.basename(path))
+    os.replace(tmp_current, current_file)
+
+    # Старые поколения больше не нужны: уже открытые отображения остаются валидными и после удаления файлов
+    for name in os.listdir(index_dir):
+        if name.startswith('gen_') and name != os.path.basename(path):
+            try:
+                shutil.rmtree(os.path.join(index_dir, name))
+            except OSError as e:
+                print(f"Could not remove old index generation {name}: {e}")
+    return path
+
+
+def current_index_path(index_dir=INDEX_DIR):
+    """Каталог поколения, на которое указывает CURRENT."""
+    current_file = os.path.join(index_dir, os.path.basename(CURRENT_FILE))
+    if not os.path.exists(current_file):
+        raise FileNotFoundError(current_file)
+    with open(current_file, 'r', encoding='utf-8') as f:
+        name = f.read().strip()
+    return os.path.join(index_dir, name)
+
+
+def open_index(index_dir=INDEX_DIR):
+    return MappedIndex(current_index_path(index_dir))
+
+
+def current_shard_count():
+    """Число шардов текущего индекса: пересборка без явного --shards сохраняет прежнее разбиение."""
+    try:
+        return len(open_index().shard_bounds) - 1
+    except FileNotFoundError:
+        return 1
+
+
+def load_doc_map():
+    return open_index().doc_map
+
+
+def compile_index(n_shards=None):
+    """Собирает индекс из сегментов (с учетом удаленных документов) и записывает его в отображаемом формате."""
+    from segments import load_index
+    n_shards = n_shards or current_shard_count()
+    tfidf_matrix, vectorizer, doc_map, positions, _ = load_index()
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    return write_index(tfidf_matrix, terms, vectorizer.idf_, doc_map, positions=positions, n_shards=n_shards)
+
+
+def convert_legacy_index(n_shards=None):
+    """Переводит индекс из трех pickle-файлов прежнего формата в отображаемый формат."""
+    import joblib
+    tfidf_matrix = joblib.load(LEGACY_INDEX_FILE)
+    vectorizer = joblib.load(LEGACY_VECTORIZER_FILE)
+    doc_map = joblib.load(LEGACY_DOC_MAP_FILE)
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    return write_index(tfidf_matrix, terms, vectorizer.idf_, doc_map, n_shards=n_shards or current_shard_count())
+
+
+def has_legacy_index():
+    return all(os.path.exists(f) for f in (LEGACY_INDEX_FILE, LEGACY_VECTORIZER_FILE, LEGACY_DOC_MAP_FILE))
\ No newline at end of file
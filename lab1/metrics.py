@@ -0,0 +1,156 @@
+import bisect
+import os
+import threading
+import time
+
+# SEARCH_METRICS=0 отключает сбор: observe и inc сразу возвращаются
+ENABLED = os.environ.get('SEARCH_METRICS', '1') != '0'
+# Метрики отдельных процессов (crawler.py, indexer.py) сохраняются сюда в текстовом формате Prometheus
+# и отдаются приложением на /metrics вместе с его собственными
+METRICS_DIR = os.path.join('data', 'metrics')
+# Границы корзин гистограмм времени, секунды
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0, 30.0, 60.0, 300.0)
+
+registry = []
+# Функции, возвращающие значения, которые уже считаются где-то еще (например, статистика кэшей):
+# [(имя, тип, описание, [(метки, значение)])]
+collectors = []
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        if not ENABLED:
+            return
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        return self.header() + [f"{self.name}{format_labels(self.label_names, labels)} {format_value(value)}"
+                                for labels, value in items]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, *labels):
+        if not ENABLED:
+            return
+        with self.lock:
+            self.values[labels] = value
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными корзинами: на наблюдение — бинарный поиск корзины и три сложения."""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        if not ENABLED:
+            return
+        position = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][position] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self.lock:
+            items = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count)
+                           in self.values.items())
+        lines = self.header()
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{format_labels(self.label_names, labels, [('le', format_value(bound))])} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, labels)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+def render_collected():
+    lines = []
+    for collect in collectors:
+        for name, kind, help_text, samples in collect():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                lines.append(f"{name}{format_labels(labels.keys(), labels.values())} {format_value(value)}")
+    return lines
+
+
+def render(include_files=True):
+    """Все метрики процесса в текстовом формате Prometheus; include_files — добавить файлы из METRICS_DIR."""
+    lines = []
+    for metric in registry:
+        if metric.values:
+            lines += metric.render()
+    lines += render_collected()
+    text = '\n'.join(lines) + '\n'
+    if include_files and os.path.isdir(METRICS_DIR):
+        for name in sorted(os.listdir(METRICS_DIR)):
+            if name.endswith('.prom'):
+                with open(os.path.join(METRICS_DIR, name), 'r', encoding='utf-8') as f:
+                    text += f.read()
+    return text
+
+
+def write_textfile(name):
+    """Сохраняет метрики процесса в METRICS_DIR/<name>.prom (через временный файл, чтобы не читался недописанный)."""
+    if not ENABLED:
+        return None
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"{name}.prom")
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(render(include_files=False))
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def record_stage(timings, stage, started_at):
+    """Добавляет время этапа в миллисекундах в timings (если замер включен); возвращает момент окончания."""
+    now = time.perf_counter()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + (now - started_at) * 1000
+    return now
\ No newline at end of file
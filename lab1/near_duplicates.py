@@ -0,0 +1,101 @@
+import hashlib
+import re
+import time
+from collections import Counter
+import numpy as np
+
+SHINGLE_SIZE = 4
+FINGERPRINT_BITS = 64
+# Документы с расстоянием Хэмминга между отпечатками не больше этого считаются почти-дубликатами
+DEFAULT_MAX_DISTANCE = 3
+
+WORD_RE = re.compile(r'\w+')
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    words = WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return Counter([' '.join(words)]) if words else Counter()
+    return Counter(' '.join(words[i:i + size]) for i in range(len(words) - size + 1))
+
+
+def simhash(text, size=SHINGLE_SIZE):
+    counts = shingles(text, size)
+    if not counts:
+        return 0
+
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little') for s in counts),
+        dtype=np.uint64, count=len(counts))
+    weights = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+
+    # Матрица битов (шинглы x 64): бит i отпечатка равен 1, если взвешенных голосов "за" больше
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    votes = weights @ (bits.astype(np.int64) * 2 - 1)
+
+    fingerprint = 0
+    for i in np.flatnonzero(votes > 0):
+        fingerprint |= 1 << int(i)
+    return fingerprint
+
+
+class SimHashIndex:
+    """
+    LSH-индекс отпечатков SimHash. Отпечаток делится на max_distance + 1 полос:
+    по принципу Дирихле два отпечатка с расстоянием <= max_distance совпадают хотя бы в одной полосе,
+    поэтому точное расстояние считается только для документов из общих корзин.
+    """
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width = FINGERPRINT_BITS // bands
+        self.bands = [(i * width, width if i < bands - 1 else FINGERPRINT_BITS - i * width) for i in range(bands)]
+        self.buckets = [{} for _ in self.bands]
+
+        self.doc_count = 0
+        self.lookups = 0
+        self.skipped = 0
+        self.candidates_checked = 0
+        self.lookup_time = 0.0
+        self.max_lookup_time = 0.0
+
+    def _keys(self, fingerprint):
+        return [(fingerprint >> shift) & ((1 << width) - 1) for shift, width in self.bands]
+
+    def add(self, doc_id, fingerprint):
+        for bucket, key in zip(self.buckets, self._keys(fingerprint)):
+            bucket.setdefault(key, []).append((fingerprint, doc_id))
+        self.doc_count += 1
+
+    def find(self, fingerprint):
+        """Возвращает (doc_id, расстояние) ближайшего почти-дубликата или None."""
+        started_at = time.perf_counter()
+        best = None
+        seen = set()
+        for bucket, key in zip(self.buckets, self._keys(fingerprint)):
+            for other, doc_id in bucket.get(key, ()):
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                distance = bin(fingerprint ^ other).count('1')
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (doc_id, distance)
+
+        elapsed = time.perf_counter() - started_at
+        self.lookups += 1
+        self.candidates_checked += len(seen)
+        self.lookup_time += elapsed
+        self.max_lookup_time = max(self.max_lookup_time, elapsed)
+        if best is not None:
+            self.skipped += 1
+        return best
+
+    def report(self):
+        if not self.lookups:
+            return
+        mean_us = self.lookup_time / self.lookups * 1e6
+        print(f"Почти-дубликаты (расстояние <= {self.max_distance}): пропущено {self.skipped} из {self.lookups} "
+              f"проверок, документов в индексе {self.doc_count}, "
+              f"кандидатов на проверку в среднем {self.candidates_checked / self.lookups:.1f}, "
+              f"время поиска: среднее {mean_us:.1f} мкс, максимум {self.max_lookup_time * 1e6:.1f} мкс.")
\ No newline at end of file
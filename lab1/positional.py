@@ -0,0 +1,114 @@
+import re
+import numpy as np
+
+# Символов текста до и после найденных терминов в сниппете
+SNIPPET_CONTEXT = 80
+# Сколько вхождений терминов перебирается при выборе окна сниппета в длинном документе
+MAX_SNIPPET_HITS = 200
+POSITION_ARRAYS = ['token_terms', 'token_positions', 'token_starts', 'token_ends']
+SPACES_RE = re.compile(r'\s+')
+
+
+def display_text(text):
+    """Смещения токенов посчитаны по тексту в нижнем регистре; если lower() меняет длину строки, храним его."""
+    lowered = text.lower()
+    return text if len(lowered) == len(text) else lowered
+
+
+def build_positions(tokenized_documents, vocabulary):
+    """
+    Позиционные данные документов одним набором плоских массивов: токены документа i —
+    элементы [token_indptr[i], token_indptr[i + 1]). tokenized_documents — кортежи tokenizer.token_positions,
+    vocabulary — lemma_POS -> номер термина.
+    """
+    flat = [token for tokens in tokenized_documents for token in tokens]
+    lengths = [len(tokens) for tokens in tokenized_documents]
+    return {
+        'token_indptr': np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]).astype(np.int64),
+        'token_terms': np.array([vocabulary[token] for token, _, _, _ in flat], dtype=np.int32),
+        'token_positions': np.array([position for _, position, _, _ in flat], dtype=np.int32),
+        'token_starts': np.array([start for _, _, start, _ in flat], dtype=np.int32),
+        'token_ends': np.array([end for _, _, _, end in flat], dtype=np.int32),
+    }
+
+
+class PositionalIndex:
+    """
+    Для каждого документа — последовательность значимых токенов: номер термина, номер токена spaCy
+    (с учетом стоп-слов, чтобы фраза "city of london" совпадала только с тем же расстоянием между словами)
+    и символьные смещения в тексте. Фразы и сниппеты строятся без чтения файлов и без spaCy.
+    """
+
+    def __init__(self, indptr, terms, positions, starts, ends, texts):
+        self.indptr = indptr
+        self.terms = terms
+        self.positions = positions
+        self.starts = starts
+        self.ends = ends
+        self.texts = texts
+
+    def token_range(self, doc_id):
+        return int(self.indptr[doc_id]), int(self.indptr[doc_id + 1])
+
+    def contains_phrase(self, doc_id, phrase):
+        """phrase — [(номер термина, смещение от первого слова фразы)]."""
+        lo, hi = self.token_range(doc_id)
+        terms = self.terms[lo:hi]
+        positions = self.positions[lo:hi]
+        first_term, first_offset = phrase[0]
+        starts = positions[terms == first_term] - first_offset
+        for term, offset in phrase[1:]:
+            if not len(starts):
+                break
+            starts = starts[np.isin(starts + offset, positions[terms == term])]
+        return len(starts) > 0
+
+    def filter_phrases(self, doc_ids, phrases):
+        """Маска документов, содержащих все фразы."""
+        return np.array([all(self.contains_phrase(doc_id, phrase) for phrase in phrases)
+                         for doc_id in doc_ids.tolist()], dtype=bool)
+
+    def snippet(self, doc_id, term_ids, context=SNIPPET_CONTEXT):
+        """
+        KWIC-сниппет: окно текста вокруг места, где встречается больше всего разных терминов запроса.
+        Возвращает части [{'text', 'match'}], где match=True — найденный термин для подсветки.
+        """
+        text = self.texts[doc_id]
+        lo, hi = self.token_range(doc_id)
+        hits = np.flatnonzero(np.isin(self.terms[lo:hi], term_ids))[:MAX_SNIPPET_HITS]
+        if not len(hits):
+            end = min(len(text), 2 * context)
+            return [{'text': SPACES_RE.sub(' ', text[:end]) + ('…' if end < len(text) else ''), 'match': False}]
+
+        starts = self.starts[lo:hi][hits]
+        ends = self.ends[lo:hi][hits]
+        hit_terms = self.terms[lo:hi][hits]
+        window_ends = np.searchsorted(starts, starts + 2 * context)
+        coverage = [len(set(hit_terms[i:j].tolist())) for i, j in enumerate(window_ends.tolist())]
+        first = int(np.argmax(coverage))
+        last = int(window_ends[first])
+
+        window_start = max(0, int(starts[first]) - context)
+        if window_start > 0:
+            # Не начинаем сниппет с середины слова
+            space = text.find(' ', window_start, int(starts[first]))
+            window_start = space + 1 if space != -1 else window_start
+        window_end = min(len(text), int(ends[last - 1]) + context)
+        if window_end < len(text):
+            space = text.rfind(' ', int(ends[last - 1]), window_end)
+            window_end = space if space != -1 else window_end
+
+        pieces = [{'text': '…', 'match': False}] if window_start > 0 else []
+        cursor = window_start
+        while cursor < int(starts[first]) and text[cursor].isspace():
+            cursor += 1
+        for start, end in zip(starts[first:last].tolist(), ends[first:last].tolist()):
+            if start < cursor:
+                continue
+            pieces.append({'text': SPACES_RE.sub(' ', text[cursor:start]), 'match': False})
+            pieces.append({'text': text[start:end], 'match': True})
+            cursor = end
+        pieces.append({'text': SPACES_RE.sub(' ', text[cursor:window_end]).rstrip(), 'match': False})
+        if window_end < len(text):
+            pieces.append({'text': '…', 'match': False})
+        return [piece for piece in pieces if piece['text']]
\ No newline at end of file
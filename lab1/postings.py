@@ -0,0 +1,64 @@
+import numpy as np
+
+
+class PostingsIndex:
+    """
+    Инвертированный индекс: для каждого термина — отсортированный массив номеров документов
+    и веса TF-IDF в них. Хранится как CSC-раскладка: postings терма t = doc_ids[indptr[t]:indptr[t + 1]].
+    max_weights[t] — наибольший вес терма в коллекции, верхняя граница для MaxScore.
+    """
+
+    def __init__(self, indptr, doc_ids, weights, n_docs, max_weights=None):
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.n_docs = n_docs
+        if max_weights is not None:
+            # Уже посчитаны при записи индекса на диск
+            self.max_weights = max_weights
+            return
+
+        max_weights = np.zeros(len(indptr) - 1, dtype=np.float64)
+        non_empty = np.flatnonzero(np.diff(indptr))
+        if len(non_empty):
+            max_weights[non_empty] = np.maximum.reduceat(weights, indptr[non_empty])
+        self.max_weights = max_weights
+
+    @classmethod
+    def from_matrix(cls, tfidf_matrix):
+        csc = tfidf_matrix.tocsc()
+        csc.sort_indices()
+        return cls(csc.indptr, csc.indices, csc.data, tfidf_matrix.shape[0])
+
+    def postings(self, term_index):
+        return self.doc_ids[self.indptr[term_index]:self.indptr[term_index + 1]]
+
+    def term_weights(self, term_index):
+        return self.weights[self.indptr[term_index]:self.indptr[term_index + 1]]
+
+    def df(self, term_index):
+        return int(self.indptr[term_index + 1] - self.indptr[term_index])
+
+    def intersect(self, term_indices):
+        """
+        Документы, содержащие все термины. Списки пересекаются от самого короткого:
+        каждый кандидат ищется бинарным поиском только в той части следующего списка,
+        которая попадает в диапазон кандидатов, поэтому стоимость зависит от длины списков,
+        а не от размера коллекции.
+        """
+        lists = sorted((self.postings(t) for t in set(term_indices)), key=len)
+        if not lists:
+            return np.zeros(0, dtype=self.doc_ids.dtype)
+
+        candidates = lists[0]
+        for postings in lists[1:]:
+            if not len(candidates):
+                break
+            lo = np.searchsorted(postings, candidates[0])
+            hi = np.searchsorted(postings, candidates[-1], side='right')
+            window = postings[lo:hi]
+            positions = np.searchsorted(window, candidates)
+            found = positions < len(window)
+            found[found] = window[positions[found]] == candidates[found]
+            candidates = candidates[found]
+        return candidates
\ No newline at end of file
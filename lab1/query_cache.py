@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Ограниченный по размеру кэш в памяти с вытеснением давно не использованных записей
+    и необязательным временем жизни (ttl, секунды). Потокобезопасен: Flask может обслуживать
+    запросы из нескольких потоков.
+    """
+
+    def __init__(self, max_size, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key, MISSING)
+            if entry is not MISSING:
+                value, stored_at = entry
+                if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                    del self.entries[key]
+                    self.expired += 1
+                else:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return MISSING
+
+    def __contains__(self, key):
+        """Есть ли действующая запись; в отличие от get не считается обращением и не продлевает жизнь записи в LRU."""
+        with self.lock:
+            entry = self.entries.get(key, MISSING)
+            return entry is not MISSING and (self.ttl is None or time.monotonic() - entry[1] <= self.ttl)
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evicted += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evicted': self.evicted,
+                'expired': self.expired,
+            }
\ No newline at end of file
@@ -0,0 +1,100 @@
+import numpy as np
+
+
+def select_top_k(scores, k=None):
+    """
+    Индексы k лучших оценок по убыванию; argpartition вместо полной сортировки всех кандидатов.
+    При равных оценках раньше идет меньший индекс, поэтому порядок не зависит от того,
+    сколькими частями (шардами) были посчитаны оценки.
+    """
+    if k is None or k >= len(scores):
+        return np.argsort(-scores, kind='stable')
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+    above = np.flatnonzero(scores > threshold)
+    ties = np.flatnonzero(scores == threshold)[:k - len(above)]
+    top = np.sort(np.concatenate([above, ties]))
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+def merge_top_k(doc_ids, scores, k=None):
+    """Объединяет top-k нескольких шардов: порядок тот же, что у select_top_k по всем документам сразу."""
+    order = np.lexsort((doc_ids, -scores))
+    if k is not None:
+        order = order[:max(k, 0)]
+    return doc_ids[order], scores[order]
+
+
+def merge_sorted(a, b):
+    """
+    Объединение двух отсортированных массивов без повторов. Устойчивая сортировка (timsort) сливает
+    два готовых отрезка за линейное время, в отличие от np.union1d, который сортирует все заново.
+    """
+    merged = np.concatenate([a, b]).astype(np.int64, copy=False)
+    merged.sort(kind='stable')
+    keep = np.ones(len(merged), dtype=bool)
+    np.not_equal(merged[1:], merged[:-1], out=keep[1:])
+    return merged[keep]
+
+
+def maxscore_top_k(postings, term_indices, query_weights, k=None):
+    """
+    Ранжированный дизъюнктивный поиск (документ содержит хотя бы один термин) с отсечением MaxScore.
+    Термины обрабатываются по убыванию верхней границы вклада query_weight * max_weight.
+    Как только k-я лучшая оценка превышает сумму границ оставшихся терминов, документы,
+    которых еще нет среди кандидатов, попасть в top-k не могут: оставшиеся списки только
+    проверяются бинарным поиском для уже найденных кандидатов, а безнадежные кандидаты отбрасываются.
+    Возвращает (doc_ids, scores, статистика) в порядке убывания оценки.
+    """
+    bounds = np.array([weight * postings.max_weights[t] for t, weight in zip(term_indices, query_weights)])
+    order = np.argsort(bounds)[::-1]
+    remaining = np.concatenate([np.cumsum(bounds[order][::-1])[::-1][1:], [0.0]])
+    stats = {'postings_total': 0, 'postings_scored': 0, 'essential_terms': 0}
+
+    # Существенные термины идут первыми: их списки целиком сливаются в разреженный набор кандидатов,
+    # поэтому стоимость зависит от длины списков, а не от числа документов в коллекции
+    candidates = np.zeros(0, dtype=np.int64)
+    scores = np.zeros(0, dtype=np.float64)
+    threshold = 0.0
+    position = 0
+    while position < len(order):
+        term_position = order[position]
+        if k is not None and len(candidates) >= k and threshold > remaining[position] + bounds[term_position]:
+            break
+        docs = postings.postings(term_indices[term_position])
+        merged = merge_sorted(candidates, docs)
+        merged_scores = np.zeros(len(merged), dtype=np.float64)
+        merged_scores[np.searchsorted(merged, candidates)] = scores
+        # Номера документов в списке термина не повторяются, поэтому np.add.at не нужен
+        merged_scores[np.searchsorted(merged, docs)] += (query_weights[term_position]
+                                                         * postings.term_weights(term_indices[term_position]))
+        candidates, scores = merged, merged_scores
+        stats['postings_total'] += len(docs)
+        stats['postings_scored'] += len(docs)
+        stats['essential_terms'] += 1
+        if k is not None and len(scores) >= k:
+            threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+        position += 1
+
+    # Остальные термины не могут добавить новый документ в top-k: только бинарный поиск по кандидатам
+    for position in range(position, len(order)):
+        if k is not None:
+            keep = scores + remaining[position] + bounds[order[position]] >= threshold
+            candidates, scores = candidates[keep], scores[keep]
+        term_position = order[position]
+        docs = postings.postings(term_indices[term_position])
+        stats['postings_total'] += len(docs)
+        if not len(candidates):
+            continue
+        positions = np.searchsorted(docs, candidates)
+        found = positions < len(docs)
+        found[found] = docs[positions[found]] == candidates[found]
+        weights = postings.term_weights(term_indices[term_position])
+        scores[found] += query_weights[term_position] * weights[positions[found]]
+        stats['postings_scored'] += int(found.sum())
+        if k is not None and len(scores) >= k:
+            threshold = max(threshold, np.partition(scores, len(scores) - k)[len(scores) - k])
+
+    top = select_top_k(scores, k)
+    return candidates[top], scores[top], stats
\ No newline at end of file
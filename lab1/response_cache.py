@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import time
+
+DATA_DIR = 'data'
+RESPONSE_CACHE_FILE = os.path.join(DATA_DIR, 'response_cache.db')
+
+
+class ResponseCache:
+    """
+    Валидаторы HTTP (ETag, Last-Modified) и хэш извлеченного текста для каждого сохраненного URL.
+    По ним повторный обход отправляет условные запросы и не переписывает неизменившиеся документы.
+    """
+
+    def __init__(self, db_file=RESPONSE_CACHE_FILE):
+        os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_file)
+        self.cursor = self.conn.cursor()
+        self.create_table()
+
+    def create_table(self):
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            doc_id INTEGER NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            fetched_at REAL
+        )
+        """)
+        self.conn.commit()
+
+    def reset(self):
+        self.cursor.execute("DELETE FROM pages")
+        self.conn.commit()
+
+    def store(self, url, doc_id, etag, last_modified, content_hash):
+        """Запоминает ответ; изменения фиксируются вызовом commit()."""
+        self.cursor.execute("""
+        INSERT INTO pages (url, doc_id, etag, last_modified, content_hash, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(url) DO UPDATE SET
+        doc_id=excluded.doc_id,
+        etag=excluded.etag,
+        last_modified=excluded.last_modified,
+        content_hash=excluded.content_hash,
+        fetched_at=excluded.fetched_at
+        """, (url, doc_id, etag, last_modified, content_hash, time.time()))
+
+    def remove(self, url):
+        self.cursor.execute("DELETE FROM pages WHERE url=?", (url,))
+
+    def get_all(self):
+        """Возвращает {url: (doc_id, etag, last_modified, content_hash)}."""
+        self.cursor.execute("SELECT url, doc_id, etag, last_modified, content_hash FROM pages ORDER BY doc_id")
+        return {row[0]: row[1:] for row in self.cursor.fetchall()}
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
\ No newline at end of file
@@ -1,60 +1,489 @@
-import joblib
-from sklearn.metrics.pairwise import cosine_similarity
-from tokenizer import spacy_tokenizer
-from indexer import INDEX_FILE, VECTORIZER_FILE, DOC_MAP_FILE
-import numpy as np
-
-try:
-    tfidf_matrix = joblib.load(INDEX_FILE)
-    vectorizer = joblib.load(VECTORIZER_FILE)
-    doc_map = joblib.load(DOC_MAP_FILE)
-    if vectorizer:
-        terms = vectorizer.get_feature_names_out()
-    else:
-        terms = None
-except FileNotFoundError:
-    tfidf_matrix, vectorizer, doc_map, terms = None, None, None, None
-
-
-def search_query(query):
-    if not all([tfidf_matrix is not None, vectorizer is not None, doc_map is not None, terms is not None]):
-        return [], "Index not found. Please run indexer.py."
-
-    query_tokens_with_pos = spacy_tokenizer(query)
-    if not query_tokens_with_pos:
-        return [], "Please enter a valid query."
-
-    candidate_doc_indices = set(range(tfidf_matrix.shape[0]))
-
-    for token in query_tokens_with_pos:
-        if token in vectorizer.vocabulary_:
-            term_index = vectorizer.vocabulary_[token]
-            docs_with_term = set(tfidf_matrix[:, term_index].nonzero()[0])
-            candidate_doc_indices &= docs_with_term
-        else:
-            clean_token = token.split('_')[0]
-            return [], f"Term '{clean_token}' in its context not found. No results possible."
-
-    if not candidate_doc_indices:
-        return [], "No documents match all query terms."
-
-    final_candidate_list = list(candidate_doc_indices)
-    query_vec = vectorizer.transform([query])
-    candidate_matrix = tfidf_matrix[final_candidate_list, :]
-    scores = cosine_similarity(query_vec, candidate_matrix).flatten()
-    sorted_inner_indices = np.argsort(scores)[::-1]
-
-    results = []
-    clean_query_tokens = [t.split('_')[0] for t in query_tokens_with_pos]
-
-    for i in sorted_inner_indices:
-        doc_id = final_candidate_list[i]
-        score = scores[i]
-
-        results.append({
-            'url': doc_map[doc_id]['url'],
-            'score': score,
-            'found_words': clean_query_tokens
-        })
-
-    return results, None
\ No newline at end of file
+import hashlib
+import os
+import re
+import threading
+import time
+from tokenizer import spacy_tokenizer, query_positions, tokenize_documents, load_nlp, is_loaded
+from mapped_index import MappedIndex, current_index_path, INDEX_DIR
+from shards import make_searcher
+from metrics import Counter, Histogram, collectors, record_stage
+from query_cache import LRUCache, MISSING
+import numpy as np
+
+TOKENIZATION_CACHE_SIZE = 10000
+RESULT_CACHE_SIZE = 2000
+# Результаты живут ограниченное время; при смене поколения индекса они перестают находиться сразу
+RESULT_CACHE_TTL = 300
+# Фразовый запрос: слова в кавычках должны идти в документе подряд (с учетом стоп-слов между ними)
+PHRASE_RE = re.compile(r'"([^"]+)"')
+# Сниппеты строятся только для первых результатов — тех, что помещаются на страницу выдачи
+SNIPPET_RESULTS = 50
+# Как часто фоновый поток проверяет, не появилось ли новое поколение индекса
+RELOAD_POLL_SECONDS = 5
+# SEARCH_FUZZY=1 — исправлять опечатки по умолчанию; API включает исправление параметром fuzzy=1
+FUZZY_DEFAULT = os.environ.get('SEARCH_FUZZY', '0') == '1'
+# Появление этого файла — сигнал перезагрузить индекс, даже если поколение не изменилось
+RELOAD_SIGNAL_FILE = os.path.join(INDEX_DIR, 'RELOAD')
+SEARCH_MODES = ['and', 'or']
+
+tokenization_cache = LRUCache(TOKENIZATION_CACHE_SIZE)
+result_cache = LRUCache(RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+
+QUERY_SECONDS = Histogram('search_query_seconds', "Search query time, including result cache hits.", ['mode'])
+STAGE_SECONDS = Histogram('search_stage_seconds', "Time spent in each search stage.", ['stage'])
+QUERIES = Counter('search_queries_total', "Search queries by mode and outcome.", ['mode', 'outcome'])
+
+# (индекс, поисковик по его шардам). Открывается при первом запросе или прогреве;
+# пока индекса нет, каждый запрос пробует снова. При перезагрузке кортеж заменяется целиком одним
+# присваиванием: запрос, уже взявший старый кортеж, дорабатывает на старом поколении
+current = None
+index_lock = threading.Lock()
+reload_stats = {'generation': None, 'reloads': 0, 'last_reload_seconds': None, 'last_reload_at': None,
+                'last_error': None}
+watcher = None
+# False — шарды не получают своих процессов (см. search_in_process)
+shard_processes = True
+
+
+def load_search_index():
+    if current is None:
+        try:
+            reload_index()
+        except FileNotFoundError:
+            pass
+    return current
+
+
+def reload_index(force=False):
+    """
+    Открывает поколение, на которое указывает CURRENT, прогревает его и подменяет им текущее.
+    Без force ничего не делает, если это поколение уже загружено. Возвращает True, если индекс заменен.
+    Старый индекс освобождается, когда на него не останется ссылок у выполняющихся запросов.
+    """
+    global current
+    with index_lock:
+        path = current_index_path()
+        if not force and current is not None and os.path.abspath(current[0].path) == os.path.abspath(path):
+            return False
+        started_at = time.perf_counter()
+        index = MappedIndex(path)
+        searcher = make_searcher(index, sharded=shard_processes)
+        searcher.warm_up()
+        current = (index, searcher)
+        # Ключи кэша содержат поколение, так что старые ответы уже не найдутся; освобождаем их память сразу
+        result_cache.clear()
+        reload_stats.update(generation=index.generation, reloads=reload_stats['reloads'] + 1,
+                            last_reload_seconds=time.perf_counter() - started_at, last_reload_at=time.time(),
+                            last_error=None)
+    return True
+
+
+def search_in_process():
+    """Дальнейший поиск идет по всему индексу в этом процессе: для процессов, которые сами работают в пуле."""
+    global shard_processes, current
+    shard_processes = False
+    # Индекс, унаследованный при fork, ищет через процессы шардов родителя; он откроется заново при первом запросе
+    current = None
+
+
+def check_for_new_index():
+    """Одна проверка наблюдателя: перезагрузка при смене CURRENT или по файлу-сигналу."""
+    signalled = os.path.exists(RELOAD_SIGNAL_FILE)
+    try:
+        reloaded = reload_index(force=signalled)
+    except Exception as e:
+        # Индексатор мог как раз переключать поколения; текущий индекс продолжает работать
+        reload_stats['last_error'] = str(e)
+        return False
+    if signalled:
+        try:
+            os.remove(RELOAD_SIGNAL_FILE)
+        except FileNotFoundError:
+            pass
+    if reloaded:
+        print(f"Index generation {reload_stats['generation']} loaded in "
+              f"{reload_stats['last_reload_seconds'] * 1000:.1f} ms")
+    return reloaded
+
+
+def start_index_watcher(interval=RELOAD_POLL_SECONDS):
+    """Фоновый поток, подхватывающий новые поколения индекса без перезапуска приложения."""
+    global watcher
+
+    def watch():
+        while True:
+            time.sleep(interval)
+            check_for_new_index()
+
+    if watcher is None:
+        watcher = threading.Thread(target=watch, daemon=True)
+        watcher.start()
+    return watcher
+
+
+def warm_up():
+    load_nlp()
+    load_search_index()
+
+
+def readiness():
+    return {'spacy_model': is_loaded(), 'index': current is not None}
+
+
+def index_status():
+    return dict(reload_stats, watching=watcher is not None)
+
+
+def collect_metrics():
+    """Статистика кэшей и перезагрузок индекса для /metrics: она уже ведется, поэтому читается при выдаче."""
+    caches = {'tokenization': tokenization_cache.stats(), 'results': result_cache.stats()}
+    metrics = [
+        ('search_cache_hits_total', 'counter', "Search cache hits.",
+         [({'cache': name}, stats['hits']) for name, stats in caches.items()]),
+        ('search_cache_misses_total', 'counter', "Search cache misses.",
+         [({'cache': name}, stats['misses']) for name, stats in caches.items()]),
+        ('search_cache_entries', 'gauge', "Entries in search caches.",
+         [({'cache': name}, stats['entries']) for name, stats in caches.items()]),
+        ('search_index_reloads_total', 'counter', "Index generations loaded by this process.",
+         [({}, reload_stats['reloads'])]),
+    ]
+    if reload_stats['generation'] is not None:
+        metrics += [
+            ('search_index_generation', 'gauge', "Index generation being served.", [({}, reload_stats['generation'])]),
+            ('search_index_last_reload_seconds', 'gauge', "Duration of the last index load.",
+             [({}, reload_stats['last_reload_seconds'])]),
+        ]
+    return metrics
+
+
+collectors.append(collect_metrics)
+
+
+def format_results(index, doc_ids, scores, query_tokens_with_pos, highlight_terms):
+    results = []
+    clean_query_tokens = [t.split('_')[0] for t in query_tokens_with_pos]
+
+    for rank, (doc_id, score) in enumerate(zip(doc_ids.tolist(), scores)):
+        snippet = None
+        if index.positions is not None and rank < SNIPPET_RESULTS:
+            snippet = index.positions.snippet(doc_id, highlight_terms)
+        results.append({
+            'url': index.doc_map[doc_id]['url'],
+            'filename': index.doc_map[doc_id]['filename'],
+            'score': score,
+            'found_words': clean_query_tokens,
+            'snippet': snippet
+        })
+
+    return results
+
+
+def normalize_query(query):
+    return ' '.join(query.split())
+
+
+def tokenize_query(query):
+    """
+    Возвращает (токены запроса, токены для векторизации). Вторые совпадают с тем, что получил бы
+    vectorizer.transform: он переводит текст в нижний регистр перед токенизацией.
+    Результат кэшируется по нормализованному тексту, поэтому spaCy для повторного запроса не вызывается.
+    """
+    tokens = tokenization_cache.get(query)
+    if tokens is MISSING:
+        query_tokens = tuple(spacy_tokenizer(query))
+        lowered = query.lower()
+        scoring_tokens = query_tokens if lowered == query else tuple(spacy_tokenizer(lowered))
+        tokens = (query_tokens, scoring_tokens)
+        tokenization_cache.put(query, tokens)
+    return tokens
+
+
+def query_phrases(query):
+    """Фразы в кавычках: кортежи (lemma_POS, смещение от первого слова) по тексту в нижнем регистре."""
+    phrases = []
+    for text in PHRASE_RE.findall(query):
+        key = ('phrase', text.lower())
+        phrase = tokenization_cache.get(key)
+        if phrase is MISSING:
+            tokens = query_positions(text.lower())
+            phrase = tuple((token, position - tokens[0][1]) for token, position, _, _ in tokens) if tokens else ()
+            tokenization_cache.put(key, phrase)
+        if phrase:
+            phrases.append(phrase)
+    return tuple(phrases)
+
+
+def query_vector(index, scoring_tokens):
+    """Ненулевые элементы vectorizer.transform([query]) (номера терминов и веса), но по готовым токенам."""
+    counts = {}
+    for token in scoring_tokens:
+        term_index = index.vocabulary.get(token)
+        if term_index is not None:
+            counts[term_index] = counts.get(term_index, 0) + 1
+    indices = np.array(sorted(counts), dtype=np.int32)
+    data = np.array([counts[i] for i in indices.tolist()], dtype=np.float64) * index.idf[indices]
+    if len(data):
+        data /= np.sqrt(np.dot(data, data))
+    return indices, data
+
+
+def suggest_terms(prefix, limit):
+    """Подсказки по префиксу: (список (лемма, число документов), ошибка)."""
+    loaded = load_search_index()
+    if loaded is None:
+        return [], "Index not found. Please run indexer.py."
+    if loaded[0].suggester is None:
+        return [], "Suggestions need a newer index. Please run indexer.py --convert."
+    return loaded[0].suggester.suggest(prefix, limit), None
+
+
+def cache_stats():
+    return {'tokenization': tokenization_cache.stats(), 'results': result_cache.stats()}
+
+
+def observe_query(mode, started_at, stage_times, error, timings=None):
+    """
+    Время запроса и его этапов — в гистограммы /metrics и, если передан, в словарь timings вызывающего.
+    Неизвестный mode учитывается как 'other', чтобы произвольные значения из запроса не плодили серии метрик.
+    """
+    mode = mode if mode in SEARCH_MODES else 'other'
+    QUERY_SECONDS.observe(time.perf_counter() - started_at, mode)
+    QUERIES.inc(mode, 'error' if error else 'ok')
+    for stage, milliseconds in stage_times.items():
+        STAGE_SECONDS.observe(milliseconds / 1000, stage)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + milliseconds
+
+
+def search_query(query, top_k=None, mode='and', timings=None, fuzzy=None):
+    """
+    mode='and' — документы со всеми терминами запроса (как раньше);
+    mode='or' — ранжированный поиск по любому из терминов с отсечением MaxScore.
+    top_k ограничивает число возвращаемых результатов (None — все).
+    Ответы кэшируются по токенам запроса и поколению индекса.
+    timings — словарь, в который записывается время этапов (tokenization, fuzzy, matching, scoring, formatting) в мс.
+    fuzzy — заменять слова, которых нет в словаре, ближайшими терминами (None — по SEARCH_FUZZY).
+    """
+    started_at = time.perf_counter()
+    stage_times = {}
+    results, error = cached_search(query, top_k, mode, stage_times, FUZZY_DEFAULT if fuzzy is None else fuzzy)
+    observe_query(mode, started_at, stage_times, error, timings)
+    return results, error
+
+
+def cached_search(query, top_k, mode, timings, fuzzy=False):
+    loaded = load_search_index()
+    if loaded is None:
+        return [], "Index not found. Please run indexer.py."
+    index, searcher = loaded
+
+    started_at = time.perf_counter()
+    normalized = normalize_query(query)
+    query_tokens, scoring_tokens = tokenize_query(normalized)
+    phrases = query_phrases(normalized)
+    started_at = record_stage(timings, 'tokenization', started_at)
+    if fuzzy:
+        query_tokens, scoring_tokens, _ = correct_query(index, query_tokens, scoring_tokens)
+        record_stage(timings, 'fuzzy', started_at)
+    key = (query_tokens, scoring_tokens, phrases, index.generation, top_k, mode)
+    cached = result_cache.get(key)
+    if cached is not MISSING:
+        results, error = cached
+        return list(results), error
+
+    results, error = _search(index, searcher, list(query_tokens), scoring_tokens, phrases, top_k, mode, timings)
+    result_cache.put(key, (results, error))
+    return list(results), error
+
+
+def search_page(query, offset=0, limit=10, mode='and', timings=None, fuzzy=None):
+    """
+    Страница выдачи [offset, offset + limit): ранжируются только первые offset + limit + 1 документов
+    (лишний — чтобы узнать, есть ли следующая страница), а форматируются и получают сниппеты только
+    документы страницы. Возвращает {'results', 'has_more', 'terms', 'corrections', 'error'}.
+    """
+    started_at = time.perf_counter()
+    stage_times = {}
+    page = cached_page(query, offset, limit, mode, stage_times, FUZZY_DEFAULT if fuzzy is None else fuzzy)
+    observe_query(mode, started_at, stage_times, page['error'], timings)
+    return page
+
+
+def cached_page(query, offset, limit, mode, timings, fuzzy=False):
+    loaded = load_search_index()
+    if loaded is None:
+        return {'results': [], 'has_more': False, 'terms': [], 'corrections': {},
+                'error': "Index not found. Please run indexer.py."}
+    index, searcher = loaded
+
+    started_at = time.perf_counter()
+    normalized = normalize_query(query)
+    query_tokens, scoring_tokens = tokenize_query(normalized)
+    phrases = query_phrases(normalized)
+    started_at = record_stage(timings, 'tokenization', started_at)
+    corrections = {}
+    if fuzzy:
+        query_tokens, scoring_tokens, corrections = correct_query(index, query_tokens, scoring_tokens)
+        record_stage(timings, 'fuzzy', started_at)
+    key = (query_tokens, scoring_tokens, phrases, index.generation, ('page', offset, limit), mode,
+           tuple(sorted(corrections.items())))
+    cached = result_cache.get(key)
+    if cached is not MISSING:
+        return dict(cached, results=list(cached['results']))
+
+    doc_ids, scores, query_indices, error = _rank(index, searcher, list(query_tokens), scoring_tokens, phrases,
+                                                  offset + limit + 1, mode, timings)
+    started_at = time.perf_counter()
+    page = {
+        'results': format_results(index, doc_ids[offset:offset + limit], scores[offset:offset + limit],
+                                  query_tokens, query_indices),
+        'has_more': len(doc_ids) > offset + limit,
+        'terms': [token.split('_')[0] for token in query_tokens],
+        'corrections': corrections,
+        'error': error,
+    }
+    record_stage(timings, 'formatting', started_at)
+    result_cache.put(key, page)
+    return dict(page, results=list(page['results']))
+
+
+def closest_term(index, lemma, pos):
+    """
+    Термин словаря для слова с опечаткой: ближайшая лемма (при равенстве — чаще встречающаяся), с той же
+    частью речи, если она есть в словаре, иначе ее самый частый вариант. None — ничего на расстоянии 1–2.
+    """
+    table = index.vocabulary.table
+    document_counts = np.diff(index.postings.indptr)
+    for candidate, _, _ in index.fuzzy.candidates(lemma):
+        same_pos = index.vocabulary.get(f"{candidate}_{pos}")
+        if same_pos is not None:
+            return f"{candidate}_{pos}"
+        key = f"{candidate}_".encode('utf-8')
+        lo = table.lower_bound(key)
+        hi = table.lower_bound(key + b'\xff', lo)
+        if hi > lo:
+            return table[lo + int(np.argmax(document_counts[lo:hi]))]
+    return None
+
+
+def correct_query(index, query_tokens, scoring_tokens):
+    """
+    Заменяет токены, которых нет в словаре, ближайшими терминами из индекса удалений.
+    Возвращает (токены запроса, токены для векторизации, {слово: исправление}); исправления кэшируются
+    по поколению индекса.
+    """
+    if index.fuzzy is None:
+        return query_tokens, scoring_tokens, {}
+    replacements = {}
+    for token in set(query_tokens) | set(scoring_tokens):
+        if token in index.vocabulary or '_' not in token:
+            continue
+        key = ('fuzzy', index.generation, token)
+        replacement = tokenization_cache.get(key)
+        if replacement is MISSING:
+            replacement = closest_term(index, *token.rsplit('_', 1))
+            tokenization_cache.put(key, replacement)
+        if replacement is not None:
+            replacements[token] = replacement
+    corrections = {token.rsplit('_', 1)[0]: replacement.rsplit('_', 1)[0]
+                   for token, replacement in replacements.items()}
+    return (tuple(replacements.get(token, token) for token in query_tokens),
+            tuple(replacements.get(token, token) for token in scoring_tokens), corrections)
+
+
+def result_etag(query, offset, limit, mode, fuzzy=False):
+    """
+    ETag ответа API: выдача определяется поколением индекса и параметрами запроса, поэтому его можно
+    проверить до поиска. None — индекс еще не открыт.
+    """
+    loaded = load_search_index()
+    if loaded is None:
+        return None
+    key = f"{loaded[0].generation}|{mode}|{offset}|{limit}|{int(fuzzy)}|{normalize_query(query)}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def prepare_queries(queries):
+    """
+    Токенизирует в кэш одним проходом nlp.pipe все запросы пакета, которых в нем еще нет:
+    после этого search_page для каждого из них spaCy не вызывает. Проверка через `in` не попадает
+    в статистику кэша, поэтому каждый запрос пакета учитывается один раз — при поиске.
+    """
+    missing = list(dict.fromkeys(q for q in map(normalize_query, queries) if q not in tokenization_cache))
+    if not missing:
+        return
+    lowered = [q.lower() for q in missing]
+    texts = missing + [text for q, text in zip(missing, lowered) if text != q]
+    tokenized = dict(zip(texts, tokenize_documents(texts)))
+    for q, text in zip(missing, lowered):
+        query_tokens = tuple(tokenized[q])
+        tokenization_cache.put(q, (query_tokens, tuple(tokenized[text]) if text != q else query_tokens))
+
+
+def phrase_term_ids(index, phrases):
+    """Переводит фразы в [(номер термина, смещение)]; возвращает (фразы, ошибка)."""
+    result = []
+    for phrase in phrases:
+        term_ids = []
+        for token, offset in phrase:
+            term_index = index.vocabulary.get(token)
+            if term_index is None:
+                words = ' '.join(token.split('_')[0] for token, _ in phrase)
+                return None, f"Phrase \"{words}\" not found. No results possible."
+            term_ids.append((term_index, offset))
+        result.append(term_ids)
+    return result, None
+
+
+def _search(index, searcher, query_tokens_with_pos, scoring_tokens, phrases, top_k, mode, timings=None):
+    doc_ids, scores, query_indices, error = _rank(index, searcher, query_tokens_with_pos, scoring_tokens, phrases,
+                                                  top_k, mode, timings)
+    if error:
+        return [], error
+
+    started_at = time.perf_counter()
+    results = format_results(index, doc_ids, scores, query_tokens_with_pos, query_indices)
+    record_stage(timings, 'formatting', started_at)
+    return results, None
+
+
+def _rank(index, searcher, query_tokens_with_pos, scoring_tokens, phrases, top_k, mode, timings=None):
+    """Первые top_k документов по убыванию оценки: (номера, оценки, термины для подсветки, ошибка)."""
+    no_results = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.int32)
+    started_at = time.perf_counter()
+    if not query_tokens_with_pos:
+        return (*no_results, "Please enter a valid query.")
+
+    if phrases and index.positions is None:
+        return (*no_results, "Phrase queries need token positions. Please rebuild the index with indexer.py.")
+    phrase_ids, error = phrase_term_ids(index, phrases)
+    if error:
+        return (*no_results, error)
+
+    term_indices = []
+    if mode != 'or':
+        for token in query_tokens_with_pos:
+            term_index = index.vocabulary.get(token)
+            if term_index is not None:
+                term_indices.append(term_index)
+            else:
+                clean_token = token.split('_')[0]
+                return (*no_results, f"Term '{clean_token}' in its context not found. No results possible.")
+
+    query_indices, query_weights = query_vector(index, scoring_tokens)
+    if mode == 'or' and not len(query_indices):
+        return (*no_results, "None of the query terms were found. No results possible.")
+
+    # С фразами top-k отбирается после проверки позиций: до нее неизвестно, какие документы останутся
+    record_stage(timings, 'matching', started_at)
+    doc_ids, scores = searcher.search(mode, term_indices, query_indices.tolist(), query_weights.tolist(),
+                                      None if phrases else top_k, timings)
+    if phrases:
+        started_at = time.perf_counter()
+        matches = index.positions.filter_phrases(doc_ids, phrase_ids)
+        doc_ids, scores = doc_ids[matches][:top_k], scores[matches][:top_k]
+        record_stage(timings, 'matching', started_at)
+
+    if not len(doc_ids):
+        return (*no_results, "No documents match all query terms.")
+    return doc_ids, scores, query_indices, None
\ No newline at end of file
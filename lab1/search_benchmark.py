@@ -0,0 +1,206 @@
+import argparse
+import itertools
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import search
+from query_cache import LRUCache
+
+STAGES = ['tokenization', 'fuzzy', 'matching', 'scoring', 'formatting']
+PERCENTILES = [50, 95, 99]
+REQUESTS = 500
+CLIENTS = 4
+# Для открытой нагрузки: запросов в секунду и сколько потоков может обслуживать их одновременно
+ARRIVAL_RATE = 50
+OPEN_LOOP_WORKERS = 32
+SYNTHETIC_QUERIES = 200
+MAX_QUERY_TERMS = 3
+# Регрессия — рост перцентиля больше чем на долю THRESHOLD от базового значения и не меньше MIN_REGRESSION_MS
+REGRESSION_THRESHOLD = 0.2
+MIN_REGRESSION_MS = 0.1
+
+
+def load_query_log(path=None):
+    """Запросы по одному в строке; без path — тексты запросов из eval_data/queries.txt."""
+    if path is None:
+        from evaluation import load_queries
+        return list(load_queries().values())
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def synthetic_queries(index, n_queries=SYNTHETIC_QUERIES, seed=0):
+    """Запросы из 1–3 лемм одного случайного документа, чтобы в режиме 'and' у них были результаты."""
+    rng = np.random.default_rng(seed)
+    n_docs = index.matrix.shape[0]
+    queries = []
+    while len(queries) < n_queries:
+        doc_id = int(rng.integers(n_docs))
+        terms = index.matrix.indices[index.matrix.indptr[doc_id]:index.matrix.indptr[doc_id + 1]]
+        if not len(terms):
+            continue
+        chosen = rng.choice(terms, size=min(len(terms), int(rng.integers(1, MAX_QUERY_TERMS + 1))), replace=False)
+        queries.append(' '.join(index.vocabulary.table[int(term)].rsplit('_', 1)[0] for term in chosen))
+    return queries
+
+
+def run_query(query, top_k, mode):
+    timings = {}
+    started_at = time.perf_counter()
+    _, error = search.search_query(query, top_k=top_k, mode=mode, timings=timings)
+    return (time.perf_counter() - started_at) * 1000, timings, error
+
+
+def closed_loop(queries, clients=CLIENTS, requests=REQUESTS, top_k=None, mode='and'):
+    """clients потоков отправляют запросы один за другим без пауз; QPS — пропускная способность при такой нагрузке."""
+    counter = itertools.count()
+    samples = []
+    samples_lock = threading.Lock()
+
+    def client():
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            sample = run_query(queries[i % len(queries)], top_k, mode)
+            with samples_lock:
+                samples.append(sample)
+
+    started_at = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started_at
+
+
+def open_loop(queries, rate=ARRIVAL_RATE, requests=REQUESTS, top_k=None, mode='and', seed=0):
+    """
+    Запросы приходят пуассоновским потоком с заданной частотой независимо от того, успевает ли поиск.
+    Задержка считается от запланированного момента прихода, поэтому включает ожидание в очереди.
+    """
+    arrivals = np.cumsum(np.random.default_rng(seed).exponential(1 / rate, size=requests))
+
+    def timed_query(i, scheduled_at):
+        latency, timings, error = run_query(queries[i % len(queries)], top_k, mode)
+        waited = (time.perf_counter() - scheduled_at) * 1000 - latency
+        return latency + waited, timings, error
+
+    started_at = time.perf_counter()
+    futures = []
+    with ThreadPoolExecutor(max_workers=OPEN_LOOP_WORKERS) as pool:
+        for i, arrival in enumerate(arrivals.tolist()):
+            delay = started_at + arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(timed_query, i, started_at + arrival))
+        samples = [future.result() for future in futures]
+    return samples, time.perf_counter() - started_at
+
+
+def percentiles(values):
+    values = np.asarray(values, dtype=np.float64)
+    summary = {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES}
+    summary['mean'] = float(values.mean())
+    return summary
+
+
+def summarize(samples, elapsed):
+    """Задержка всего запроса и каждого этапа; этап, до которого запрос не дошел, считается нулевым."""
+    return {
+        'requests': len(samples),
+        'qps': len(samples) / elapsed,
+        'errors': sum(1 for _, _, error in samples if error),
+        'latency_ms': percentiles([latency for latency, _, _ in samples]),
+        'stages_ms': {stage: percentiles([timings.get(stage, 0.0) for _, timings, _ in samples])
+                      for stage in STAGES},
+    }
+
+
+def compare(result, baseline, threshold=REGRESSION_THRESHOLD):
+    """Список регрессий (метрика, база, сейчас) по перцентилям всего запроса и этапов."""
+    pairs = [('latency', result['latency_ms'], baseline['latency_ms'])]
+    pairs += [(stage, result['stages_ms'][stage], baseline['stages_ms'][stage])
+              for stage in STAGES if stage in baseline.get('stages_ms', {})]
+    regressions = []
+    for name, current, base in pairs:
+        for p in PERCENTILES:
+            key = f"p{p}"
+            if current[key] > base[key] * (1 + threshold) and current[key] - base[key] >= MIN_REGRESSION_MS:
+                regressions.append((f"{name} {key}", base[key], current[key]))
+    return regressions
+
+
+def print_result(result):
+    config = result['config']
+    load = (f"{config['clients']} клиентов" if config['loop'] == 'closed'
+            else f"{config['rate']} запросов/с")
+    print(f"Нагрузка: {config['loop']} loop, {load}, режим {config['mode']}, top_k={config['top_k']}, "
+          f"кэш результатов: {'вкл' if config['result_cache'] else 'выкл'}")
+    print(f"Запросов: {result['requests']} (без результатов: {result['errors']}), QPS: {result['qps']:.1f}")
+    print(f"{'этап':<14}" + ''.join(f"{key:>10}" for key in ['p50', 'p95', 'p99', 'mean']))
+    for name, summary in [('всего', result['latency_ms'])] + list(result['stages_ms'].items()):
+        print(f"{name:<14}" + ''.join(f"{summary[key]:10.3f}" for key in ['p50', 'p95', 'p99', 'mean']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Задержка и пропускная способность search_query по этапам")
+    parser.add_argument('--loop', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--clients', type=int, default=CLIENTS, help="потоков-клиентов в closed loop")
+    parser.add_argument('--rate', type=float, default=ARRIVAL_RATE, help="запросов в секунду в open loop")
+    parser.add_argument('--requests', type=int, default=REQUESTS)
+    parser.add_argument('--queries', help="файл с запросами по одному в строке (по умолчанию eval_data/queries.txt)")
+    parser.add_argument('--synthetic', type=int, metavar='N', help="сгенерировать N запросов из документов индекса")
+    parser.add_argument('--mode', choices=['and', 'or'], default='and')
+    parser.add_argument('--top-k', type=int)
+    parser.add_argument('--result-cache', action='store_true',
+                        help="не отключать кэш результатов (по умолчанию каждый запрос выполняется полностью)")
+    parser.add_argument('--fuzzy', action='store_true', help="исправлять опечатки в запросах (этап fuzzy)")
+    parser.add_argument('--save', help="сохранить результат в JSON")
+    parser.add_argument('--baseline', help="JSON прошлого прогона; код возврата 1 при регрессии")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="допустимый рост перцентилей относительно базы (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    search.warm_up()
+    search.FUZZY_DEFAULT = search.FUZZY_DEFAULT or args.fuzzy
+    loaded = search.load_search_index()
+    if loaded is None:
+        sys.exit("Индекс не найден. Запустите indexer.py.")
+    queries = synthetic_queries(loaded[0], args.synthetic) if args.synthetic else load_query_log(args.queries)
+    if not args.result_cache:
+        # Кэш нулевого размера: каждый ответ вытесняется сразу после записи
+        search.result_cache = LRUCache(0)
+    # Прогрев: первое обращение к страницам индекса и заполнение кэша токенизации
+    for query in queries:
+        run_query(query, args.top_k, args.mode)
+
+    if args.loop == 'closed':
+        samples, elapsed = closed_loop(queries, args.clients, args.requests, args.top_k, args.mode)
+    else:
+        samples, elapsed = open_loop(queries, args.rate, args.requests, args.top_k, args.mode)
+    result = summarize(samples, elapsed)
+    result['config'] = {'loop': args.loop, 'clients': args.clients, 'rate': args.rate, 'mode': args.mode,
+                        'top_k': args.top_k, 'result_cache': args.result_cache, 'fuzzy': search.FUZZY_DEFAULT,
+                        'queries': len(queries),
+                        'generation': loaded[0].generation}
+    print_result(result)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"Результат сохранен в {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        for name, base, current in regressions:
+            print(f"Регрессия: {name} {base:.3f} мс -> {current:.3f} мс (+{(current / base - 1) * 100:.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"Регрессий относительно {args.baseline} нет (порог {args.threshold:.0%})")
\ No newline at end of file
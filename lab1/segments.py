@@ -0,0 +1,290 @@
+import json
+import os
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.preprocessing import normalize
+from tokenizer import spacy_tokenizer
+from positional import POSITION_ARRAYS, build_positions, display_text
+
+DATA_DIR = 'data'
+SEGMENTS_DIR = os.path.join(DATA_DIR, 'segments')
+MANIFEST_FILE = os.path.join(SEGMENTS_DIR, 'manifest.json')
+# Когда сегментов становится больше, несколько соседних сливаются в один
+MAX_SEGMENTS = 8
+
+
+def make_vectorizer():
+    return TfidfVectorizer(tokenizer=spacy_tokenizer)
+
+
+def pretokenized(tokens):
+    return tokens
+
+
+def empty_manifest():
+    return {'generation': 0, 'segments': [], 'next_doc_id': 0, 'next_segment': 0, 'deleted': [], 'retired': []}
+
+
+def read_manifest():
+    if not os.path.exists(MANIFEST_FILE):
+        return empty_manifest()
+    with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_manifest(manifest):
+    # Читатели видят либо старый, либо новый манифест целиком
+    manifest['generation'] += 1
+    tmp_file = MANIFEST_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_file, MANIFEST_FILE)
+
+
+def segment_path(name):
+    return os.path.join(SEGMENTS_DIR, f"{name}.pkl")
+
+
+def retire_segments(manifest, names):
+    """
+    Запоминает в манифесте сегменты, которые из него убраны. Их файлы удаляются только при следующем
+    слиянии или сбросе: процесс, успевший прочитать прежний манифест, еще читает эти сегменты.
+    Возвращает сегменты, выведенные в прошлый раз, — их файлы теперь можно удалить.
+    """
+    expired = manifest.get('retired', [])
+    manifest['retired'] = list(names)
+    return expired
+
+
+def remove_segment_files(names):
+    for name in names:
+        if os.path.exists(segment_path(name)):
+            os.remove(segment_path(name))
+
+
+def read_segment(name):
+    return joblib.load(segment_path(name))
+
+
+def build_segment(doc_ids, docs, texts, tokenized_documents):
+    """
+    Неизменяемый сегмент: сырые частоты терминов (документы x локальный словарь), описания документов,
+    их тексты и позиции токенов (tokenized_documents — кортежи tokenizer.token_positions).
+    IDF в сегменте не хранится — он считается при загрузке по статистике всех сегментов.
+    """
+    counter = CountVectorizer(analyzer=pretokenized, dtype=np.int32)
+    counts = counter.fit_transform([[token for token, _, _, _ in tokens] for tokens in tokenized_documents])
+    segment = {
+        'doc_ids': np.asarray(doc_ids, dtype=np.int64),
+        'docs': docs,
+        'terms': counter.get_feature_names_out().tolist(),
+        'counts': counts.tocsr(),
+        'texts': [display_text(text) for text in texts],
+    }
+    segment.update(build_positions(tokenized_documents, counter.vocabulary_))
+    return segment
+
+
+def _new_segment_name(manifest):
+    name = f"seg_{manifest['next_segment']:06d}"
+    manifest['next_segment'] += 1
+    return name
+
+
+def add_documents(docs, texts, tokenized_documents, replaced_doc_ids=()):
+    """
+    Записывает новые документы отдельным сегментом. replaced_doc_ids — документы,
+    которые помечаются удаленными (старые версии измененных страниц).
+    Возвращает присвоенные doc_id.
+    """
+    os.makedirs(SEGMENTS_DIR, exist_ok=True)
+    manifest = read_manifest()
+    start = manifest['next_doc_id']
+    doc_ids = list(range(start, start + len(docs)))
+    if docs:
+        name = _new_segment_name(manifest)
+        joblib.dump(build_segment(doc_ids, docs, texts, tokenized_documents), segment_path(name))
+        manifest['segments'].append(name)
+        manifest['next_doc_id'] = start + len(docs)
+    manifest['deleted'] = sorted(set(manifest['deleted']) | set(replaced_doc_ids))
+    write_manifest(manifest)
+    return doc_ids
+
+
+def delete_documents(doc_ids):
+    manifest = read_manifest()
+    manifest['deleted'] = sorted(set(manifest['deleted']) | set(doc_ids))
+    write_manifest(manifest)
+
+
+def reset_segments():
+    manifest = read_manifest()
+    fresh = empty_manifest()
+    fresh['generation'] = manifest['generation']
+    fresh['next_segment'] = manifest['next_segment']
+    fresh['retired'] = manifest.get('retired', [])
+    expired = retire_segments(fresh, manifest['segments'])
+    os.makedirs(SEGMENTS_DIR, exist_ok=True)
+    write_manifest(fresh)
+    remove_segment_files(expired)
+
+
+def _remap_columns(counts, terms, global_terms):
+    column_map = np.searchsorted(global_terms, terms) if len(terms) else np.zeros(0, dtype=np.int64)
+    remapped = counts.tocsr(copy=True)
+    remapped.indices = column_map[remapped.indices].astype(remapped.indices.dtype, copy=False)
+    return sparse.csr_matrix((remapped.data, remapped.indices, remapped.indptr),
+                             shape=(counts.shape[0], len(global_terms)))
+
+
+def _combine(segments, deleted):
+    """Склеивает живые документы сегментов в одну матрицу частот над общим отсортированным словарем."""
+    global_terms = np.array(sorted(set().union(*(segment['terms'] for segment in segments))), dtype=object)
+    doc_ids, docs, blocks = [], [], []
+    for segment in segments:
+        live = ~np.isin(segment['doc_ids'], list(deleted))
+        if not live.any():
+            continue
+        counts = _remap_columns(segment['counts'], np.array(segment['terms'], dtype=object), global_terms)
+        blocks.append(counts[live])
+        doc_ids.extend(segment['doc_ids'][live].tolist())
+        docs.extend(doc for doc, keep in zip(segment['docs'], live) if keep)
+
+    if not blocks:
+        return np.array([], dtype=object), [], [], sparse.csr_matrix((0, 0), dtype=np.int32)
+    counts = sparse.vstack(blocks, format='csr')
+
+    # Термины, встречавшиеся только в удаленных документах, выпадают из словаря, как при полной перестройке
+    used = np.flatnonzero(np.bincount(counts.indices, minlength=len(global_terms)))
+    if len(used) < len(global_terms):
+        counts = counts[:, used]
+        global_terms = global_terms[used]
+    counts.sort_indices()
+    return global_terms, doc_ids, docs, counts
+
+
+def _combine_positions(segments, deleted, global_terms):
+    """Склеивает позиции токенов живых документов, переводя номера терминов в общий словарь global_terms."""
+    parts = {name: [] for name in POSITION_ARRAYS}
+    lengths, texts = [], []
+    for segment in segments:
+        live = ~np.isin(segment['doc_ids'], list(deleted))
+        if not live.any():
+            continue
+        if 'token_indptr' not in segment:
+            # Сегмент записан до появления позиционных данных: для его документов нет фраз и сниппетов
+            lengths.extend([0] * int(live.sum()))
+            texts.extend([''] * int(live.sum()))
+            continue
+        column_map = np.searchsorted(global_terms, np.array(segment['terms'], dtype=object)) \
+            if segment['terms'] else np.zeros(0, dtype=np.int64)
+        doc_lengths = np.diff(segment['token_indptr'])
+        live_tokens = np.repeat(live, doc_lengths)
+        lengths.extend(doc_lengths[live].tolist())
+        parts['token_terms'].append(column_map[segment['token_terms'][live_tokens]])
+        for name in POSITION_ARRAYS[1:]:
+            parts[name].append(segment[name][live_tokens])
+        texts.extend(text for text, keep in zip(segment['texts'], live) if keep)
+
+    positions = {name: np.concatenate(arrays).astype(np.int32) if arrays else np.zeros(0, dtype=np.int32)
+                 for name, arrays in parts.items()}
+    positions['token_indptr'] = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]).astype(np.int64)
+    positions['texts'] = texts
+    return positions
+
+
+def merge_segments(force=False, max_segments=MAX_SEGMENTS):
+    """
+    Сливает подряд идущие сегменты наименьшего суммарного размера (или все при force=True) в один,
+    физически удаляя помеченные документы. Поисковые процессы продолжают читать прежний манифест до его замены:
+    файлы слитых сегментов удаляются только при следующем слиянии (см. retire_segments).
+    """
+    manifest = read_manifest()
+    names = manifest['segments']
+    if not names or (not force and len(names) <= max_segments):
+        return False
+    if len(names) == 1 and not manifest['deleted']:
+        return False
+
+    if force:
+        to_merge = list(names)
+    else:
+        # Сливаются соседние сегменты с наименьшим суммарным размером: документы остаются в том же порядке,
+        # что и при полной перестройке, и равные по оценке результаты ранжируются так же
+        sizes = np.array([len(read_segment(name)['doc_ids']) for name in names])
+        window = len(names) - max_segments + 1
+        totals = np.convolve(sizes, np.ones(window, dtype=sizes.dtype), mode='valid')
+        start = int(np.argmin(totals))
+        to_merge = names[start:start + window]
+
+    deleted = set(manifest['deleted'])
+    segments = [read_segment(name) for name in to_merge]
+    terms, doc_ids, docs, counts = _combine(segments, deleted)
+    positions = _combine_positions(segments, deleted, terms)
+    merged_ids = set(np.concatenate([segment['doc_ids'] for segment in segments]).tolist())
+
+    merged_name = _new_segment_name(manifest)
+    if doc_ids:
+        joblib.dump({'doc_ids': np.asarray(doc_ids, dtype=np.int64), 'docs': docs,
+                     'terms': terms.tolist(), 'counts': counts, **positions}, segment_path(merged_name))
+
+    # Новый сегмент занимает место слитых, поэтому порядок документов не меняется
+    position = names.index(to_merge[0])
+    manifest['segments'] = names[:position] + ([merged_name] if doc_ids else []) + names[position + len(to_merge):]
+    manifest['deleted'] = sorted(deleted - merged_ids)
+    expired = retire_segments(manifest, to_merge)
+    write_manifest(manifest)
+
+    remove_segment_files(expired)
+    print(f"Merged {len(to_merge)} segments into {merged_name if doc_ids else 'nothing'} "
+          f"({len(doc_ids)} live documents).")
+    return True
+
+
+def live_documents():
+    """Возвращает {filename: (doc_id, content_hash)} для неудаленных документов."""
+    manifest = read_manifest()
+    deleted = set(manifest['deleted'])
+    result = {}
+    for name in manifest['segments']:
+        segment = read_segment(name)
+        for doc_id, doc in zip(segment['doc_ids'].tolist(), segment['docs']):
+            if doc_id not in deleted:
+                result[doc['filename']] = (doc_id, doc.get('content_hash'))
+    return result
+
+
+def load_index():
+    """
+    Собирает индекс из сегментов: df и IDF считаются по всем живым документам,
+    поэтому матрица и векторизатор совпадают с полученными полной перестройкой
+    (TfidfVectorizer: smooth_idf, L2-нормировка строк).
+    Возвращает (tfidf_matrix, vectorizer, doc_map, positions, generation), positions — см. _combine_positions.
+    """
+    manifest = read_manifest()
+    if not manifest['segments']:
+        raise FileNotFoundError(MANIFEST_FILE)
+
+    segments = [read_segment(name) for name in manifest['segments']]
+    deleted = set(manifest['deleted'])
+    terms, _, docs, counts = _combine(segments, deleted)
+    if not docs:
+        raise FileNotFoundError(MANIFEST_FILE)
+    positions = _combine_positions(segments, deleted, terms)
+
+    n_docs = counts.shape[0]
+    df = np.bincount(counts.indices, minlength=len(terms))
+    idf = np.log((1 + n_docs) / (1 + df)) + 1
+
+    tfidf_matrix = counts.astype(np.float64)
+    tfidf_matrix.data *= idf[tfidf_matrix.indices]
+    tfidf_matrix = normalize(tfidf_matrix, norm='l2', copy=False)
+
+    vectorizer = make_vectorizer()
+    vectorizer.vocabulary_ = {term: i for i, term in enumerate(terms)}
+    vectorizer.idf_ = idf
+
+    doc_map = {i: {'filename': doc['filename'], 'url': doc['url']} for i, doc in enumerate(docs)}
+    return tfidf_matrix, vectorizer, doc_map, positions, manifest['generation']
\ No newline at end of file
@@ -0,0 +1,100 @@
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from mapped_index import open_index, write_index, shard_bounds
+from shards import IndexShard, ShardedSearcher
+
+SHARD_COUNTS = [1, 2, 4, 8]
+QUERIES = 200
+TERMS_PER_QUERY = 2
+TOP_K = 10
+CLIENTS = 8
+
+
+def synthetic_index(n_docs, index_dir):
+    from topk_benchmark import random_index
+    matrix = random_index(n_docs, np.random.default_rng(0))
+    n_docs, n_terms = matrix.shape
+    df = np.bincount(matrix.indices, minlength=n_terms)
+    idf = np.log((1 + n_docs) / (1 + df)) + 1
+    terms = [f"term{i:07d}_NOUN" for i in range(n_terms)]
+    doc_map = {i: {'filename': f"doc_{i}.txt", 'url': f"https://example.org/{i}"} for i in range(n_docs)}
+    write_index(matrix, terms, idf, doc_map, index_dir=index_dir)
+    return open_index(index_dir)
+
+
+def random_queries(index, rng, n_queries=QUERIES):
+    """Запросы из терминов средней частоты с весами по IDF, как у нормированного вектора запроса."""
+    df = np.diff(index.postings.indptr)
+    frequent = np.argsort(df)[::-1][:500]
+    queries = []
+    for _ in range(n_queries):
+        terms = np.sort(rng.choice(frequent, size=TERMS_PER_QUERY, replace=False))
+        weights = index.idf[terms] / np.linalg.norm(index.idf[terms])
+        queries.append((terms.tolist(), weights.tolist()))
+    return queries
+
+
+def run_queries(searcher, mode, queries, top_k):
+    latencies = []
+    for terms, weights in queries:
+        started_at = time.perf_counter()
+        searcher.search(mode, terms, terms, weights, top_k)
+        latencies.append(time.perf_counter() - started_at)
+    return np.array(latencies)
+
+
+def throughput(searcher, mode, queries, top_k, clients=CLIENTS):
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(lambda query: searcher.search(mode, query[0], query[0], query[1], top_k), queries))
+    return len(queries) / (time.perf_counter() - started_at)
+
+
+def run_benchmark(index, shard_counts=SHARD_COUNTS, mode='and', top_k=TOP_K, n_queries=QUERIES):
+    queries = random_queries(index, np.random.default_rng(1), n_queries)
+    reference = IndexShard(index)
+    expected = [reference.search(mode, terms, terms, weights, top_k) for terms, weights in queries]
+    print(f"Документов: {index.matrix.shape[0]}, режим {mode}, top_k={top_k}, запросов: {len(queries)}")
+
+    for n_shards in shard_counts:
+        if n_shards == 1:
+            searcher = reference
+        else:
+            searcher = ShardedSearcher(index, shard_bounds(index.matrix.indptr, n_shards))
+        try:
+            # Прогрев: запуск процессов и первое обращение к страницам индекса
+            run_queries(searcher, mode, queries[:10], top_k)
+            mismatches = 0
+            for (terms, weights), (doc_ids, scores) in zip(queries, expected):
+                found_ids, found_scores = searcher.search(mode, terms, terms, weights, top_k)
+                if not (np.array_equal(found_ids, doc_ids) and np.array_equal(found_scores, scores)):
+                    mismatches += 1
+            latencies = run_queries(searcher, mode, queries, top_k) * 1000
+            qps = throughput(searcher, mode, queries, top_k)
+            print(f"  шардов: {n_shards}  p50 {np.percentile(latencies, 50):7.2f} мс  "
+                  f"p95 {np.percentile(latencies, 95):7.2f} мс  QPS ({CLIENTS} клиентов) {qps:8.1f}  "
+                  f"расхождений с поиском без шардов: {mismatches}")
+        finally:
+            if searcher is not reference:
+                searcher.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Задержка и QPS поиска при разном числе шардов")
+    parser.add_argument('--shards', type=int, nargs='+', default=SHARD_COUNTS)
+    parser.add_argument('--mode', choices=['and', 'or'], default='and')
+    parser.add_argument('--top-k', type=int, default=TOP_K)
+    parser.add_argument('--queries', type=int, default=QUERIES)
+    parser.add_argument('--synthetic-docs', type=int,
+                        help="построить синтетический индекс такого размера вместо data/index")
+    args = parser.parse_args()
+
+    if args.synthetic_docs:
+        with tempfile.TemporaryDirectory() as index_dir:
+            run_benchmark(synthetic_index(args.synthetic_docs, index_dir), args.shards, args.mode, args.top_k,
+                          args.queries)
+    else:
+        run_benchmark(open_index(), args.shards, args.mode, args.top_k, args.queries)
\ No newline at end of file
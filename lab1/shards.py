@@ -0,0 +1,151 @@
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy import sparse
+from postings import PostingsIndex
+from ranking import select_top_k, maxscore_top_k, merge_top_k
+from mapped_index import MappedIndex
+from metrics import record_stage
+
+
+class ShardPostings(PostingsIndex):
+    """
+    Postings глобального индекса, ограниченные диапазоном документов шарда [lo, hi),
+    с локальными номерами документов. Границы диапазона в каждом списке ищутся бинарным поиском,
+    так что шарду не нужна своя копия postings. Верхние границы max_weights — глобальные.
+    """
+
+    def __init__(self, postings, lo, hi):
+        super().__init__(postings.indptr, postings.doc_ids, postings.weights, hi - lo,
+                         max_weights=postings.max_weights)
+        self.lo = lo
+        self.hi = hi
+
+    def window(self, term_index):
+        start, end = int(self.indptr[term_index]), int(self.indptr[term_index + 1])
+        docs = self.doc_ids[start:end]
+        return start + int(np.searchsorted(docs, self.lo)), start + int(np.searchsorted(docs, self.hi))
+
+    def postings(self, term_index):
+        start, end = self.window(term_index)
+        return self.doc_ids[start:end] - self.lo
+
+    def term_weights(self, term_index):
+        start, end = self.window(term_index)
+        return self.weights[start:end]
+
+    def df(self, term_index):
+        start, end = self.window(term_index)
+        return end - start
+
+
+class IndexShard:
+    """Поиск по диапазону документов [lo, hi) отображенного индекса; возвращает глобальные номера документов."""
+
+    def __init__(self, index, lo=0, hi=None):
+        hi = index.matrix.shape[0] if hi is None else hi
+        self.matrix = index.matrix
+        self.n_terms = index.matrix.shape[1]
+        self.lo = lo
+        self.hi = hi
+        if (lo, hi) == (0, index.matrix.shape[0]):
+            self.postings = index.postings
+        else:
+            self.postings = ShardPostings(index.postings, lo, hi)
+
+    def warm_up(self):
+        """Читает границы списков postings и строк матрицы и верхние оценки, чтобы первые запросы не ждали их с диска."""
+        return float(self.postings.indptr.sum() + self.matrix.indptr.sum() + self.postings.max_weights.sum())
+
+    def search(self, mode, term_indices, query_indices, query_weights, top_k=None, timings=None):
+        """
+        mode='and' — документы со всеми term_indices, mode='or' — с любым термином запроса (MaxScore).
+        query_indices/query_weights — ненулевые элементы L2-нормированного вектора запроса.
+        timings — словарь для времени этапов в мс: пересечение postings (matching) и оценка документов (scoring).
+        В режиме 'or' отбор кандидатов и оценка неразделимы и считаются как scoring.
+        """
+        started_at = time.perf_counter()
+        if mode == 'or':
+            doc_ids, scores, _ = maxscore_top_k(self.postings, list(query_indices), list(query_weights), top_k)
+            record_stage(timings, 'scoring', started_at)
+            return doc_ids + self.lo, scores
+
+        candidates = self.postings.intersect(term_indices)
+        started_at = record_stage(timings, 'matching', started_at)
+        if not len(candidates):
+            return candidates, np.zeros(0, dtype=np.float64)
+        query_vec = sparse.csr_matrix((np.asarray(query_weights, dtype=np.float64),
+                                       np.asarray(query_indices, dtype=np.int32), [0, len(query_indices)]),
+                                      shape=(1, self.n_terms))
+        # Строки индекса и вектор запроса L2-нормированы, поэтому косинусная мера — скалярное произведение
+        scores = (self.matrix[candidates + self.lo, :] @ query_vec.T).toarray().ravel()
+        top = select_top_k(scores, top_k)
+        record_stage(timings, 'scoring', started_at)
+        return candidates[top] + self.lo, scores[top]
+
+
+# Шард, которым владеет процесс-обработчик пула
+worker_shard = None
+
+
+def init_worker(path, lo, hi):
+    global worker_shard
+    worker_shard = IndexShard(MappedIndex(path), lo, hi)
+
+
+def warm_up_worker_shard():
+    return worker_shard.warm_up()
+
+
+def search_worker_shard(mode, term_indices, query_indices, query_weights, top_k):
+    return worker_shard.search(mode, term_indices, query_indices, query_weights, top_k)
+
+
+class ShardedSearcher:
+    """
+    Scatter-gather: каждый шард обслуживает отдельный процесс, запрос рассылается всем,
+    а их top-k объединяются. IDF у шардов общий, поэтому оценки и порядок совпадают с поиском без шардов.
+    """
+
+    def __init__(self, index, bounds=None):
+        bounds = index.shard_bounds if bounds is None else bounds
+        self.bounds = list(zip(bounds[:-1], bounds[1:]))
+        self.executors = [ProcessPoolExecutor(max_workers=1, initializer=init_worker, initargs=(index.path, lo, hi))
+                          for lo, hi in self.bounds]
+        # Процессы шардов останавливаются, когда поисковик больше никому не нужен: после горячей замены индекса
+        # старый поисковик освобождается, как только завершатся запросы, которые еще его используют
+        self.finalizer = weakref.finalize(self, shutdown_executors, self.executors)
+
+    def warm_up(self):
+        """Запускает процессы шардов и открывает в них индекс до первого запроса."""
+        return sum(future.result() for future in [executor.submit(warm_up_worker_shard)
+                                                  for executor in self.executors])
+
+    def search(self, mode, term_indices, query_indices, query_weights, top_k=None, timings=None):
+        """Этапы внутри процессов шардов не разделяются: вся рассылка и слияние считаются как scoring."""
+        started_at = time.perf_counter()
+        query_indices, query_weights = list(query_indices), list(query_weights)
+        futures = [executor.submit(search_worker_shard, mode, term_indices, query_indices, query_weights, top_k)
+                   for executor in self.executors]
+        parts = [future.result() for future in futures]
+        doc_ids = np.concatenate([doc_ids for doc_ids, _ in parts])
+        scores = np.concatenate([scores for _, scores in parts])
+        result = merge_top_k(doc_ids, scores, top_k)
+        record_stage(timings, 'scoring', started_at)
+        return result
+
+    def close(self):
+        self.finalizer()
+
+
+def shutdown_executors(executors):
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def make_searcher(index, sharded=True):
+    """sharded=False — поиск по всем шардам в вызывающем процессе, без отдельных процессов шардов."""
+    if sharded and len(index.shard_bounds) > 2:
+        return ShardedSearcher(index)
+    return IndexShard(index)
\ No newline at end of file
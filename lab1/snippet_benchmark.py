@@ -0,0 +1,67 @@
+import argparse
+import time
+import numpy as np
+from mapped_index import open_index
+
+PAGE_SIZES = [10, 50]
+PAGES = 100
+TERMS_PER_QUERY = 2
+
+
+def random_pages(index, page_size, rng, n_pages=PAGES):
+    """Страницы выдачи: случайные документы и термины запроса, взятые из первого из них."""
+    positions = index.positions
+    n_docs = len(index.doc_map)
+    pages = []
+    while len(pages) < n_pages:
+        doc_ids = rng.choice(n_docs, size=min(page_size, n_docs), replace=False)
+        lo, hi = positions.token_range(int(doc_ids[0]))
+        doc_terms = np.unique(positions.terms[lo:hi])
+        if len(doc_terms):
+            pages.append((doc_ids.tolist(), rng.choice(doc_terms, size=min(TERMS_PER_QUERY, len(doc_terms)),
+                                                       replace=False)))
+    return pages
+
+
+def snippet_page_time(index, pages):
+    started_at = time.perf_counter()
+    for doc_ids, term_ids in pages:
+        for doc_id in doc_ids:
+            index.positions.snippet(doc_id, term_ids)
+    return (time.perf_counter() - started_at) / len(pages) * 1000
+
+
+def reparse_page_time(index, pages):
+    """Прежний способ: прочитать документ из хранилища и заново прогнать его через spaCy для каждого результата."""
+    from doc_store import DocumentStore, doc_id_from_filename
+    from tokenizer import query_positions
+    store = DocumentStore()
+    started_at = time.perf_counter()
+    for doc_ids, _ in pages:
+        for doc_id in doc_ids:
+            _, content = store.get(doc_id_from_filename(index.doc_map[doc_id]['filename']))
+            query_positions(content.lower())
+    elapsed = time.perf_counter() - started_at
+    store.close()
+    return elapsed / len(pages) * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Время построения сниппетов для страницы выдачи")
+    parser.add_argument('--page-sizes', type=int, nargs='+', default=PAGE_SIZES)
+    parser.add_argument('--pages', type=int, default=PAGES)
+    parser.add_argument('--compare-reparse', action='store_true',
+                        help="также замерить чтение документов и повторную токенизацию spaCy")
+    args = parser.parse_args()
+
+    index = open_index()
+    if index.positions is None:
+        print("В индексе нет позиций токенов. Пересоберите индекс: python indexer.py")
+    else:
+        rng = np.random.default_rng(0)
+        for page_size in args.page_sizes:
+            pages = random_pages(index, page_size, rng, args.pages)
+            line = f"Результатов на странице: {page_size:<4} сниппеты из индекса: {snippet_page_time(index, pages):8.2f} мс"
+            if args.compare_reparse:
+                line += f" | чтение документов + spaCy: {reparse_page_time(index, pages[:10]):8.2f} мс"
+            print(line)
\ No newline at end of file
@@ -0,0 +1,66 @@
+import argparse
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+TOP_MODULES = 10
+READY_SCRIPT = """
+import time
+started_at = time.perf_counter()
+import search
+imported_at = time.perf_counter()
+if hasattr(search, 'warm_up'):
+    search.warm_up()
+else:
+    search.search_query('warm up')
+print(imported_at - started_at, time.perf_counter() - started_at)
+"""
+
+
+def run_python(source_dir, args):
+    env = dict(os.environ, SEARCH_WARM_UP='0')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [source_dir, env.get('PYTHONPATH')]))
+    return subprocess.run([sys.executable, *args], env=env, capture_output=True, text=True, check=True)
+
+
+def import_times(source_dir, module='app'):
+    """Разбирает вывод python -X importtime: {модуль: (собственное время, суммарное время)} в секундах."""
+    stderr = run_python(source_dir, ['-X', 'importtime', '-c', f"import {module}"]).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us) / 1e6, int(cumulative_us) / 1e6)
+    return times
+
+
+def time_to_ready(source_dir):
+    """Время импорта search и время до готовности: загружены модель spaCy и индекс."""
+    imported, ready = run_python(source_dir, ['-c', READY_SCRIPT]).stdout.split()[-2:]
+    return float(imported), float(ready)
+
+
+def report(label, source_dir):
+    times = import_times(source_dir)
+    imported, ready = time_to_ready(source_dir)
+    print(f"\n{label} ({source_dir})")
+    print(f"  import app: {times['app'][1]:.3f} с")
+    print(f"  import search: {imported:.3f} с, готовность к поиску: {ready:.3f} с")
+    heaviest = sorted(((cumulative, name) for name, (_, cumulative) in times.items() if '.' not in name),
+                      reverse=True)[:TOP_MODULES]
+    for cumulative, name in heaviest:
+        print(f"    {name:<30} {cumulative:.3f} с")
+    return times['app'][1]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Время запуска приложения по python -X importtime")
+    parser.add_argument('--compare', help="каталог с другой версией lab1 (например, git worktree до изменений)")
+    args = parser.parse_args()
+
+    after = report("Текущая версия", APP_DIR)
+    if args.compare:
+        before = report("Версия для сравнения", os.path.abspath(args.compare))
+        print(f"\nimport app: {before:.3f} с -> {after:.3f} с")
\ No newline at end of file
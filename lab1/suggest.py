@@ -0,0 +1,80 @@
+from itertools import groupby
+import numpy as np
+
+SUGGEST_LIMIT = 10
+# Префиксы, под которые попадает больше SCAN_LIMIT лемм, получают заранее посчитанные лучшие подсказки;
+# для остальных подсказки выбираются из не более чем SCAN_LIMIT лемм при запросе
+SCAN_LIMIT = 1000
+
+
+def lemma_frequencies(terms, matrix):
+    """
+    Леммы словаря без POS-тега, отсортированные по байтам UTF-8, и для каждой — число документов,
+    где она встречается хотя бы с одним тегом (run_VERB и run_NOUN в одном документе считаются один раз).
+    """
+    if not len(terms):
+        return [], np.zeros(0, dtype=np.int64)
+    lemmas, term_lemmas = np.unique(np.array([term.rsplit('_', 1)[0] for term in terms], dtype=object),
+                                    return_inverse=True)
+    rows = np.repeat(np.arange(matrix.shape[0], dtype=np.int64), np.diff(matrix.indptr))
+    pairs = np.unique(rows * len(lemmas) + term_lemmas[matrix.indices])
+    return lemmas.tolist(), np.bincount(pairs % len(lemmas), minlength=len(lemmas)).astype(np.int64)
+
+
+def best_lemmas(df, lo, hi, limit):
+    """Номера лемм из [lo, hi) с наибольшим df; при равенстве — в алфавитном порядке."""
+    return lo + np.lexsort((np.arange(hi - lo), -df[lo:hi]))[:limit]
+
+
+def build_suggestions(lemmas, df, limit=SUGGEST_LIMIT, scan_limit=SCAN_LIMIT):
+    """
+    Заранее посчитанные подсказки для «широких» префиксов: (префиксы по возрастанию, матрица номеров лемм
+    размера префиксы x limit, -1 — пусто). Префиксы удлиняются, пока под них попадает больше scan_limit лемм.
+    """
+    top = {}
+    wide = [(0, len(lemmas))]
+    length = 0
+    while wide:
+        narrower = []
+        for lo, hi in wide:
+            start = lo
+            for prefix, group in groupby(lemmas[lo:hi], key=lambda lemma: lemma[:length]):
+                end = start + sum(1 for _ in group)
+                if end - start > scan_limit:
+                    top[prefix] = best_lemmas(df, start, end, limit)
+                    narrower.append((start, end))
+                start = end
+        wide = narrower
+        length += 1
+    prefixes = sorted(top, key=lambda prefix: prefix.encode('utf-8'))
+    matrix = np.full((len(prefixes), limit), -1, dtype=np.int32)
+    for row, prefix in enumerate(prefixes):
+        matrix[row, :len(top[prefix])] = top[prefix]
+    return prefixes, matrix
+
+
+class Suggester:
+    """
+    Автодополнение по леммам индекса без spaCy: диапазон лемм с префиксом находится бинарным поиском
+    в отсортированной StringTable, широкие префиксы берут готовый список.
+    """
+
+    def __init__(self, lemmas, df, prefixes, top):
+        self.lemmas = lemmas
+        self.df = df
+        self.prefixes = prefixes
+        self.top = top
+
+    def suggest(self, prefix, limit=SUGGEST_LIMIT):
+        """[(лемма, число документов)] по убыванию числа документов."""
+        key = prefix.strip().lower().encode('utf-8')
+        row = self.prefixes.lower_bound(key)
+        if row < len(self.prefixes) and self.prefixes.raw(row) == key and limit <= self.top.shape[1]:
+            ids = self.top[row]
+            ids = ids[ids >= 0][:limit]
+        else:
+            lo = self.lemmas.lower_bound(key)
+            # Байт 0xff не встречается в UTF-8, поэтому все строки с префиксом key меньше key + b'\xff'
+            hi = self.lemmas.lower_bound(key + b'\xff', lo)
+            ids = best_lemmas(self.df, lo, hi, limit)
+        return [(self.lemmas[i], int(self.df[i])) for i in ids.tolist()]
\ No newline at end of file
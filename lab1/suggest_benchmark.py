@@ -0,0 +1,96 @@
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from mapped_index import StringTable, open_index
+from suggest import Suggester, build_suggestions, SUGGEST_LIMIT
+
+VOCABULARY_SIZES = [10_000, 100_000, 1_000_000]
+LOOKUPS = 2000
+ALPHABET = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+
+
+def random_lemmas(n_lemmas, rng):
+    """Уникальные «слова» длиной 3–12 с неравномерным распределением букв и зипфовские частоты документов."""
+    letter_weights = 1.0 / np.arange(1, len(ALPHABET) + 1) ** 0.7
+    letter_weights /= letter_weights.sum()
+    lemmas = set()
+    while len(lemmas) < n_lemmas:
+        lengths = rng.integers(3, 13, size=n_lemmas)
+        letters = rng.choice(ALPHABET, size=(n_lemmas, 12), p=letter_weights)
+        lemmas.update(''.join(row[:length]) for row, length in zip(letters.tolist(), lengths.tolist()))
+    lemmas = sorted(lemmas)[:n_lemmas]
+    df = (rng.zipf(1.3, size=len(lemmas)) % 100_000).astype(np.int64)
+    return lemmas, df
+
+
+def open_suggester(lemmas, df, directory):
+    started_at = time.perf_counter()
+    prefixes, top = build_suggestions(lemmas, df)
+    build_time = time.perf_counter() - started_at
+    StringTable.write(lemmas, os.path.join(directory, 'lemmas.bin'), os.path.join(directory, 'lemmas_offsets.npy'))
+    StringTable.write(prefixes, os.path.join(directory, 'prefixes.bin'),
+                      os.path.join(directory, 'prefixes_offsets.npy'))
+    suggester = Suggester(StringTable(os.path.join(directory, 'lemmas.bin'),
+                                      os.path.join(directory, 'lemmas_offsets.npy')),
+                          df, StringTable(os.path.join(directory, 'prefixes.bin'),
+                                          os.path.join(directory, 'prefixes_offsets.npy')), top)
+    return suggester, build_time, len(prefixes)
+
+
+def random_prefixes(lemmas, rng, n_lookups=LOOKUPS):
+    """Префиксы длиной 1–5 от случайных лемм: короткие — самые «широкие» и дорогие."""
+    picked = rng.integers(len(lemmas), size=n_lookups)
+    lengths = rng.integers(1, 6, size=n_lookups)
+    return [lemmas[i][:length] for i, length in zip(picked.tolist(), lengths.tolist())]
+
+
+def brute_force(lemmas, df, prefix, limit=SUGGEST_LIMIT):
+    matches = [i for i, lemma in enumerate(lemmas) if lemma.startswith(prefix)]
+    matches.sort(key=lambda i: (-df[i], i))
+    return [(lemmas[i], int(df[i])) for i in matches[:limit]]
+
+
+def measure(suggester, prefixes):
+    latencies = []
+    for prefix in prefixes:
+        started_at = time.perf_counter()
+        suggester.suggest(prefix)
+        latencies.append((time.perf_counter() - started_at) * 1000)
+    return np.array(latencies)
+
+
+def run_benchmark(vocabulary_sizes=VOCABULARY_SIZES, check=20, seed=0):
+    rng = np.random.default_rng(seed)
+    for n_lemmas in vocabulary_sizes:
+        lemmas, df = random_lemmas(n_lemmas, rng)
+        with tempfile.TemporaryDirectory() as directory:
+            suggester, build_time, n_prefixes = open_suggester(lemmas, df, directory)
+            prefixes = random_prefixes(lemmas, rng)
+            mismatches = sum(suggester.suggest(prefix) != brute_force(lemmas, df, prefix)
+                             for prefix in prefixes[:check])
+            latencies = measure(suggester, prefixes)
+            print(f"Лемм: {n_lemmas:>9}  построение: {build_time:6.2f} с, готовых префиксов: {n_prefixes:>6}  "
+                  f"p50 {np.percentile(latencies, 50):.3f} мс  p99 {np.percentile(latencies, 99):.3f} мс  "
+                  f"max {latencies.max():.3f} мс  расхождений с перебором: {mismatches}/{check}")
+            del suggester
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Время подсказок по префиксу при разном размере словаря")
+    parser.add_argument('--sizes', type=int, nargs='+', default=VOCABULARY_SIZES)
+    parser.add_argument('--index', action='store_true', help="замерить подсказки текущего индекса data/index")
+    args = parser.parse_args()
+
+    if args.index:
+        suggester = open_index().suggester
+        if suggester is None:
+            print("В индексе нет данных для подсказок. Пересоберите его: python indexer.py --convert")
+        else:
+            lemmas = [suggester.lemmas[i] for i in range(len(suggester.lemmas))]
+            latencies = measure(suggester, random_prefixes(lemmas, np.random.default_rng(0)))
+            print(f"Лемм: {len(lemmas)}  p50 {np.percentile(latencies, 50):.3f} мс  "
+                  f"p99 {np.percentile(latencies, 99):.3f} мс")
+    else:
+        run_benchmark(args.sizes)
\ No newline at end of file
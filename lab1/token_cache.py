@@ -0,0 +1,104 @@
+import hashlib
+import os
+import sqlite3
+import time
+import zlib
+
+DATA_DIR = 'data'
+TOKEN_CACHE_FILE = os.path.join(DATA_DIR, 'token_cache.db')
+DEFAULT_MAX_SIZE_MB = 512
+
+
+class TokenCache:
+    """
+    Кэш токенов на диске: хэш (версия токенизатора + текст документа) -> список lemma_POS.
+    При смене модели spaCy или настроек токенизатора меняется версия, и старые записи
+    просто перестают находиться, а затем вытесняются по LRU при превышении лимита размера.
+    """
+
+    def __init__(self, version, db_file=TOKEN_CACHE_FILE, max_size_mb=DEFAULT_MAX_SIZE_MB):
+        os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+        self.version = version
+        self.max_size = max_size_mb * 1024 * 1024
+        self.conn = sqlite3.connect(db_file)
+        self.cursor = self.conn.cursor()
+        self.create_table()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def create_table(self):
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tokens (
+            key TEXT PRIMARY KEY,
+            tokens BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL
+        ) WITHOUT ROWID
+        """)
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS tokens_last_used ON tokens (last_used)")
+        self.conn.commit()
+
+    def key(self, text):
+        digest = hashlib.sha1(self.version.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get_many(self, keys):
+        """Возвращает {key: tokens} для найденных ключей и обновляет время их использования."""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        # Ограничение SQLite на число параметров в запросе
+        for start in range(0, len(unique_keys), 500):
+            chunk = unique_keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            self.cursor.execute(f"SELECT key, tokens FROM tokens WHERE key IN ({placeholders})", chunk)
+            for key, blob in self.cursor.fetchall():
+                data = zlib.decompress(blob).decode('utf-8')
+                found[key] = data.split('\n') if data else []
+
+        now = time.time()
+        self.cursor.executemany("UPDATE tokens SET last_used=? WHERE key=?", ((now, key) for key in found))
+        self.conn.commit()
+
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items):
+        now = time.time()
+        rows = []
+        for key, tokens in items:
+            blob = zlib.compress('\n'.join(tokens).encode('utf-8'))
+            rows.append((key, blob, len(blob), now))
+        self.cursor.executemany("""
+        INSERT INTO tokens (key, tokens, size, last_used) VALUES (?, ?, ?, ?)
+        ON CONFLICT(key) DO UPDATE SET tokens=excluded.tokens, size=excluded.size, last_used=excluded.last_used
+        """, rows)
+        self.conn.commit()
+
+    def evict(self):
+        """Удаляет давно не использованные записи, пока кэш не уложится в лимит размера."""
+        total = self.cursor.execute("SELECT COALESCE(SUM(size), 0) FROM tokens").fetchone()[0]
+        if total <= self.max_size:
+            return
+        to_delete = []
+        for key, size in self.cursor.execute("SELECT key, size FROM tokens ORDER BY last_used"):
+            if total <= self.max_size:
+                break
+            to_delete.append((key,))
+            total -= size
+        self.cursor.executemany("DELETE FROM tokens WHERE key=?", to_delete)
+        self.conn.commit()
+        self.evicted += len(to_delete)
+
+    def report(self):
+        lookups = self.hits + self.misses
+        hit_ratio = self.hits / lookups if lookups else 0.0
+        entries, size = self.cursor.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tokens").fetchone()
+        print(f"Token cache: {self.hits} hits, {self.misses} misses ({hit_ratio:.1%} hit ratio), "
+              f"{self.evicted} evicted, {entries} entries, {size / 1024 / 1024:.1f} MB.")
+
+    def close(self):
+        self.conn.close()
\ No newline at end of file
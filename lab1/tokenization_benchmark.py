@@ -0,0 +1,49 @@
+import argparse
+import time
+import spacy
+from sklearn.feature_extraction.text import TfidfVectorizer
+from tokenizer import MODEL_NAME, BATCH_SIZE, meaningful_tokens, spacy_tokenizer
+from indexer import load_documents, tokenize_corpus
+
+PROCESS_COUNTS = [1, 2, 4, 8]
+
+
+def check_vocabulary(documents, tokenized_documents):
+    """Сравнивает пакетную токенизацию с прежней: полный конвейер spaCy на каждый документ."""
+    full_nlp = spacy.load(MODEL_NAME)
+    preprocess = TfidfVectorizer(tokenizer=spacy_tokenizer).build_preprocessor()
+    reference = [meaningful_tokens(full_nlp(preprocess(doc))) for doc in documents]
+
+    differing_docs = sum(1 for expected, actual in zip(reference, tokenized_documents) if expected != actual)
+    reference_vocabulary = {token for tokens in reference for token in tokens}
+    vocabulary = {token for tokens in tokenized_documents for token in tokens}
+    print(f"Документов с отличающимися токенами: {differing_docs}")
+    print(f"Словарь: {len(vocabulary)} терминов, совпадает с эталоном: {vocabulary == reference_vocabulary}")
+    return vocabulary == reference_vocabulary
+
+
+def run_benchmark(documents, batch_size=BATCH_SIZE, process_counts=PROCESS_COUNTS):
+    vectorizer = TfidfVectorizer(tokenizer=spacy_tokenizer)
+    results = {}
+    tokenized_documents = None
+    for n_process in process_counts:
+        started_at = time.perf_counter()
+        tokenized_documents = tokenize_corpus(vectorizer, documents, batch_size=batch_size, n_process=n_process)
+        elapsed = time.perf_counter() - started_at
+        results[n_process] = len(documents) / elapsed if elapsed > 0 else 0.0
+        print(f"n_process={n_process:<2} {results[n_process]:8.1f} док/с")
+    return results, tokenized_documents
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Скорость пакетной токенизации корпуса")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--processes', type=int, nargs='+', default=PROCESS_COUNTS)
+    parser.add_argument('--no-check', action='store_true', help="не сравнивать словарь с полным конвейером")
+    args = parser.parse_args()
+
+    documents, _ = load_documents()
+    print(f"Документов: {len(documents)}, размер пакета: {args.batch_size}")
+    _, tokenized_documents = run_benchmark(documents, args.batch_size, args.processes)
+    if not args.no_check:
+        check_vocabulary(documents, tokenized_documents)
\ No newline at end of file
@@ -1,20 +1,73 @@
-import spacy
-
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("Downloading 'en_core_web_sm' model...")
-    spacy.cli.download("en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
-
-
-def spacy_tokenizer(document):
-
-    tokens = nlp(document)
-
-    meaningful_pos_tags = ['NOUN', 'PROPN', 'VERB', 'ADJ']
-
-    return [
-        f"{token.lemma_.lower()}_{token.pos_}" for token in tokens
-        if not token.is_stop and not token.is_punct and not token.is_space and token.pos_ in meaningful_pos_tags
-    ]
\ No newline at end of file
+import threading
+
+MODEL_NAME = "en_core_web_sm"
+# Токенизатору нужны только леммы и POS-теги, синтаксический разбор и NER не используются
+UNUSED_PIPES = ['parser', 'ner']
+MEANINGFUL_POS_TAGS = ['NOUN', 'PROPN', 'VERB', 'ADJ']
+BATCH_SIZE = 64
+# Увеличивать при изменении правил отбора токенов или формата записей: от версии зависят ключи кэша токенов
+TOKENIZER_VERSION = 2
+
+# Модель загружается при первом обращении (или фоновым прогревом), а не при импорте модуля
+nlp = None
+nlp_lock = threading.Lock()
+
+
+def load_nlp():
+    global nlp
+    if nlp is not None:
+        return nlp
+    with nlp_lock:
+        if nlp is None:
+            import spacy
+            try:
+                model = spacy.load(MODEL_NAME, disable=UNUSED_PIPES)
+            except OSError:
+                print(f"Downloading '{MODEL_NAME}' model...")
+                spacy.cli.download(MODEL_NAME)
+                model = spacy.load(MODEL_NAME, disable=UNUSED_PIPES)
+            nlp = model
+    return nlp
+
+
+def is_loaded():
+    return nlp is not None
+
+
+def token_positions(doc):
+    """(lemma_POS, номер токена spaCy в тексте, начало и конец токена в символах) для значимых токенов."""
+    return [
+        (f"{token.lemma_.lower()}_{token.pos_}", token.i, token.idx, token.idx + len(token.text)) for token in doc
+        if not token.is_stop and not token.is_punct and not token.is_space and token.pos_ in MEANINGFUL_POS_TAGS
+    ]
+
+
+def meaningful_tokens(doc):
+    return [token for token, _, _, _ in token_positions(doc)]
+
+
+def spacy_tokenizer(document):
+
+    tokens = load_nlp()(document)
+
+    return meaningful_tokens(tokens)
+
+
+def tokenizer_version():
+    """Строка, меняющаяся вместе с моделью spaCy и настройками токенизатора."""
+    import spacy
+    return (f"{MODEL_NAME}:{load_nlp().meta.get('version')}|spacy:{spacy.__version__}|v{TOKENIZER_VERSION}"
+            f"|pos:{','.join(MEANINGFUL_POS_TAGS)}|disabled:{','.join(UNUSED_PIPES)}")
+
+
+def tokenize_documents(documents, batch_size=BATCH_SIZE, n_process=1, positions=False):
+    """
+    Токенизирует корпус пакетами через nlp.pipe; результат совпадает с spacy_tokenizer для каждого документа.
+    positions=True — вместо строк возвращаются кортежи token_positions.
+    """
+    extract = token_positions if positions else meaningful_tokens
+    return [extract(doc) for doc in load_nlp().pipe(documents, batch_size=batch_size, n_process=n_process)]
+
+
+def query_positions(query):
+    return token_positions(load_nlp()(query))
\ No newline at end of file
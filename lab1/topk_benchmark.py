@@ -0,0 +1,101 @@
+import argparse
+import time
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+from postings import PostingsIndex
+from ranking import select_top_k, maxscore_top_k
+
+INDEX_SIZES = [10_000, 100_000, 1_000_000]
+K_VALUES = [10, 100, 1000]
+VOCABULARY_SIZE = 5000
+TERMS_PER_DOC = 40
+QUERIES = 50
+TERMS_PER_QUERY = 3
+
+
+def random_index(n_docs, rng):
+    """Синтетический L2-нормированный индекс с зипфовским распределением терминов."""
+    ranks = np.arange(1, VOCABULARY_SIZE + 1)
+    probabilities = 1.0 / ranks
+    probabilities /= probabilities.sum()
+    rows = np.repeat(np.arange(n_docs), TERMS_PER_DOC)
+    cols = rng.choice(VOCABULARY_SIZE, size=len(rows), p=probabilities)
+    data = rng.random(len(rows))
+    matrix = sparse.csr_matrix((data, (rows, cols)), shape=(n_docs, VOCABULARY_SIZE))
+    matrix.sum_duplicates()
+    return normalize(matrix, norm='l2', copy=False)
+
+
+def random_queries(matrix, rng):
+    """Запросы из частого и более редких терминов, веса — нормированный IDF, как у TfidfVectorizer."""
+    n_docs = matrix.shape[0]
+    df = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = np.log((1 + n_docs) / (1 + df)) + 1
+    by_frequency = np.argsort(df)[::-1]
+    queries = []
+    for _ in range(QUERIES):
+        terms = [int(rng.choice(by_frequency[:20]))]
+        terms += rng.choice(by_frequency[20:2000], size=TERMS_PER_QUERY - 1, replace=False).tolist()
+        weights = idf[terms] / np.linalg.norm(idf[terms])
+        queries.append((terms, weights.tolist()))
+    return queries
+
+
+def exhaustive_scores(matrix, postings, term_indices, query_weights):
+    """Оценки всех документов, содержащих хотя бы один термин запроса."""
+    candidates = np.unique(np.concatenate([postings.postings(t) for t in term_indices]))
+    query_vec = np.zeros(matrix.shape[1])
+    query_vec[term_indices] = query_weights
+    return candidates, matrix[candidates] @ query_vec
+
+
+def timed(function, queries):
+    started_at = time.perf_counter()
+    for query in queries:
+        function(*query)
+    return (time.perf_counter() - started_at) / len(queries) * 1000
+
+
+def run_benchmark(index_sizes=INDEX_SIZES, k_values=K_VALUES, seed=0):
+    rng = np.random.default_rng(seed)
+    for n_docs in index_sizes:
+        matrix = random_index(n_docs, rng)
+        postings = PostingsIndex.from_matrix(matrix)
+        queries = random_queries(matrix, rng)
+        scored = [exhaustive_scores(matrix, postings, *query) for query in queries]
+        print(f"\nДокументов: {n_docs}, среднее число кандидатов: {np.mean([len(c) for c, _ in scored]):.0f}")
+
+        def full_sort(terms, weights):
+            candidates, scores = exhaustive_scores(matrix, postings, terms, weights)
+            return candidates[np.argsort(scores)[::-1]]
+
+        print(f"  оценка всех + полная сортировка  {timed(full_sort, queries):8.2f} мс")
+
+        for k in k_values:
+            def partial(terms, weights):
+                candidates, scores = exhaustive_scores(matrix, postings, terms, weights)
+                return candidates[select_top_k(scores, k)]
+
+            partial_ms = timed(partial, queries)
+            maxscore_ms = timed(lambda terms, weights: maxscore_top_k(postings, terms, weights, k), queries)
+
+            mismatches = 0
+            scored_share = []
+            for (terms, weights), (candidates, scores) in zip(queries, scored):
+                expected = np.sort(scores[select_top_k(scores, k)])
+                _, found_scores, stats = maxscore_top_k(postings, terms, weights, k)
+                if len(expected) != len(found_scores) or not np.allclose(np.sort(found_scores), expected):
+                    mismatches += 1
+                scored_share.append(stats['postings_scored'] / max(stats['postings_total'], 1))
+
+            print(f"  k={k:<5} оценка всех + argpartition {partial_ms:8.2f} мс | MaxScore {maxscore_ms:8.2f} мс, "
+                  f"оценено {np.mean(scored_share):.0%} postings, расхождений: {mismatches}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Задержка отбора top-k: сортировка, argpartition и MaxScore")
+    parser.add_argument('--sizes', type=int, nargs='+', default=INDEX_SIZES)
+    parser.add_argument('--k', type=int, nargs='+', default=K_VALUES)
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.k)
\ No newline at end of file
@@ -1,9 +1,9 @@
-# main.py
-import tkinter as tk
-from gui import TranslatorApp
-
-if __name__ == "__main__":
-    root = tk.Tk()
-    app = TranslatorApp(root)
-    root.protocol("WM_DELETE_WINDOW", app.on_closing)
+# main.py
+import tkinter as tk
+from gui import TranslatorApp
+
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = TranslatorApp(root)
+    root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
\ No newline at end of file
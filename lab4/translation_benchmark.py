@@ -0,0 +1,57 @@
+# translation_benchmark.py
+import argparse
+import time
+from translator_core import Translator, WORD_BATCH_SIZE
+
+TEXT_FILES = ["eng_text.txt", "eng_text_medicine.txt"]
+BATCH_SIZES = [1, 8, WORD_BATCH_SIZE, 64]
+
+
+def words_to_translate(translator, text):
+    """
+    Слова текста и пары (лемма, POS-тег), которые process_text переводит моделью (их нет в словаре).
+    """
+    words = [token for token in translator.nlp(text) if token.is_alpha]
+    lemma_counts, lemma_pos_map = translator._count_lemmas(words)
+    items = [(lemma, lemma_pos_map[lemma][0]) for lemma in lemma_counts
+             if not translator.db.get_translation(lemma)]
+    return words, items
+
+
+def run_benchmark(translator, text_files=TEXT_FILES, batch_sizes=BATCH_SIZES, repeats=1):
+    for text_file in text_files:
+        with open(text_file, "r", encoding="utf-8") as f:
+            text = f.read()
+        words, items = words_to_translate(translator, text)
+        print(f"{text_file}: слов {len(words)}, лемм для перевода моделью {len(items)}")
+
+        # Прежний способ: отдельный вызов модели на каждую лемму
+        started_at = time.perf_counter()
+        for _ in range(repeats):
+            one_by_one = {lemma: translator._smart_translate_word(lemma, pos_tag) for lemma, pos_tag in items}
+        elapsed = (time.perf_counter() - started_at) / repeats
+        print(f"  по одному слову:   {elapsed:7.2f} с, {len(words) / elapsed:8.1f} слов/с")
+
+        for batch_size in batch_sizes:
+            translator.batch_size = batch_size
+            started_at = time.perf_counter()
+            for _ in range(repeats):
+                batched, _ = translator._translate_words(items)
+            elapsed = (time.perf_counter() - started_at) / repeats
+            differences = sum(batched[lemma] != one_by_one[lemma] for lemma, _ in items)
+            print(f"  пакеты по {batch_size:<4}     {elapsed:7.2f} с, {len(words) / elapsed:8.1f} слов/с, "
+                  f"отличий от перевода по одному слову: {differences}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Скорость перевода отдельных слов: по одному и пакетами")
+    parser.add_argument("files", nargs="*", default=TEXT_FILES)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    translator = Translator()
+    try:
+        run_benchmark(translator, args.files, args.batch_sizes, args.repeats)
+    finally:
+        translator.close_db()
\ No newline at end of file
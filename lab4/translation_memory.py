@@ -0,0 +1,111 @@
+# translation_memory.py
+import sqlite3
+from collections import OrderedDict
+
+# Сколько переводов (слов и предложений вместе) держать в оперативной памяти
+MEMORY_CACHE_SIZE = 10000
+
+
+def normalize_sentence(sentence):
+    """Предложение без лишних пробелов и переносов строк: по нему ищется сохраненный перевод."""
+    return " ".join(sentence.split())
+
+
+class TranslationMemory:
+    """
+    Память переводов: машинные переводы слов (лемма, часть речи) и предложений сохраняются в SQLite
+    и не пересчитываются моделью в следующих текстах и сеансах. Записи привязаны к имени модели,
+    поэтому после смены модели старые переводы не используются. Перед базой стоит LRU-кэш в памяти.
+    Пользовательский словарь хранится отдельно (DictionaryDB) и проверяется раньше памяти переводов.
+    """
+
+    def __init__(self, model_name, db_file="translation_memory.db", cache_size=MEMORY_CACHE_SIZE):
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.conn = sqlite3.connect(db_file)
+        self.cursor = self.conn.cursor()
+        self.create_tables()
+        self.hits = {"words": 0, "sentences": 0}
+        self.lookups = {"words": 0, "sentences": 0}
+
+    def create_tables(self):
+        """Создает таблицы, если они не существуют."""
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS word_translations (
+            model TEXT NOT NULL,
+            lemma TEXT NOT NULL,
+            pos_tag TEXT NOT NULL,
+            translation TEXT NOT NULL,
+            PRIMARY KEY (model, lemma, pos_tag)
+        )
+        """)
+        self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sentence_translations (
+            model TEXT NOT NULL,
+            sentence TEXT NOT NULL,
+            translation TEXT NOT NULL,
+            PRIMARY KEY (model, sentence)
+        )
+        """)
+        self.conn.commit()
+
+    def _remember(self, key, translation):
+        self.cache[key] = translation
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _lookup(self, kind, key, query, params):
+        self.lookups[kind] += 1
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits[kind] += 1
+            return self.cache[key]
+        self.cursor.execute(query, (self.model_name,) + params)
+        result = self.cursor.fetchone()
+        if result is None:
+            return None
+        self.hits[kind] += 1
+        self._remember(key, result[0])
+        return result[0]
+
+    def get_word(self, lemma, pos_tag):
+        """Сохраненный перевод слова или None."""
+        return self._lookup("words", ("word", lemma, pos_tag),
+                            "SELECT translation FROM word_translations WHERE model=? AND lemma=? AND pos_tag=?",
+                            (lemma, pos_tag))
+
+    def get_sentence(self, sentence):
+        """Сохраненный перевод предложения или None."""
+        sentence = normalize_sentence(sentence)
+        return self._lookup("sentences", ("sentence", sentence),
+                            "SELECT translation FROM sentence_translations WHERE model=? AND sentence=?",
+                            (sentence,))
+
+    def add_words(self, translations):
+        """Сохраняет переводы {(лемма, часть речи): перевод}."""
+        for (lemma, pos_tag), translation in translations.items():
+            self._remember(("word", lemma, pos_tag), translation)
+        self.cursor.executemany("""
+        INSERT OR REPLACE INTO word_translations (model, lemma, pos_tag, translation) VALUES (?, ?, ?, ?)
+        """, [(self.model_name, lemma, pos_tag, translation)
+              for (lemma, pos_tag), translation in translations.items()])
+        self.conn.commit()
+
+    def add_sentences(self, translations):
+        """Сохраняет переводы {предложение: перевод}."""
+        normalized = {normalize_sentence(sentence): translation for sentence, translation in translations.items()}
+        for sentence, translation in normalized.items():
+            self._remember(("sentence", sentence), translation)
+        self.cursor.executemany("""
+        INSERT OR REPLACE INTO sentence_translations (model, sentence, translation) VALUES (?, ?, ?)
+        """, [(self.model_name, sentence, translation) for sentence, translation in normalized.items()])
+        self.conn.commit()
+
+    def stats(self):
+        """Число попаданий и обращений к памяти переводов с начала сеанса: {"words": (hits, lookups), ...}."""
+        return {kind: (self.hits[kind], self.lookups[kind]) for kind in self.lookups}
+
+    def close(self):
+        self.conn.close()
\ No newline at end of file
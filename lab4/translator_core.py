@@ -1,155 +1,281 @@
-# translator_core.py
-from transformers import pipeline
-import spacy
-from collections import Counter
-from database_manager import DictionaryDB
-import re
-
-
-class Translator:
-    def __init__(self):
-        print("Загрузка моделей... Это может занять некоторое время.")
-        # Загрузка модели перевода
-        self.translator_pipeline = pipeline("translation_en_to_de", model="Helsinki-NLP/opus-mt-en-de")
-        # Загрузка модели spaCy
-        self.nlp = spacy.load("en_core_web_sm")
-        # Подключение к БД
-        self.db = DictionaryDB()
-        print("Модели успешно загружены.")
-
-    def process_text(self, text: str):
-        """
-        Полный цикл обработки текста: анализ, перевод, сбор статистики.
-        """
-        # 1. Анализ текста с помощью spaCy
-        doc = self.nlp(text)
-
-        # 2. Подсчет слов (исключаем пунктуацию и пробелы)
-        words = [token for token in doc if token.is_alpha]
-        total_words_count = len(words)
-
-        # 3. Полный перевод текста (здесь модель работает отлично, так как есть контекст)
-        full_translation = self.translator_pipeline(text)[0]['translation_text']
-
-        # 4. Создание частотного списка слов
-        # Собираем пары (лемма, POS-тег), чтобы различать usage (use-noun vs use-verb)
-        lemma_counts = Counter()
-        lemma_pos_map = {}  # Словарь для хранения описания POS
-
-        for token in words:
-            if token.pos_ == "PROPN":
-                lemma = token.lemma_
-            else:
-                lemma = token.lemma_.lower()
-
-            if lemma not in lemma_counts:
-                lemma_pos_map[lemma] = (token.pos_, spacy.explain(token.pos_))
-            lemma_counts[lemma] += 1
-
-        # 5. Сбор грамматической информации и перевод отдельных слов
-        word_details = []
-        # Сортируем по частоте
-        sorted_lemmas = sorted(lemma_counts.keys(), key=lambda k: lemma_counts[k], reverse=True)
-
-        for lemma in sorted_lemmas:
-            pos_tag, pos_desc = lemma_pos_map.get(lemma, ("X", "Unknown"))
-
-            # АЛГОРИТМ ПОЛУЧЕНИЯ ПЕРЕВОДА:
-            # 1. Проверяем пользовательский словарь (БД)
-            custom_translation = self.db.get_translation(lemma)
-
-            if custom_translation:
-                final_translation = custom_translation
-            else:
-                # 2. Если нет в БД, используем "Умный перевод" с контекстом
-                final_translation = self._smart_translate_word(lemma, pos_tag)
-
-            word_details.append({
-                "word": lemma,
-                "frequency": lemma_counts[lemma],
-                "pos_tag": pos_tag,
-                "pos_desc": pos_desc,
-                "translation": final_translation
-            })
-
-        return {
-            "original_text": text,
-            "translated_text": full_translation,
-            "total_words": total_words_count,
-            "word_details": word_details,
-            "spacy_doc": doc
-        }
-
-    def _smart_translate_word(self, lemma, pos_tag):
-        """
-        Пытается улучшить перевод отдельного слова, добавляя искусственный контекст
-        в зависимости от части речи.
-        """
-        try:
-            # Игнорируем слишком короткие слова или мусор, если они не в словаре
-            if len(lemma) < 2 and lemma not in ['a', 'i']:
-                raw_trans = self.translator_pipeline(lemma)[0]['translation_text']
-                return raw_trans
-
-            translation = ""
-
-            if pos_tag == "NOUN":
-                # Добавляем артикль, чтобы модель поняла, что это существительное
-                # "art" -> "the art" -> "die Kunst"
-                input_str = f"the {lemma}"
-                raw = self.translator_pipeline(input_str)[0]['translation_text']
-
-                # Убираем немецкие артикли из начала строки
-                # (der, die, das, dem, den, des, ein, eine...)
-                # Регулярное выражение удаляет первое слово, если это артикль
-                translation = re.sub(r'^(die|der|das|dem|den|des|ein|eine|einen)\s+', '', raw, flags=re.IGNORECASE)
-
-                # Если перевод превратился в "Art.-Nr." из-за "the art", это сложнее,
-                # но "the art" гораздо реже переводится как "Art.-Nr." чем просто "art".
-
-            elif pos_tag == "VERB":
-                # Добавляем "to", чтобы получить инфинитив
-                # "star" -> "to star" -> "zu spielen" (или "zu starren")
-                input_str = f"to {lemma}"
-                raw = self.translator_pipeline(input_str)[0]['translation_text']
-                # Убираем "zu " из начала
-                translation = re.sub(r'^(um\s+)?(zu|zum)\s+', '', raw, flags=re.IGNORECASE)
-
-            elif pos_tag == "ADJ":
-                # Добавляем "very", чтобы усилить контекст прилагательного
-                # "red" -> "very red" -> "sehr rot"
-                input_str = f"very {lemma}"
-                raw = self.translator_pipeline(input_str)[0]['translation_text']
-                translation = re.sub(r'^sehr\s+', '', raw, flags=re.IGNORECASE)
-
-            else:
-                # Для остальных частей речи (или если не сработали условия) переводим как есть
-                translation = self.translator_pipeline(lemma)[0]['translation_text']
-
-            # --- Блок защиты от галлюцинаций ---
-            # Если перевод стал слишком длинным по сравнению с исходником (например, ought -> диалог),
-            # или содержит странные символы, возвращаем сырой перевод или оригинал.
-            if len(translation) > len(lemma) * 5:
-                # Скорее всего галлюцинация
-                return f"[{translation[:20]}...]"
-
-                # Очистка от лишних пробелов и точек
-            translation = translation.strip(" .")
-            return translation
-
-        except Exception:
-            # Если что-то пошло не так, возвращаем простой перевод
-            return self.translator_pipeline(lemma)[0]['translation_text']
-
-    def get_dependency_parse(self, sentence_text: str):
-        """Строит текстовое представление дерева синтаксического разбора."""
-        doc = self.nlp(sentence_text)
-        tree = []
-        for token in doc:
-            tree.append(
-                f"{token.text:<15} {token.pos_:<10} {token.dep_:<15} {token.head.text}"
-            )
-        return "\n".join(tree)
-
-    def close_db(self):
-        self.db.close()
\ No newline at end of file
+# translator_core.py
+from transformers import pipeline
+import spacy
+from collections import Counter
+from database_manager import DictionaryDB
+from translation_memory import TranslationMemory
+import re
+
+MODEL_NAME = "Helsinki-NLP/opus-mt-en-de"
+# Сколько слов с контекстом (или предложений) модель перевода обрабатывает за один вызов generate
+WORD_BATCH_SIZE = 32
+# Заглушка, которую _clean_word_translation возвращает вместо перевода-галлюцинации
+PLACEHOLDER_RE = re.compile(r"^\[.*\.\.\.\]$", re.DOTALL)
+
+
+class Translator:
+    def __init__(self, batch_size=WORD_BATCH_SIZE):
+        print("Загрузка моделей... Это может занять некоторое время.")
+        self.batch_size = batch_size
+        # Загрузка модели перевода
+        self.translator_pipeline = pipeline("translation_en_to_de", model=MODEL_NAME)
+        # Загрузка модели spaCy
+        self.nlp = spacy.load("en_core_web_sm")
+        # Подключение к БД
+        self.db = DictionaryDB()
+        # Память машинных переводов слов и предложений из прошлых текстов и сеансов
+        self.memory = TranslationMemory(MODEL_NAME)
+        print("Модели успешно загружены.")
+
+    def process_text(self, text: str):
+        """
+        Полный цикл обработки текста: анализ, перевод, сбор статистики.
+        """
+        memory_before = self.memory.stats()
+
+        # 1. Анализ текста с помощью spaCy
+        doc = self.nlp(text)
+
+        # 2. Подсчет слов (исключаем пунктуацию и пробелы)
+        words = [token for token in doc if token.is_alpha]
+        total_words_count = len(words)
+
+        # 3. Полный перевод текста по предложениям (здесь модель работает отлично, так как есть контекст)
+        full_translation = self._translate_text(doc)
+
+        # 4. Создание частотного списка слов
+        lemma_counts, lemma_pos_map = self._count_lemmas(words)
+
+        # 5. Сбор грамматической информации и перевод отдельных слов
+        # Сортируем по частоте
+        sorted_lemmas = sorted(lemma_counts.keys(), key=lambda k: lemma_counts[k], reverse=True)
+
+        # АЛГОРИТМ ПОЛУЧЕНИЯ ПЕРЕВОДА:
+        # 1. Проверяем пользовательский словарь (БД)
+        translations = {}
+        to_translate = []
+        for lemma in sorted_lemmas:
+            custom_translation = self.db.get_translation(lemma)
+            if custom_translation:
+                translations[lemma] = custom_translation
+            else:
+                to_translate.append((lemma, lemma_pos_map[lemma][0]))
+
+        # 2. Затем память переводов, остальные слова переводятся "умным переводом" с контекстом
+        translations.update(self._translate_lemmas(to_translate))
+
+        word_details = []
+        for lemma in sorted_lemmas:
+            pos_tag, pos_desc = lemma_pos_map.get(lemma, ("X", "Unknown"))
+            word_details.append({
+                "word": lemma,
+                "frequency": lemma_counts[lemma],
+                "pos_tag": pos_tag,
+                "pos_desc": pos_desc,
+                "translation": translations[lemma]
+            })
+
+        return {
+            "original_text": text,
+            "translated_text": full_translation,
+            "total_words": total_words_count,
+            "word_details": word_details,
+            "spacy_doc": doc,
+            # Попадания в память переводов для этого текста: {"words": (hits, lookups), "sentences": ...}
+            "memory_stats": {kind: (hits - memory_before[kind][0], lookups - memory_before[kind][1])
+                             for kind, (hits, lookups) in self.memory.stats().items()}
+        }
+
+    def _translate_text(self, doc):
+        """
+        Переводит текст по предложениям: переведенные раньше предложения берутся из памяти переводов,
+        остальные переводятся моделью пакетами. Пробелы и переносы строк между предложениями сохраняются.
+        """
+        parts = []
+        for sent in doc.sents:
+            text = sent.text_with_ws
+            sentence = text.strip()
+            lead = text[:len(text) - len(text.lstrip())]
+            tail = text[len(text.rstrip()):] if sentence else ""
+            parts.append((sentence, lead, tail))
+
+        translations = {}
+        missing = []
+        seen = set()
+        for sentence, _, _ in parts:
+            if not sentence or sentence in seen:
+                continue
+            seen.add(sentence)
+            cached = self.memory.get_sentence(sentence)
+            if cached is not None:
+                translations[sentence] = cached
+            else:
+                missing.append(sentence)
+
+        if missing:
+            outputs = self.translator_pipeline(missing, batch_size=self.batch_size)
+            new_translations = {sentence: output['translation_text'] for sentence, output in zip(missing, outputs)}
+            self.memory.add_sentences(new_translations)
+            translations.update(new_translations)
+
+        return "".join(lead + translations.get(sentence, "") + tail for sentence, lead, tail in parts).strip()
+
+    def _translate_lemmas(self, items):
+        """
+        Переводы пар (лемма, POS-тег): сначала из памяти переводов, остальные — моделью пакетами
+        с сохранением в память. Заглушки вместо галлюцинаций и переводы без контекста (запасной путь
+        при ошибке модели) не сохраняются: в следующем тексте такое слово переводится заново.
+        Возвращает словарь лемма -> перевод.
+        """
+        translations = {}
+        missing = []
+        for lemma, pos_tag in items:
+            cached = self.memory.get_word(lemma, pos_tag)
+            if cached is not None:
+                translations[lemma] = cached
+            else:
+                missing.append((lemma, pos_tag))
+
+        if missing:
+            new_translations, fallbacks = self._translate_words(missing)
+            self.memory.add_words({(lemma, pos_tag): new_translations[lemma] for lemma, pos_tag in missing
+                                   if lemma not in fallbacks and not PLACEHOLDER_RE.match(new_translations[lemma])})
+            translations.update(new_translations)
+        return translations
+
+    def _count_lemmas(self, words):
+        """
+        Частоты лемм и (POS-тег, описание) для первого вхождения каждой леммы.
+        """
+        # Собираем пары (лемма, POS-тег), чтобы различать usage (use-noun vs use-verb)
+        lemma_counts = Counter()
+        lemma_pos_map = {}  # Словарь для хранения описания POS
+
+        for token in words:
+            if token.pos_ == "PROPN":
+                lemma = token.lemma_
+            else:
+                lemma = token.lemma_.lower()
+
+            if lemma not in lemma_counts:
+                lemma_pos_map[lemma] = (token.pos_, spacy.explain(token.pos_))
+            lemma_counts[lemma] += 1
+
+        return lemma_counts, lemma_pos_map
+
+    def _word_input(self, lemma, pos_tag):
+        """
+        Строка для модели: слово с искусственным контекстом в зависимости от части речи.
+        """
+        # Слишком короткие слова или мусор переводим как есть
+        if len(lemma) < 2 and lemma not in ['a', 'i']:
+            return lemma
+        if pos_tag == "NOUN":
+            # Добавляем артикль, чтобы модель поняла, что это существительное
+            # "art" -> "the art" -> "die Kunst"
+            return f"the {lemma}"
+        if pos_tag == "VERB":
+            # Добавляем "to", чтобы получить инфинитив
+            # "star" -> "to star" -> "zu spielen" (или "zu starren")
+            return f"to {lemma}"
+        if pos_tag == "ADJ":
+            # Добавляем "very", чтобы усилить контекст прилагательного
+            # "red" -> "very red" -> "sehr rot"
+            return f"very {lemma}"
+        # Для остальных частей речи переводим как есть
+        return lemma
+
+    def _clean_word_translation(self, lemma, pos_tag, raw):
+        """
+        Убирает из перевода добавленный контекст (артикль, "zu", "sehr") и отсеивает галлюцинации.
+        """
+        if len(lemma) < 2 and lemma not in ['a', 'i']:
+            return raw
+
+        if pos_tag == "NOUN":
+            # Убираем немецкие артикли из начала строки
+            # (der, die, das, dem, den, des, ein, eine...)
+            # Регулярное выражение удаляет первое слово, если это артикль
+            translation = re.sub(r'^(die|der|das|dem|den|des|ein|eine|einen)\s+', '', raw, flags=re.IGNORECASE)
+
+            # Если перевод превратился в "Art.-Nr." из-за "the art", это сложнее,
+            # но "the art" гораздо реже переводится как "Art.-Nr." чем просто "art".
+
+        elif pos_tag == "VERB":
+            # Убираем "zu " из начала
+            translation = re.sub(r'^(um\s+)?(zu|zum)\s+', '', raw, flags=re.IGNORECASE)
+
+        elif pos_tag == "ADJ":
+            translation = re.sub(r'^sehr\s+', '', raw, flags=re.IGNORECASE)
+
+        else:
+            translation = raw
+
+        # --- Блок защиты от галлюцинаций ---
+        # Если перевод стал слишком длинным по сравнению с исходником (например, ought -> диалог),
+        # или содержит странные символы, возвращаем сырой перевод или оригинал.
+        if len(translation) > len(lemma) * 5:
+            # Скорее всего галлюцинация
+            return f"[{translation[:20]}...]"
+
+        # Очистка от лишних пробелов и точек
+        return translation.strip(" .")
+
+    def _translate_words(self, items):
+        """
+        Переводит пары (лемма, POS-тег) пакетами: строки с контекстом для всех слов передаются модели
+        одним вызовом, который сам делит их на пакеты по batch_size, и только затем контекст убирается.
+        Возвращает (словарь лемма -> перевод, множество лемм, переведенных без контекста из-за ошибки модели).
+        """
+        if not items:
+            return {}, set()
+        inputs = [self._word_input(lemma, pos_tag) for lemma, pos_tag in items]
+        # Строки близкой длины в одном пакете почти не дополняются паддингом
+        order = sorted(range(len(inputs)), key=lambda i: len(inputs[i]))
+        try:
+            outputs = self.translator_pipeline([inputs[i] for i in order], batch_size=self.batch_size)
+        except Exception:
+            # Если пакетный перевод не удался, переводим слова по одному
+            results = {lemma: self._translate_word(lemma, pos_tag) for lemma, pos_tag in items}
+            return ({lemma: translation for lemma, (translation, _) in results.items()},
+                    {lemma for lemma, (_, with_context) in results.items() if not with_context})
+
+        raw = [None] * len(inputs)
+        for i, output in zip(order, outputs):
+            raw[i] = output['translation_text']
+        return {lemma: self._clean_word_translation(lemma, pos_tag, raw_translation)
+                for (lemma, pos_tag), raw_translation in zip(items, raw)}, set()
+
+    def _translate_word(self, lemma, pos_tag):
+        """
+        Перевод отдельного слова с искусственным контекстом. Возвращает (перевод, True)
+        или (простой перевод слова без контекста, False), если перевод с контекстом не удался.
+        """
+        try:
+            raw = self.translator_pipeline(self._word_input(lemma, pos_tag))[0]['translation_text']
+            return self._clean_word_translation(lemma, pos_tag, raw), True
+
+        except Exception:
+            # Если что-то пошло не так, возвращаем простой перевод
+            return self.translator_pipeline(lemma)[0]['translation_text'], False
+
+    def _smart_translate_word(self, lemma, pos_tag):
+        """
+        Пытается улучшить перевод отдельного слова, добавляя искусственный контекст
+        в зависимости от части речи.
+        """
+        return self._translate_word(lemma, pos_tag)[0]
+
+    def get_dependency_parse(self, sentence_text: str):
+        """Строит текстовое представление дерева синтаксического разбора."""
+        doc = self.nlp(sentence_text)
+        tree = []
+        for token in doc:
+            tree.append(
+                f"{token.text:<15} {token.pos_:<10} {token.dep_:<15} {token.head.text}"
+            )
+        return "\n".join(tree)
+
+    def close_db(self):
+        self.db.close()
+        self.memory.close()
\ No newline at end of file